@@ -1,23 +1,63 @@
+import hashlib
 from datetime import datetime
 from pathlib import Path
 
 from datetime import datetime
 
+import pandas as pd
 import streamlit as st
 
 from pathlib import Path
 
 from ingest import load_pragati, load_d365, load_activity_library, ValidationError
 from derive import build_customer_profile, profile_columns
-from activity_library import normalise_activity_library
-from calendar_engine import run_calendar_engine
+from library_artifact import compile_library_frame
 from export import export_outputs
+from jobs import JOB_DONE, JobStore, submit_engine_run
+from preview import preview_upload, submit_upload_validation
 from stage2_effort import EffortEngine
+from telemetry import RunTelemetry
+from views import (
+    DEFAULT_PAGE_SIZE,
+    distinct_values,
+    filter_frame,
+    owner_weekly_load,
+    page_count,
+    page_slice,
+    reason_code_counts,
+)
 
 st.set_page_config(page_title="Engagement Calendarisation Engine", layout="wide")
 st.title("Engagement Calendarisation Engine")
 
+# job polling reruns only these blocks, not the derivation and library compile around them
+fragment = st.fragment if hasattr(st, "fragment") else st.experimental_fragment
+POLL_SECONDS = 1
 
+
+@st.cache_resource
+def get_job_store() -> JobStore:
+    # one store per server process so runs survive reruns, reconnects and page refreshes
+    return JobStore(max_workers=2)
+
+
+def frame_key(df) -> str:
+    # Streamlit hashes large frame arguments from a row sample, so the caches below key on every row
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+@st.cache_data(max_entries=4)
+def derive_profiles(_pragati_df, _d365_df, as_of_date, key: str):
+    return build_customer_profile(_pragati_df, _d365_df, as_of_date=as_of_date)
+
+
+@st.cache_resource(max_entries=4)
+def compiled_library(_activity_df, key: str):
+    # the compiled library is read-only, so sessions share one instance per library
+    return compile_library_frame(_activity_df)
+
+
+@st.cache_data
 def load_sample_data():
     pragati = load_pragati("data/sample/pragati.csv")
     d365 = load_d365("data/sample/d365.csv")
@@ -36,58 +76,193 @@ def parse_upload(label: str, loader, key: str):
         return None
 
 
+@fragment(run_every=POLL_SECONDS)
+def validation_progress(label: str, job_id: str) -> None:
+    """Issues found so far and progress of a validation job; reruns the page once it finishes."""
+    job = get_job_store().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    if job.partial:
+        st.warning(f"{label}: full validation found {len(job.partial)} failing check(s) so far")
+        st.dataframe(job.partial)
+    st.progress(job.fraction, text=f"Validating {label}: {job.processed:,}/{job.total:,} bytes read")
+
+
+@fragment(run_every=POLL_SECONDS)
+def engine_progress(job_id: str) -> None:
+    """Progress of an engine job with a cancel button; reruns the page once it finishes."""
+    job_store = get_job_store()
+    job = job_store.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.fraction, text=f"Job {job.job_id} ({job.label}): {job.processed:,}/{job.total:,} customers")
+    if st.button("Cancel run"):
+        job_store.cancel(job.job_id)
+
+
+def validated_upload(label: str, kind: str, key: str, pending: list):
+    """Show the header/sample preview at once; return the frame when the background validation passes."""
+    uploaded = st.file_uploader(label, type="csv", key=key)
+    if uploaded is None:
+        return None
+    job_store = get_job_store()
+    state = st.session_state.get(f"{key}_validation")
+    if state is None or state["file_id"] != uploaded.file_id or job_store.get(state["job_id"]) is None:
+        data = uploaded.getvalue()
+        state = {
+            "file_id": uploaded.file_id,
+            "preview": preview_upload(data, kind),
+            "job_id": submit_upload_validation(job_store, data, kind, label=f"{label} validation"),
+        }
+        st.session_state[f"{key}_validation"] = state
+
+    preview, job = state["preview"], job_store.get(state["job_id"])
+    with st.expander(f"{label}: header and {preview.sampled_rows:,} sampled rows checked", expanded=not preview.ok):
+        st.caption(f"Preview took {preview.seconds:.2f}s on {preview.total_bytes:,} bytes")
+        st.dataframe(preview.report)
+    if not job.finished:
+        validation_progress(label, job.job_id)
+        pending.append(job.job_id)
+        return None
+    if job.partial:
+        st.warning(f"{label}: full validation found {len(job.partial)} failing check(s)")
+        st.dataframe(job.partial)
+    if job.status != JOB_DONE:
+        st.error(f"{label} error: {job.error}")
+        return None
+    return job.result
+
+
+def render_paged(label: str, df, key: str, filters: dict) -> None:
+    """Filter server-side and serialise only the visible page to the browser."""
+    filtered = filter_frame(df, **filters)
+    cols = st.columns([1, 1, 3])
+    page_size = cols[0].selectbox("Rows per page", [50, DEFAULT_PAGE_SIZE, 1000], index=1, key=f"{key}_size")
+    pages = page_count(len(filtered), page_size)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = cols[1].number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    cols[2].caption(f"{label}: {len(filtered):,} of {len(df):,} rows match; page {page} of {pages}")
+    st.dataframe(page_slice(filtered, int(page), page_size))
+
+
 st.sidebar.header("Input data")
 use_sample = st.sidebar.checkbox("Use sample data", value=True)
+pending_validations: list = []
 
 if use_sample:
     pragati_df, d365_df, activity_df = load_sample_data()
 else:
-    pragati_df = parse_upload("Pragati CSV", load_pragati, "pragati")
-    d365_df = parse_upload("D365 CSV", load_d365, "d365")
+    pragati_df = validated_upload("Pragati CSV", "pragati", "pragati", pending_validations)
+    d365_df = validated_upload("D365 CSV", "d365", "d365", pending_validations)
     activity_df = parse_upload("Activity library CSV", load_activity_library, "activity")
 
 ready = pragati_df is not None and d365_df is not None and activity_df is not None
 
 if ready:
+    st.sidebar.header("View filters")
+    filters = {
+        "customer_id": st.sidebar.text_input("Customer ID").strip() or None,
+        "category": st.sidebar.text_input("Category").strip() or None,
+        "reason_code": st.sidebar.text_input("Reason code").strip() or None,
+        "week_range": None,
+    }
+
     st.subheader("Raw inputs")
-    st.dataframe(pragati_df)
-    st.dataframe(d365_df)
-    st.dataframe(activity_df)
+    with st.expander("Pragati extract"):
+        render_paged("Pragati", pragati_df, "raw_pragati", filters)
+    with st.expander("D365 extract"):
+        render_paged("D365", d365_df, "raw_d365", filters)
+    with st.expander("Activity library"):
+        render_paged("Activity library", activity_df, "raw_activity", filters)
 
     reference_date = st.date_input("As-of date", value=datetime.utcnow().date())
 
+    inputs_key, library_key = frame_key(pragati_df) + frame_key(d365_df), frame_key(activity_df)
+    telemetry = RunTelemetry(label="app")
     try:
-        profile_df = build_customer_profile(pragati_df, d365_df, as_of_date=reference_date)
-        library_df = normalise_activity_library(activity_df)
+        with telemetry.stage("derive", rows_in=len(pragati_df) + len(d365_df)) as stage:
+            profile_df = derive_profiles(pragati_df, d365_df, reference_date, inputs_key)
+            stage.rows_out = len(profile_df)
+        with telemetry.stage("normalise", rows_in=len(activity_df)) as stage:
+            # reruns with an unchanged library reuse the compiled one; new sessions load its artifact
+            library = compiled_library(activity_df, library_key)
+            library_df = library.frame
+            stage.rows_out = len(library_df)
     except ValidationError as exc:
         st.error(f"Validation failed: {exc}")
         st.stop()
 
     st.subheader("Customer profile (derived layer)")
-    st.dataframe(profile_df[list(profile_columns())])
+    render_paged("Customer profile", profile_df[list(profile_columns())], "profile", filters)
 
-    calendar_df, log_df = run_calendar_engine(profile_df, library_df, reference_date=reference_date)
+    st.subheader("Calendar engine run")
+    job_store = get_job_store()
+    job = job_store.get(st.query_params.get("job"))
+    if st.button("Run calendar engine"):
+        job_id = submit_engine_run(job_store, profile_df, library, reference_date=reference_date)
+        st.query_params["job"] = job_id
+        job = job_store.get(job_id)
+
+    if job is None:
+        st.info("Run the calendar engine to build the engagement calendar.")
+        st.stop()
+    if not job.finished:
+        engine_progress(job.job_id)
+        st.stop()
+    if job.status != JOB_DONE:
+        st.error(f"Job {job.job_id} {job.status.lower()}" + (f": {job.error}" if job.error else ""))
+        st.stop()
+
+    st.caption(f"Showing results of job {job.job_id} ({job.label}), finished {job.finished_at:%Y-%m-%d %H:%M:%S} UTC")
+    calendar_df, log_df = job.result
+    # the job runs on a worker thread, so only its wall time (including queueing) is known
+    telemetry.record(
+        "engine",
+        (job.finished_at - job.submitted_at).total_seconds(),
+        rows_in=job.total,
+        rows_out=len(calendar_df) + len(log_df),
+    )
+
+    weeks = distinct_values(calendar_df, ["week_bucket"])
+    if weeks:
+        filters["week_range"] = st.sidebar.select_slider("Week range", options=weeks, value=(weeks[0], weeks[-1]))
 
     st.subheader("Engagement calendar")
-    st.dataframe(calendar_df)
+    st.caption("Weekly load per owner type")
+    st.dataframe(owner_weekly_load(filter_frame(calendar_df, **filters)))
+    render_paged("Engagement calendar", calendar_df, "calendar", filters)
 
     st.subheader("Decision log")
-    st.dataframe(log_df)
+    st.caption("Outcomes per reason code")
+    st.dataframe(reason_code_counts(filter_frame(log_df, **filters)))
+    render_paged("Decision log", log_df, "decision_log", filters)
+
+    # one engine per session; the job id names the calendar, so reruns reuse its scores
+    effort_engine = st.session_state.setdefault("effort_engine", EffortEngine())
+    effort_engine.prepare_inputs(
+        profile_df, calendar_df, library_df, calendar_key=f"{job.job_id}:{inputs_key}:{library_key}"
+    )
 
-    effort_engine = EffortEngine()
-    effort_engine.prepare_inputs(profile_df, calendar_df, library_df)
+    st.subheader("Effort (Stage 2)")
+    st.caption("Items and effort minutes per owner type and week")
+    render_paged("Workload", effort_engine.workload_rollup(), "workload", filters)
 
     output_dir = st.text_input("Export directory", value=str(Path("outputs")))
     if st.button("Export calendar & decision log"):
         calendar_csv, calendar_json, decision_csv, decision_json, derived_csv, derived_json = export_outputs(
-            calendar_df, log_df, profile_df[profile_columns()], output_dir
+            calendar_df, log_df, profile_df[profile_columns()], output_dir, telemetry=telemetry
         )
         st.success("Export complete")
         st.write(calendar_csv)
+        st.write(telemetry.manifest_path)
         st.write(calendar_json)
         st.write(decision_csv)
         st.write(decision_json)
         st.write(derived_csv)
         st.write(derived_json)
+elif pending_validations:
+    # the validation fragments above poll their jobs and rerun the page when they finish
+    st.info("Validating uploads; the page continues once every upload has passed.")
 else:
     st.info("Upload required inputs or enable sample data to proceed.")
@@ -1,9 +1,11 @@
 """Weekly engagement calendarisation engine with variety enforcement."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from math import ceil
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 
 import pandas as pd
 
@@ -56,6 +58,9 @@ REASON_CODES = {
     "FAIL_VARIETY_KEY_MONTH_HARD",
     "WARN_VARIETY_KEY_RECENT_SOFT",
     "WARN_CAP_FALLBACK_DEFAULT",
+    "WARN_CAPACITY_SHIFTED",
+    "WARN_CAPACITY_CHANNEL_FALLBACK",
+    "WARN_CAPACITY_OVERBOOKED",
     "PASS_ELIGIBILITY",
     "PASS_MODIFIER",
     "PASS_CAP",
@@ -63,17 +68,53 @@ REASON_CODES = {
 }
 
 
-def _week_start(ts: pd.Timestamp) -> pd.Timestamp:
-    return ts - pd.Timedelta(days=ts.weekday())
+@dataclass(frozen=True)
+class HorizonTable:
+    """Week and month labels for a planning horizon, addressed by week index.
 
+    ``month_index[week]`` numbers the distinct months in horizon order, so
+    same-month checks are integer comparisons; ``month_starts[m]`` is the first
+    week index falling in month ``m``.
+    """
 
-def _month_bucket_from_week(week_start: pd.Timestamp) -> str:
-    return week_start.strftime("%Y-%m")
+    start_week: date
+    weeks: Tuple[str, ...]
+    months: Tuple[str, ...]
+    month_index: Tuple[int, ...]
+    month_labels: Tuple[str, ...]
+    month_starts: Tuple[int, ...]
 
+    def __len__(self) -> int:
+        return len(self.weeks)
 
-def _week_bucket(week_start: pd.Timestamp) -> str:
-    iso = week_start.isocalendar()
-    return f"{iso.year}-W{iso.week:02d}"
+    @property
+    def labels(self) -> List[Tuple[str, str]]:
+        return list(zip(self.weeks, self.months))
+
+
+@lru_cache(maxsize=64)
+def _horizon_table(start_week: date, planning_weeks: int) -> HorizonTable:
+    weeks, months, month_index, month_labels, month_starts = [], [], [], [], []
+    for week_idx in range(planning_weeks):
+        week_start = start_week + timedelta(weeks=week_idx)
+        iso_year, iso_week, _ = week_start.isocalendar()
+        month = f"{week_start.year}-{week_start.month:02d}"
+        if not month_labels or month_labels[-1] != month:
+            month_labels.append(month)
+            month_starts.append(week_idx)
+        weeks.append(f"{iso_year}-W{iso_week:02d}")
+        months.append(month)
+        month_index.append(len(month_labels) - 1)
+    return HorizonTable(
+        start_week, tuple(weeks), tuple(months), tuple(month_index), tuple(month_labels), tuple(month_starts)
+    )
+
+
+def horizon_table(reference_date: datetime | date | None, planning_weeks: int = PLANNING_WEEKS) -> HorizonTable:
+    """Cached :class:`HorizonTable` starting at the Monday of the reference week."""
+    day = reference_date or datetime.utcnow()
+    day = day.date() if isinstance(day, datetime) else day
+    return _horizon_table(day - timedelta(days=day.weekday()), planning_weeks)
 
 
 def _record_failure(decisions: Dict[str, Dict], activity_id: str, stage: str, reason: str, details: str) -> None:
@@ -82,6 +123,10 @@ def _record_failure(decisions: Dict[str, Dict], activity_id: str, stage: str, re
         entry["failure"] = (stage, reason, details)
 
 
+def _skip_failure(decisions: Dict[str, Dict], activity_id: str, stage: str, reason: str, details: str) -> None:
+    return None
+
+
 def _record_inclusion(decisions: Dict[str, Dict], activity_id: str, week_bucket: str, reason_codes: List[str]) -> None:
     entry = decisions.setdefault(activity_id, {"included": [], "reasons": set(), "failure": None})
     entry["included"].append(week_bucket)
@@ -92,7 +137,7 @@ HUMAN_CHANNELS = {"Telecalling", "RMVisit", "Branch", "Event / Webinar", "Webina
 DIGITAL_CHANNELS = {"WhatsApp", "Email", "Portal", "SMS"}
 
 
-def _owner_for_channel(channel: str) -> str:
+def owner_for_channel(channel: str) -> str:
     if channel in {None, ""}:
         return "Digital"
     if channel == "Telecalling":
@@ -109,121 +154,194 @@ def _owner_for_channel(channel: str) -> str:
     return "Digital"
 
 
-def run_calendar_engine(
-    customer_profiles: pd.DataFrame,
-    activities: pd.DataFrame,
-    reference_date: datetime | None = None,
-    planning_weeks: int = PLANNING_WEEKS,
-) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    reference = pd.Timestamp(reference_date if reference_date else datetime.utcnow().date())
-    start_week = _week_start(reference)
-
+CALENDAR_COLUMNS = [
+    "customer_id",
+    "week_bucket",
+    "month_bucket",
+    "activity_id",
+    "category",
+    "sub_category",
+    "channel",
+    "owner_type",
+    "reason_codes",
+]
+
+DECISION_LOG_COLUMNS = [
+    "customer_id",
+    "activity_id",
+    "activity_name",
+    "category",
+    "sub_category",
+    "stage",
+    "result",
+    "reason_code",
+    "details",
+]
+
+CALENDAR_SORT_KEYS = ["customer_id", "week_bucket", "activity_id"]
+DECISION_LOG_SORT_KEYS = ["customer_id", "activity_id", "stage", "reason_code"]
+
+# profile attributes read by schedule_customer; other profile columns never change a schedule
+SCHEDULING_ATTRIBUTES = (
+    "CustomerID",
+    "LifeStage",
+    "SafariPersona",
+    "RenewalBucket",
+    "KidsFlag",
+    "KidsAgeBand",
+    "PremiumToIncomeBand",
+    "CityTier",
+    "OccupationType",
+    "PercentSurrenders",
+)
+
+
+@dataclass(frozen=True)
+class CompiledLibrary:
+    """Normalised activity library in engine order, with rows as plain dicts.
+
+    Compiling once and reusing the result avoids re-sorting the frame and
+    per-row ``iterrows`` overhead on every engine call.
+    """
+
+    frame: pd.DataFrame
+    records: Tuple[Dict, ...]
+
+
+def compile_activity_library(activities: pd.DataFrame | CompiledLibrary) -> CompiledLibrary:
+    if isinstance(activities, CompiledLibrary):
+        return activities
+    ordered = activities.sort_values(["Priority", "ActivityID"], ascending=[False, True]).reset_index(drop=True)
+    return CompiledLibrary(frame=ordered, records=tuple(ordered.to_dict("records")))
+
+
+def planning_horizon(reference_date: datetime | None, planning_weeks: int = PLANNING_WEEKS) -> List[Tuple[str, str]]:
+    """``(week_bucket, month_bucket)`` labels for each week from the reference week onwards."""
+    return horizon_table(reference_date, planning_weeks).labels
+
+
+def eligibility_failure(customer: Dict, activity: Dict) -> Tuple[str, str, str] | None:
+    """Return ``(stage, reason_code, details)`` for the first failing eligibility/modifier check."""
+    if activity["life_stage_eligibility"] and customer["LifeStage"] not in activity["life_stage_eligibility"]:
+        return ("ELIGIBILITY", "FAIL_LIFESTAGE", "Life stage not eligible")
+    if activity["persona_eligibility"] and customer["SafariPersona"] not in activity["persona_eligibility"]:
+        return ("ELIGIBILITY", "FAIL_SAFARI", "Safari persona not eligible")
+    if activity["renewal_eligibility"] and customer["RenewalBucket"] not in activity["renewal_eligibility"]:
+        return ("ELIGIBILITY", "FAIL_RENEWAL_BUCKET", "Renewal bucket not eligible")
+
+    # modifiers
+    if activity["kids_flags"]:
+        if customer.get("KidsFlag") not in activity["kids_flags"]:
+            return ("MODIFIER", "FAIL_KIDS", "Kids flag not eligible")
+    if activity["kids_age_bands"]:
+        if customer.get("KidsAgeBand") not in activity["kids_age_bands"]:
+            return ("MODIFIER", "FAIL_KIDS_AGE", "Kids age band not eligible")
+    if activity["pti_eligibility"] and customer.get("PremiumToIncomeBand") not in activity["pti_eligibility"]:
+        return ("MODIFIER", "FAIL_PTI", "PTI band not eligible")
+    if activity["city_eligibility"] and customer.get("CityTier") not in activity["city_eligibility"]:
+        return ("MODIFIER", "FAIL_CITY", "City not eligible")
+    if activity["occupation_eligibility"] and customer.get("OccupationType") not in activity["occupation_eligibility"]:
+        return ("MODIFIER", "FAIL_OCCUPATION", "Occupation not eligible")
+    if _bool_from_flag(activity.get("exclude_if_high_surrender_pct")) and customer.get("PercentSurrenders", 0) > 0:
+        return ("MODIFIER", "FAIL_SURRENDER_PCT", "High surrender percent")
+    return None
+
+
+_FILTERED_OUT = ("ELIGIBILITY", "FILTERED", "Filtered before scheduling")
+
+
+def schedule_customer(
+    customer: Dict,
+    library: CompiledLibrary,
+    horizon: HorizonTable,
+    build_log: bool = True,
+    eligibility: Dict[str, Tuple[str, str, str] | None] | None = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Schedule one customer; returns calendar rows and one decision-log row per activity.
+
+    ``customer`` is a mapping of profile attributes and ``horizon`` the
+    :class:`HorizonTable` of the planning weeks. With ``build_log=False`` no
+    decision bookkeeping is done and the log list is empty; the calendar is
+    unchanged. ``eligibility`` holds precomputed :func:`eligibility_failure`
+    results by ActivityID (see ``pushdown.py``); activities missing from it are
+    treated as ineligible, which is only meaningful without the log.
+    """
     calendar_rows: List[Dict] = []
     log_rows: List[Dict] = []
 
-    # sort activities deterministically
-    activities = activities.sort_values(["Priority", "ActivityID"], ascending=[False, True]).reset_index(drop=True)
-
-    for _, customer in customer_profiles.sort_values("CustomerID").iterrows():
-        persona = customer.get("SafariPersona")
-        life_stage = customer.get("LifeStage")
-        cap_source = "DEFAULT"
-        persona_cap = DEFAULT_CAP
-        cap_reason_codes: List[str] = []
-        if persona in SAFARI_CAPS:
-            persona_cap = SAFARI_CAPS[persona]
-            cap_source = "SAFARI"
-        elif life_stage in LIFE_STAGE_CAPS:
-            persona_cap = LIFE_STAGE_CAPS[life_stage]
-            cap_source = "LIFESTAGE"
+    persona = customer.get("SafariPersona")
+    life_stage = customer.get("LifeStage")
+    cap_source = "DEFAULT"
+    persona_cap = DEFAULT_CAP
+    cap_reason_codes: List[str] = []
+    if persona in SAFARI_CAPS:
+        persona_cap = SAFARI_CAPS[persona]
+        cap_source = "SAFARI"
+    elif life_stage in LIFE_STAGE_CAPS:
+        persona_cap = LIFE_STAGE_CAPS[life_stage]
+        cap_source = "LIFESTAGE"
+    else:
+        cap_reason_codes.append("WARN_CAP_FALLBACK_DEFAULT")
+
+    persona_count = 0
+    category_counts: Dict[str, int] = {cat: 0 for cat in CATEGORY_CAPS}
+    last_category_week: Dict[str, int] = {}
+    last_activity_week: Dict[str, int] = {}
+    last_theme_week: Dict[str, int] = {}
+    variety_month_seen: Dict[Tuple[str, int], bool] = {}
+    variety_recent_week: Dict[str, int] = {}
+    last_category_activity: Dict[str, str] = {}
+    last_theme_activity: Dict[str, str] = {}
+
+    decisions: Dict[str, Dict] = {}
+    record_failure = _record_failure if build_log else _skip_failure
+    base_reasons_map: Dict[str, List[str]] = {}
+
+    # Eligibility pass list
+    eligible = []
+    for activity in library.records:
+        aid = activity["ActivityID"]
+        if eligibility is None:
+            failure = eligibility_failure(customer, activity)
         else:
-            cap_reason_codes.append("WARN_CAP_FALLBACK_DEFAULT")
-
-        persona_count = 0
-        category_counts: Dict[str, int] = {cat: 0 for cat in CATEGORY_CAPS}
-        last_category_week: Dict[str, int] = {}
-        last_activity_week: Dict[str, int] = {}
-        last_theme_week: Dict[str, int] = {}
-        variety_month_seen: Dict[Tuple[str, str], bool] = {}
-        variety_recent_week: Dict[str, int] = {}
-        last_category_activity: Dict[str, str] = {}
-        last_theme_activity: Dict[str, str] = {}
-
-        decisions: Dict[str, Dict] = {}
-        base_reasons_map: Dict[str, List[str]] = {}
-
-        # Eligibility pass list
-        eligible = []
-        for _, activity in activities.iterrows():
+            failure = eligibility.get(aid, _FILTERED_OUT)
+        if failure is not None:
+            record_failure(decisions, aid, *failure)
+            continue
+
+        reasons = ["PASS_ELIGIBILITY", "PASS_MODIFIER"]
+        base_reasons_map[aid] = list(reasons)
+        eligible.append((activity, reasons))
+
+    # weekly scheduling
+    for week_idx, (week_bucket, month_bucket, month_idx) in enumerate(
+        zip(horizon.weeks, horizon.months, horizon.month_index)
+    ):
+        candidates: List[Tuple[Dict, float, bool, str]] = []  # (row, score, soft_penalty_applied, penalty_mode)
+
+        for activity, base_reasons in eligible:
             aid = activity["ActivityID"]
-            reasons = ["PASS_ELIGIBILITY"]
-
-            if activity["life_stage_eligibility"] and customer["LifeStage"] not in activity["life_stage_eligibility"]:
-                _record_failure(decisions, aid, "ELIGIBILITY", "FAIL_LIFESTAGE", "Life stage not eligible")
-                continue
-            if activity["persona_eligibility"] and customer["SafariPersona"] not in activity["persona_eligibility"]:
-                _record_failure(decisions, aid, "ELIGIBILITY", "FAIL_SAFARI", "Safari persona not eligible")
-                continue
-            if activity["renewal_eligibility"] and customer["RenewalBucket"] not in activity["renewal_eligibility"]:
-                _record_failure(decisions, aid, "ELIGIBILITY", "FAIL_RENEWAL_BUCKET", "Renewal bucket not eligible")
-                continue
+            category = activity["Category"]
+            penalty_mode = activity.get("repeat_penalty_mode", "HARD")
 
-            # modifiers
-            if activity["kids_flags"]:
-                if customer.get("KidsFlag") not in activity["kids_flags"]:
-                    _record_failure(decisions, aid, "MODIFIER", "FAIL_KIDS", "Kids flag not eligible")
-                    continue
-            if activity["kids_age_bands"]:
-                if customer.get("KidsAgeBand") not in activity["kids_age_bands"]:
-                    _record_failure(decisions, aid, "MODIFIER", "FAIL_KIDS_AGE", "Kids age band not eligible")
-                    continue
-            if activity["pti_eligibility"] and customer.get("PremiumToIncomeBand") not in activity["pti_eligibility"]:
-                _record_failure(decisions, aid, "MODIFIER", "FAIL_PTI", "PTI band not eligible")
-                continue
-            if activity["city_eligibility"] and customer.get("CityTier") not in activity["city_eligibility"]:
-                _record_failure(decisions, aid, "MODIFIER", "FAIL_CITY", "City not eligible")
-                continue
-            if activity["occupation_eligibility"] and customer.get("OccupationType") not in activity["occupation_eligibility"]:
-                _record_failure(decisions, aid, "MODIFIER", "FAIL_OCCUPATION", "Occupation not eligible")
+            if persona_count >= persona_cap:
+                record_failure(
+                    decisions,
+                    aid,
+                    "CAP",
+                    "FAIL_PERSONA_CAP",
+                    f"Cap reached from {cap_source} limit {persona_cap}",
+                )
                 continue
-            if _bool_from_flag(activity.get("exclude_if_high_surrender_pct")) and customer.get("PercentSurrenders", 0) > 0:
-                _record_failure(decisions, aid, "MODIFIER", "FAIL_SURRENDER_PCT", "High surrender percent")
+            cat_cap = CATEGORY_CAPS.get(category, {"max_per_year": 0, "cooldown_weeks": 0})
+            if category_counts.get(category, 0) >= cat_cap["max_per_year"]:
+                record_failure(decisions, aid, "CAP", "FAIL_CATEGORY_CAP", "Category cap reached")
                 continue
 
-            reasons.append("PASS_MODIFIER")
-            base_reasons_map[aid] = list(reasons)
-            eligible.append((activity, reasons))
-
-        # weekly scheduling
-        for week_idx in range(planning_weeks):
-            week_start = start_week + pd.Timedelta(weeks=week_idx)
-            week_bucket = _week_bucket(week_start)
-            month_bucket = _month_bucket_from_week(week_start)
-
-            candidates: List[Tuple[Dict, float, bool, str]] = []  # (row, score, soft_penalty_applied, penalty_mode)
-
-            for activity, base_reasons in eligible:
-                aid = activity["ActivityID"]
-                category = activity["Category"]
-                penalty_mode = activity.get("repeat_penalty_mode", "HARD")
-
-                if persona_count >= persona_cap:
-                    _record_failure(
-                        decisions,
-                        aid,
-                        "CAP",
-                        "FAIL_PERSONA_CAP",
-                        f"Cap reached from {cap_source} limit {persona_cap}",
-                    )
-                    continue
-                cat_cap = CATEGORY_CAPS.get(category, {"max_per_year": 0, "cooldown_weeks": 0})
-                if category_counts.get(category, 0) >= cat_cap["max_per_year"]:
-                    _record_failure(decisions, aid, "CAP", "FAIL_CATEGORY_CAP", "Category cap reached")
-                    continue
-
-                # category cooldown
-                last_cat = last_category_week.get(category)
-                if last_cat is not None and week_idx - last_cat <= cat_cap["cooldown_weeks"] - 1:
+            # category cooldown
+            last_cat = last_category_week.get(category)
+            if last_cat is not None and week_idx - last_cat <= cat_cap["cooldown_weeks"] - 1:
+                if build_log:
                     actual_gap = week_idx - last_cat
                     details = (
                         f"blocking_activity_id={last_category_activity.get(category)}; "
@@ -233,11 +351,12 @@ def run_calendar_engine(
                         f"actual_gap_weeks={actual_gap}"
                     )
                     _record_failure(decisions, aid, "SCHEDULE", "FAIL_CATEGORY_SPACING", details)
-                    continue
+                continue
 
-                # gap rules
-                min_gap_act = int(activity.get("min_gap_activity_weeks", 0))
-                if aid in last_activity_week and week_idx - last_activity_week[aid] <= min_gap_act - 1:
+            # gap rules
+            min_gap_act = int(activity.get("min_gap_activity_weeks", 0))
+            if aid in last_activity_week and week_idx - last_activity_week[aid] <= min_gap_act - 1:
+                if build_log:
                     actual_gap = week_idx - last_activity_week[aid]
                     details = (
                         f"blocking_activity_id={aid}; blocking_category={category}; "
@@ -245,11 +364,12 @@ def run_calendar_engine(
                         f"required_gap_weeks={min_gap_act}; actual_gap_weeks={actual_gap}"
                     )
                     _record_failure(decisions, aid, "SCHEDULE", "FAIL_GAP_SAME_ACTIVITY", details)
-                    continue
+                continue
 
-                min_gap_theme = int(activity.get("min_gap_theme_weeks", 0))
-                theme_key = activity.get("Theme", "")
-                if theme_key in last_theme_week and week_idx - last_theme_week[theme_key] <= min_gap_theme - 1:
+            min_gap_theme = int(activity.get("min_gap_theme_weeks", 0))
+            theme_key = activity.get("Theme", "")
+            if theme_key in last_theme_week and week_idx - last_theme_week[theme_key] <= min_gap_theme - 1:
+                if build_log:
                     actual_gap = week_idx - last_theme_week[theme_key]
                     details = (
                         f"blocking_activity_id={last_theme_activity.get(theme_key)}; "
@@ -258,200 +378,209 @@ def run_calendar_engine(
                         f"required_gap_weeks={min_gap_theme}; actual_gap_weeks={actual_gap}"
                     )
                     _record_failure(decisions, aid, "SCHEDULE", "FAIL_GAP_SAME_THEME", details)
+                continue
+
+            # hard variety
+            vkey = activity.get("VarietyKey", "")
+            if vkey and penalty_mode == "HARD":
+                if variety_month_seen.get((vkey, month_idx)):
+                    record_failure(
+                        decisions,
+                        aid,
+                        "SCHEDULE",
+                        "FAIL_VARIETY_KEY_MONTH_HARD",
+                        f"Variety key already used in {month_bucket}",
+                    )
                     continue
 
-                # hard variety
-                vkey = activity.get("VarietyKey", "")
-                if vkey and penalty_mode == "HARD":
-                    if variety_month_seen.get((vkey, month_bucket)):
-                        _record_failure(
-                            decisions,
-                            aid,
-                            "SCHEDULE",
-                            "FAIL_VARIETY_KEY_MONTH_HARD",
-                            f"Variety key already used in {month_bucket}",
-                        )
-                        continue
-
-                soft_penalty = False
-                if vkey and penalty_mode == "SOFT":
-                    last_week_for_key = variety_recent_week.get(vkey)
-                    if last_week_for_key is not None and week_idx - last_week_for_key <= VARIETY_RECENT_WINDOW_WEEKS:
-                        soft_penalty = True
-
-                # channel sanity
-                channels = activity["channels"]
-                if activity.get("requires_human"):
-                    human_channels = [ch for ch in channels if ch in HUMAN_CHANNELS]
-                    if not human_channels:
-                        _record_failure(
-                            decisions,
-                            aid,
-                            "SCHEDULE",
-                            "FAIL_CHANNEL_OWNER_MAPPING",
-                            "No human-capable channel available",
-                        )
-                        continue
-                    channels = human_channels
-
-                if not channels:
-                    _record_failure(decisions, aid, "SCHEDULE", "FAIL_CHANNEL_OWNER_MAPPING", "No valid channel")
+            soft_penalty = False
+            if vkey and penalty_mode == "SOFT":
+                last_week_for_key = variety_recent_week.get(vkey)
+                if last_week_for_key is not None and week_idx - last_week_for_key <= VARIETY_RECENT_WINDOW_WEEKS:
+                    soft_penalty = True
+
+            # channel sanity
+            channels = activity["channels"]
+            if activity.get("requires_human"):
+                human_channels = [ch for ch in channels if ch in HUMAN_CHANNELS]
+                if not human_channels:
+                    record_failure(
+                        decisions,
+                        aid,
+                        "SCHEDULE",
+                        "FAIL_CHANNEL_OWNER_MAPPING",
+                        "No human-capable channel available",
+                    )
                     continue
+                channels = human_channels
 
-                score = activity["Priority"] * 100 + CATEGORY_PRECEDENCE_BONUS.get(category, 0)
-                if soft_penalty:
-                    score -= VARIETY_SOFT_PENALTY
+            if not channels:
+                record_failure(decisions, aid, "SCHEDULE", "FAIL_CHANNEL_OWNER_MAPPING", "No valid channel")
+                continue
 
-                candidates.append((activity, score, soft_penalty, penalty_mode))
+            score = activity["Priority"] * 100 + CATEGORY_PRECEDENCE_BONUS.get(category, 0)
+            if soft_penalty:
+                score -= VARIETY_SOFT_PENALTY
 
-            if not candidates:
-                continue
+            candidates.append((activity, score, soft_penalty, penalty_mode))
 
-            # select best
-            candidates.sort(
-                key=lambda x: (
-                    -x[1],
-                    -x[0]["Priority"],
-                    -CATEGORY_PRECEDENCE_BONUS.get(x[0]["Category"], 0),
-                    x[0]["ActivityID"],
-                )
-            )
-            chosen, _, applied_soft, chosen_penalty_mode = candidates[0]
-            aid = chosen["ActivityID"]
-            category = chosen["Category"]
-            vkey = chosen.get("VarietyKey", "")
-
-            base_reasons = base_reasons_map.get(aid, ["PASS_ELIGIBILITY", "PASS_MODIFIER"])
-            base_reasons = base_reasons + cap_reason_codes
-
-            channel_options = chosen["channels"]
-            if chosen.get("requires_human"):
-                channel_options = [ch for ch in channel_options if ch in HUMAN_CHANNELS]
-            channel = chosen["PreferredChannel"] if chosen["PreferredChannel"] in channel_options else channel_options[0]
-            owner = _owner_for_channel(channel)
-
-            # prevent invalid digital + human pairings
-            if chosen.get("requires_human") and channel in DIGITAL_CHANNELS:
-                _record_failure(
-                    decisions,
-                    aid,
-                    "SCHEDULE",
-                    "FAIL_CHANNEL_OWNER_MAPPING",
-                    "requires_human but only digital channel selected",
-                )
-                continue
+        if not candidates:
+            continue
 
-            reason_codes = list(base_reasons) + ["PASS_CAP", "PASS_SCHEDULE"]
-            if applied_soft:
-                reason_codes.append("WARN_VARIETY_KEY_RECENT_SOFT")
-
-            # update trackers
-            persona_count += 1
-            category_counts[category] = category_counts.get(category, 0) + 1
-            last_category_week[category] = week_idx
-            last_category_activity[category] = aid
-            last_activity_week[aid] = week_idx
-            last_theme_week[chosen.get("Theme", "")] = week_idx
-            last_theme_activity[chosen.get("Theme", "")] = aid
-            if vkey:
-                if chosen_penalty_mode == "HARD":
-                    variety_month_seen[(vkey, month_bucket)] = True
-                variety_recent_week[vkey] = week_idx
-
-            week_bucket_label = week_bucket
-
-            calendar_rows.append(
-                {
-                    "customer_id": customer["CustomerID"],
-                    "week_bucket": week_bucket_label,
-                    "month_bucket": month_bucket,
-                    "activity_id": aid,
-                    "category": category,
-                    "sub_category": chosen.get("SubCategory"),
-                    "channel": channel,
-                    "owner_type": owner,
-                    "reason_codes": "|".join(reason_codes),
-                }
+        # select best
+        candidates.sort(
+            key=lambda x: (
+                -x[1],
+                -x[0]["Priority"],
+                -CATEGORY_PRECEDENCE_BONUS.get(x[0]["Category"], 0),
+                x[0]["ActivityID"],
             )
+        )
+        chosen, _, applied_soft, chosen_penalty_mode = candidates[0]
+        aid = chosen["ActivityID"]
+        category = chosen["Category"]
+        vkey = chosen.get("VarietyKey", "")
+
+        base_reasons = base_reasons_map.get(aid, ["PASS_ELIGIBILITY", "PASS_MODIFIER"])
+        base_reasons = base_reasons + cap_reason_codes
+
+        channel_options = chosen["channels"]
+        if chosen.get("requires_human"):
+            channel_options = [ch for ch in channel_options if ch in HUMAN_CHANNELS]
+        channel = chosen["PreferredChannel"] if chosen["PreferredChannel"] in channel_options else channel_options[0]
+        owner = owner_for_channel(channel)
+
+        # prevent invalid digital + human pairings
+        if chosen.get("requires_human") and channel in DIGITAL_CHANNELS:
+            record_failure(
+                decisions,
+                aid,
+                "SCHEDULE",
+                "FAIL_CHANNEL_OWNER_MAPPING",
+                "requires_human but only digital channel selected",
+            )
+            continue
+
+        reason_codes = list(base_reasons) + ["PASS_CAP", "PASS_SCHEDULE"]
+        if applied_soft:
+            reason_codes.append("WARN_VARIETY_KEY_RECENT_SOFT")
+
+        # update trackers
+        persona_count += 1
+        category_counts[category] = category_counts.get(category, 0) + 1
+        last_category_week[category] = week_idx
+        last_category_activity[category] = aid
+        last_activity_week[aid] = week_idx
+        last_theme_week[chosen.get("Theme", "")] = week_idx
+        last_theme_activity[chosen.get("Theme", "")] = aid
+        if vkey:
+            if chosen_penalty_mode == "HARD":
+                variety_month_seen[(vkey, month_idx)] = True
+            variety_recent_week[vkey] = week_idx
+
+        week_bucket_label = week_bucket
+
+        calendar_rows.append(
+            {
+                "customer_id": customer["CustomerID"],
+                "week_bucket": week_bucket_label,
+                "month_bucket": month_bucket,
+                "activity_id": aid,
+                "category": category,
+                "sub_category": chosen.get("SubCategory"),
+                "channel": channel,
+                "owner_type": owner,
+                "reason_codes": "|".join(reason_codes),
+            }
+        )
 
+        if build_log:
             _record_inclusion(decisions, aid, week_bucket_label, reason_codes)
 
-        # finalise decision log entries per activity
-        for _, activity in activities.iterrows():
-            aid = activity["ActivityID"]
-            entry = decisions.get(aid, {"included": [], "reasons": set(), "failure": None})
-            if entry["included"]:
-                stage = "SCHEDULE"
-                result = "INCLUDED"
-                reason_code = "PASS_SCHEDULE"
-                details = (
-                    f"weeks={','.join(entry['included'])}; reasons={'|'.join(sorted(entry['reasons']))}; cap_source={cap_source}"
-                )
-            elif entry.get("failure"):
-                stage, reason_code, details = entry["failure"]
-                result = "EXCLUDED"
-            else:
-                stage, reason_code, result, details = ("SCHEDULE", "FAIL_CATEGORY_CAP", "EXCLUDED", "Not scheduled")
-
-            log_rows.append(
-                {
-                    "customer_id": customer["CustomerID"],
-                    "activity_id": aid,
-                    "activity_name": activity.get("ActivityName"),
-                    "category": activity.get("Category"),
-                    "sub_category": activity.get("SubCategory"),
-                    "stage": stage,
-                    "result": result,
-                    "reason_code": reason_code,
-                    "details": details,
-                }
+    if not build_log:
+        return calendar_rows, log_rows
+
+    # finalise decision log entries per activity
+    for activity in library.records:
+        aid = activity["ActivityID"]
+        entry = decisions.get(aid, {"included": [], "reasons": set(), "failure": None})
+        if entry["included"]:
+            stage = "SCHEDULE"
+            result = "INCLUDED"
+            reason_code = "PASS_SCHEDULE"
+            details = (
+                f"weeks={','.join(entry['included'])}; reasons={'|'.join(sorted(entry['reasons']))}; cap_source={cap_source}"
             )
+        elif entry.get("failure"):
+            stage, reason_code, details = entry["failure"]
+            result = "EXCLUDED"
+        else:
+            stage, reason_code, result, details = ("SCHEDULE", "FAIL_CATEGORY_CAP", "EXCLUDED", "Not scheduled")
+
+        log_rows.append(
+            {
+                "customer_id": customer["CustomerID"],
+                "activity_id": aid,
+                "activity_name": activity.get("ActivityName"),
+                "category": activity.get("Category"),
+                "sub_category": activity.get("SubCategory"),
+                "stage": stage,
+                "result": result,
+                "reason_code": reason_code,
+                "details": details,
+            }
+        )
+
+    return calendar_rows, log_rows
 
+
+def run_calendar_engine(
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    progress: Callable[[int, int], None] | None = None,
+    build_log: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Schedule every customer over the planning horizon.
+
+    ``activities`` is the normalised library or a :class:`CompiledLibrary` built
+    from it. ``progress`` is called with ``(customers_done, customers_total)``
+    after each customer; raising from it aborts the run. ``build_log=False``
+    skips decision-log construction and returns an empty log; see ``explain.py``
+    for replaying individual decisions afterwards.
+    """
+    library = compile_activity_library(activities)
+    horizon = horizon_table(reference_date, planning_weeks)
+
+    calendar_rows: List[Dict] = []
+    log_rows: List[Dict] = []
+
+    customers = customer_profiles.sort_values("CustomerID").to_dict("records")
+    total_customers = len(customers)
+    for customer_idx, customer in enumerate(customers, start=1):
+        customer_calendar, customer_log = schedule_customer(customer, library, horizon, build_log)
+        calendar_rows.extend(customer_calendar)
+        log_rows.extend(customer_log)
+
+        if progress is not None:
+            progress(customer_idx, total_customers)
+
+    return _calendar_frame(calendar_rows), _decision_log_frame(log_rows)
+
+
+def _calendar_frame(calendar_rows: List[Dict]) -> pd.DataFrame:
     calendar_df = pd.DataFrame(calendar_rows)
     if calendar_df.empty:
-        calendar_df = pd.DataFrame(
-            columns=[
-                "customer_id",
-                "week_bucket",
-                "month_bucket",
-                "activity_id",
-                "category",
-                "sub_category",
-                "channel",
-                "owner_type",
-                "reason_codes",
-            ]
-        )
-    else:
-        calendar_df = calendar_df.sort_values([
-            "customer_id",
-            "week_bucket",
-            "activity_id",
-        ]).reset_index(drop=True)
+        return pd.DataFrame(columns=CALENDAR_COLUMNS)
+    return calendar_df.sort_values(CALENDAR_SORT_KEYS).reset_index(drop=True)
+
 
+def _decision_log_frame(log_rows: List[Dict]) -> pd.DataFrame:
     log_df = pd.DataFrame(log_rows)
-    if not log_df.empty:
-        log_df = log_df.sort_values([
-            "customer_id",
-            "activity_id",
-            "stage",
-            "reason_code",
-        ]).reset_index(drop=True)
-    else:
-        log_df = pd.DataFrame(
-            columns=[
-                "customer_id",
-                "activity_id",
-                "activity_name",
-                "category",
-                "sub_category",
-                "stage",
-                "result",
-                "reason_code",
-                "details",
-            ]
-        )
-    return calendar_df, log_df
+    if log_df.empty:
+        return pd.DataFrame(columns=DECISION_LOG_COLUMNS)
+    return log_df.sort_values(DECISION_LOG_SORT_KEYS).reset_index(drop=True)
 
 
 def _bool_from_flag(value) -> bool:
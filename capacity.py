@@ -0,0 +1,176 @@
+"""Optional capacity-aware post-pass rebalancing human-channel calendar items."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import pandas as pd
+
+from calendar_engine import (
+    CATEGORY_CAPS,
+    CATEGORY_PRECEDENCE_BONUS,
+    DIGITAL_CHANNELS,
+    HUMAN_CHANNELS,
+    PLANNING_WEEKS,
+    owner_for_channel,
+    horizon_table,
+)
+
+DEFAULT_MAX_SHIFT_WEEKS = 2
+
+
+def _shift_order(max_shift_weeks: int) -> List[int]:
+    # nearest weeks first, later before earlier at equal distance
+    order = []
+    for distance in range(1, max_shift_weeks + 1):
+        order.extend([distance, -distance])
+    return order
+
+
+def _digital_fallback(activity: Mapping) -> str | None:
+    if activity.get("requires_human"):
+        return None
+    channels = list(activity.get("channels") or [])
+    preferred = activity.get("PreferredChannel")
+    if preferred in DIGITAL_CHANNELS and preferred in channels and owner_for_channel(preferred) == "Digital":
+        return preferred
+    for channel in channels:
+        if channel in DIGITAL_CHANNELS and owner_for_channel(channel) == "Digital":
+            return channel
+    return None
+
+
+def _move_allowed(
+    item: Dict, target: int, others: List[Dict], activity_lookup: Mapping[str, Mapping], month_index: Sequence[int]
+) -> bool:
+    """Re-check spacing, gap and HARD variety rules for ``item`` placed in week ``target``."""
+    activity = activity_lookup.get(item["activity_id"], {})
+    category = item["category"]
+    cooldown = CATEGORY_CAPS.get(category, {"cooldown_weeks": 0})["cooldown_weeks"]
+    min_gap_act = int(activity.get("min_gap_activity_weeks", 0) or 0)
+    min_gap_theme = int(activity.get("min_gap_theme_weeks", 0) or 0)
+    theme = activity.get("Theme", "")
+    vkey = activity.get("VarietyKey", "")
+    hard = vkey and activity.get("repeat_penalty_mode", "HARD") == "HARD"
+    for other in others:
+        if other is item:
+            continue
+        gap = abs(target - other["_week"])
+        if gap == 0:
+            return False  # one engagement per customer per week
+        if other["category"] == category and gap < cooldown:
+            return False
+        if other["activity_id"] == item["activity_id"] and gap < min_gap_act:
+            return False
+        other_activity = activity_lookup.get(other["activity_id"], {})
+        if other_activity.get("Theme", "") == theme and gap < min_gap_theme:
+            return False
+        same_month = other["_week"] >= 0 and month_index[other["_week"]] == month_index[target]
+        # only HARD placements mark a variety month as taken in the engine
+        other_hard = other_activity.get("repeat_penalty_mode", "HARD") == "HARD"
+        if hard and same_month and other_hard and other_activity.get("VarietyKey", "") == vkey:
+            return False
+    return True
+
+
+def rebalance_capacity(
+    calendar: pd.DataFrame,
+    activities: pd.DataFrame,
+    capacities: Mapping[str, int],
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    branch_capacities: Mapping[Tuple[str, str], int] | None = None,
+    customer_branches: Mapping[str, str] | None = None,
+    max_shift_weeks: int = DEFAULT_MAX_SHIFT_WEEKS,
+) -> pd.DataFrame:
+    """Fit human-channel items into weekly owner capacities.
+
+    ``capacities`` maps ``owner_type`` to weekly slots; ``branch_capacities`` maps
+    ``(owner_type, branch)`` to slots and takes precedence for customers whose
+    branch (from ``customer_branches``) has an entry. Within each owner pool,
+    items are served in week order, then engine score (priority and category
+    precedence), then customer and activity ID, so results are deterministic.
+    An item over capacity moves to the nearest week within ``max_shift_weeks``
+    that has a free slot and keeps the engine's spacing and variety rules; failing
+    that it falls back to a digital channel when the activity allows one, and is
+    otherwise kept and flagged. Touched rows gain ``WARN_CAPACITY_SHIFTED``,
+    ``WARN_CAPACITY_CHANNEL_FALLBACK`` or ``WARN_CAPACITY_OVERBOOKED``. The decision
+    log still describes the Stage 1 schedule.
+    """
+    if calendar.empty:
+        return calendar.copy()
+
+    horizon = horizon_table(reference_date, planning_weeks)
+    week_index = {week: idx for idx, week in enumerate(horizon.weeks)}
+    activity_lookup = {record["ActivityID"]: record for record in activities.to_dict("records")}
+    branch_capacities = branch_capacities or {}
+    customer_branches = customer_branches or {}
+
+    items = calendar.to_dict("records")
+    by_customer: Dict[str, List[Dict]] = defaultdict(list)
+    pools: Dict[Tuple[str, str | None], List[Dict]] = defaultdict(list)
+    for item in items:
+        item["_week"] = week_index.get(item["week_bucket"], -1)
+        by_customer[item["customer_id"]].append(item)
+        owner = item["owner_type"]
+        if item["channel"] not in HUMAN_CHANNELS or item["_week"] < 0:
+            continue
+        branch = customer_branches.get(item["customer_id"])
+        if (owner, branch) in branch_capacities:
+            pools[(owner, branch)].append(item)
+        elif owner in capacities:
+            pools[(owner, None)].append(item)
+
+    for pool_key, pool in sorted(pools.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+        owner, branch = pool_key
+        cap = branch_capacities[pool_key] if branch is not None else capacities[owner]
+        load = [0] * planning_weeks
+        pool.sort(
+            key=lambda it: (
+                it["_week"],
+                -(activity_lookup.get(it["activity_id"], {}).get("Priority", 0) * 100
+                  + CATEGORY_PRECEDENCE_BONUS.get(it["category"], 0)),
+                it["customer_id"],
+                it["activity_id"],
+            )
+        )
+        for item in pool:
+            week = item["_week"]
+            if load[week] < cap:
+                load[week] += 1
+                continue
+            placed = False
+            for shift in _shift_order(max_shift_weeks):
+                target = week + shift
+                if not 0 <= target < planning_weeks or load[target] >= cap:
+                    continue
+                if _move_allowed(item, target, by_customer[item["customer_id"]], activity_lookup, horizon.month_index):
+                    load[target] += 1
+                    item["_week"] = target
+                    item["week_bucket"], item["month_bucket"] = horizon.weeks[target], horizon.months[target]
+                    item["reason_codes"] += "|WARN_CAPACITY_SHIFTED"
+                    placed = True
+                    break
+            if placed:
+                continue
+            fallback = _digital_fallback(activity_lookup.get(item["activity_id"], {}))
+            if fallback is not None:
+                item["channel"] = fallback
+                item["owner_type"] = owner_for_channel(fallback)
+                item["reason_codes"] += "|WARN_CAPACITY_CHANNEL_FALLBACK"
+            else:
+                load[week] += 1
+                item["reason_codes"] += "|WARN_CAPACITY_OVERBOOKED"
+
+    rebalanced = pd.DataFrame(items, columns=list(calendar.columns))
+    return rebalanced.sort_values(["customer_id", "week_bucket", "activity_id"]).reset_index(drop=True)
+
+
+def capacity_utilisation(calendar: pd.DataFrame, capacities: Mapping[str, int]) -> pd.DataFrame:
+    """Human-channel items against capacity per owner type and week."""
+    human = calendar[calendar["channel"].isin(HUMAN_CHANNELS) & calendar["owner_type"].isin(list(capacities))]
+    usage = human.groupby(["owner_type", "week_bucket"]).size().reset_index(name="items")
+    usage["capacity"] = usage["owner_type"].map(capacities)
+    usage["over_capacity"] = (usage["items"] - usage["capacity"]).clip(lower=0)
+    return usage
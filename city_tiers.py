@@ -0,0 +1,98 @@
+"""City-tier resolution from PIN-code ranges, with city names as a fallback.
+
+The reference table (``data/reference/pin_city_tiers.csv``) lists inclusive
+``pin_start``–``pin_end`` ranges with their city and tier. It is loaded once
+into a :class:`PinTierIndex` of sorted, non-overlapping intervals; lookups are a
+single ``numpy.searchsorted`` over the whole PIN column.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingest import D365_CITY_TIER, ValidationError
+
+DEFAULT_PIN_TABLE = Path(__file__).resolve().parent / "data" / "reference" / "pin_city_tiers.csv"
+PIN_TABLE_COLUMNS = ["pin_start", "pin_end", "city", "city_tier"]
+
+
+@dataclass(frozen=True)
+class PinTierIndex:
+    starts: np.ndarray
+    ends: np.ndarray
+    cities: np.ndarray
+    tiers: np.ndarray
+
+    @classmethod
+    def from_frame(cls, table: pd.DataFrame) -> "PinTierIndex":
+        missing = [column for column in PIN_TABLE_COLUMNS if column not in table.columns]
+        if missing:
+            raise ValidationError(f"PIN tier table missing columns: {', '.join(missing)}")
+        table = table.sort_values("pin_start").reset_index(drop=True)
+        starts = table["pin_start"].to_numpy(dtype=np.int64)
+        ends = table["pin_end"].to_numpy(dtype=np.int64)
+        if (ends < starts).any():
+            raise ValidationError("PIN tier table has ranges ending before they start")
+        overlaps = starts[1:] <= ends[:-1]
+        if overlaps.any():
+            first = int(np.argmax(overlaps))
+            raise ValidationError(
+                f"PIN tier table ranges overlap: {starts[first]}-{ends[first]} and {starts[first + 1]}-{ends[first + 1]}"
+            )
+        bad_tiers = sorted(set(table["city_tier"]) - D365_CITY_TIER)
+        if bad_tiers:
+            raise ValidationError(f"PIN tier table has invalid tiers: {', '.join(map(str, bad_tiers))}")
+        return cls(
+            starts=starts,
+            ends=ends,
+            cities=table["city"].to_numpy(dtype=object),
+            tiers=table["city_tier"].to_numpy(dtype=object),
+        )
+
+    def positions(self, pins: pd.Series) -> np.ndarray:
+        """Interval number of each PIN, or -1 for missing or unlisted PINs."""
+        values = pd.to_numeric(pins, errors="coerce").to_numpy(dtype=float)
+        if not len(self.starts):
+            return np.full(len(values), -1, dtype=np.int64)
+        known = ~np.isnan(values)
+        numbers = np.where(known, values, -1).astype(np.int64)
+        found = np.searchsorted(self.starts, numbers, side="right") - 1
+        hit = known & (found >= 0) & (numbers <= self.ends[np.maximum(found, 0)])
+        return np.where(hit, found, -1)
+
+    def lookup(self, pins: pd.Series) -> pd.Series:
+        """Tier of each PIN; missing or unlisted PINs give ``None``."""
+        found = self.positions(pins)
+        tiers = np.full(len(found), None, dtype=object)
+        tiers[found >= 0] = self.tiers[found[found >= 0]]
+        return pd.Series(tiers, index=pins.index, dtype=object)
+
+
+@lru_cache(maxsize=8)
+def load_pin_tier_index(path: str = str(DEFAULT_PIN_TABLE)) -> PinTierIndex:
+    return PinTierIndex.from_frame(pd.read_csv(path))
+
+
+def default_pin_tier_index() -> PinTierIndex | None:
+    """The bundled reference table's index, or ``None`` when it is not shipped."""
+    return load_pin_tier_index() if DEFAULT_PIN_TABLE.exists() else None
+
+
+def resolve_city_tiers(
+    pins: pd.Series | None, cities: pd.Series, index: PinTierIndex | None, city_to_tier
+) -> pd.Series:
+    """Tier per row from its PIN, falling back to ``city_to_tier`` on the city name."""
+    if pins is not None and index is not None:
+        tiers = index.lookup(pins)
+    else:
+        tiers = pd.Series(None, index=cities.index, dtype=object)
+    fallback = tiers.isna().to_numpy()
+    if fallback.any():
+        unresolved = cities[fallback]
+        names = unresolved.drop_duplicates()
+        tiers[fallback] = unresolved.map(dict(zip(names, map(city_to_tier, names)))).to_numpy()
+    return tiers
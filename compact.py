@@ -0,0 +1,225 @@
+"""Compact engine outputs: interned IDs, coded dimensions and reason-code bitmasks.
+
+Strings are kept once in small lookup tables that travel with the codes and are
+only materialised again by :meth:`CompactOutputs.decode_calendar` and
+:meth:`CompactOutputs.decode_decision_log`, which reproduce
+:func:`calendar_engine.run_calendar_engine` frames exactly.
+"""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calendar_engine import (
+    CALENDAR_COLUMNS,
+    DECISION_LOG_COLUMNS,
+    PLANNING_WEEKS,
+    REASON_CODES,
+    CompiledLibrary,
+    HorizonTable,
+    compile_activity_library,
+    horizon_table,
+    schedule_customer,
+)
+
+# codes in the order the engine and capacity pass append them, so decoding a
+# mask rebuilds the original pipe-joined string; the rest follow alphabetically
+_EMISSION_ORDER = (
+    "PASS_ELIGIBILITY",
+    "PASS_MODIFIER",
+    "WARN_CAP_FALLBACK_DEFAULT",
+    "PASS_CAP",
+    "PASS_SCHEDULE",
+    "WARN_VARIETY_KEY_RECENT_SOFT",
+    "WARN_CAPACITY_SHIFTED",
+    "WARN_CAPACITY_CHANNEL_FALLBACK",
+    "WARN_CAPACITY_OVERBOOKED",
+)
+REASON_ORDER: Tuple[str, ...] = _EMISSION_ORDER + tuple(sorted(REASON_CODES - set(_EMISSION_ORDER)))
+REASON_BITS: Dict[str, int] = {code: 1 << bit for bit, code in enumerate(REASON_ORDER)}
+
+
+@lru_cache(maxsize=4096)
+def reason_mask(reason_codes: str) -> int:
+    """Bitmask for a pipe-joined reason-code string."""
+    mask = 0
+    for code in reason_codes.split("|"):
+        if code:
+            mask |= REASON_BITS[code]
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def decode_reason_mask(mask: int) -> str:
+    return "|".join(code for code in REASON_ORDER if mask & REASON_BITS[code])
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def categorical(self, codes: array) -> pd.Categorical:
+        dtype = np.int16 if codes.typecode == "h" else np.int32
+        return pd.Categorical.from_codes(np.frombuffer(codes, dtype=dtype), categories=self.values)
+
+
+@dataclass
+class CompactOutputs:
+    """Coded calendar and decision log plus the lookup tables needed to decode them.
+
+    ``calendar`` holds ``customer``, ``week`` and ``activity`` integer codes,
+    categorical ``channel``/``owner_type`` and an int64 ``reasons`` bitmask;
+    ``decision_log`` holds ``customer``/``activity`` codes, categorical
+    ``stage``/``result``/``reason_code``/``details``. ``customers`` maps customer codes to IDs and ``activities`` maps activity codes (sorted
+    ActivityID order) to ID, name, category and sub-category.
+    """
+
+    calendar: pd.DataFrame
+    decision_log: pd.DataFrame
+    customers: np.ndarray
+    activities: pd.DataFrame
+    horizon: HorizonTable
+
+    def memory_usage(self) -> int:
+        lookups = self.activities.memory_usage(deep=True).sum() + sum(len(str(c)) for c in self.customers)
+        return int(
+            self.calendar.memory_usage(deep=True).sum() + self.decision_log.memory_usage(deep=True).sum() + lookups
+        )
+
+    def _activity_columns(self, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        table = self.activities
+        return {
+            "activity_id": table["ActivityID"].to_numpy()[codes],
+            "activity_name": table["ActivityName"].to_numpy()[codes],
+            "category": table["Category"].to_numpy()[codes],
+            "sub_category": table["SubCategory"].to_numpy()[codes],
+        }
+
+    def decode_calendar(self) -> pd.DataFrame:
+        if self.calendar.empty:
+            return pd.DataFrame(columns=CALENDAR_COLUMNS)
+        weeks = self.calendar["week"].to_numpy()
+        activity = self._activity_columns(self.calendar["activity"].to_numpy())
+        masks = self.calendar["reasons"]
+        decoded = pd.DataFrame(
+            {
+                "customer_id": self.customers[self.calendar["customer"].to_numpy()],
+                "week_bucket": np.asarray(self.horizon.weeks, dtype=object)[weeks],
+                "month_bucket": np.asarray(self.horizon.months, dtype=object)[weeks],
+                "activity_id": activity["activity_id"],
+                "category": activity["category"],
+                "sub_category": activity["sub_category"],
+                "channel": self.calendar["channel"].astype(object).to_numpy(),
+                "owner_type": self.calendar["owner_type"].astype(object).to_numpy(),
+                "reason_codes": masks.map({mask: decode_reason_mask(mask) for mask in masks.unique()}).to_numpy(),
+            }
+        )
+        return decoded[CALENDAR_COLUMNS]
+
+    def decode_decision_log(self) -> pd.DataFrame:
+        if self.decision_log.empty:
+            return pd.DataFrame(columns=DECISION_LOG_COLUMNS)
+        activity = self._activity_columns(self.decision_log["activity"].to_numpy())
+        decoded = pd.DataFrame(
+            {
+                "customer_id": self.customers[self.decision_log["customer"].to_numpy()],
+                "activity_id": activity["activity_id"],
+                "activity_name": activity["activity_name"],
+                "category": activity["category"],
+                "sub_category": activity["sub_category"],
+                "stage": self.decision_log["stage"].astype(object).to_numpy(),
+                "result": self.decision_log["result"].astype(object).to_numpy(),
+                "reason_code": self.decision_log["reason_code"].astype(object).to_numpy(),
+                "details": self.decision_log["details"].astype(object).to_numpy(),
+            }
+        )
+        return decoded[DECISION_LOG_COLUMNS]
+
+
+def run_calendar_engine_compact(
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    progress: Callable[[int, int], None] | None = None,
+    build_log: bool = True,
+) -> CompactOutputs:
+    """:func:`calendar_engine.run_calendar_engine` emitting :class:`CompactOutputs`.
+
+    Each customer's rows are coded as soon as they are scheduled, so the full
+    string frames are never built. ``build_log=False`` leaves the log empty.
+    """
+    library = compile_activity_library(activities)
+    horizon = horizon_table(reference_date, planning_weeks)
+    table = (
+        library.frame[["ActivityID", "ActivityName", "Category", "SubCategory"]]
+        .sort_values("ActivityID")
+        .reset_index(drop=True)
+    )
+    activity_codes = {aid: code for code, aid in enumerate(table["ActivityID"])}
+    week_codes = {week: code for code, week in enumerate(horizon.weeks)}
+    channels, owners, stages, results, reasons, details = (_Interner() for _ in range(6))
+
+    cal_customer, cal_week, cal_activity = array("i"), array("h"), array("i")
+    cal_channel, cal_owner, cal_reasons = array("h"), array("h"), array("q")
+    log_customer, log_activity = array("i"), array("i")
+    log_stage, log_result, log_reason = array("h"), array("h"), array("h")
+    log_details = array("i")
+
+    customers = customer_profiles.sort_values("CustomerID").to_dict("records")
+    total_customers = len(customers)
+    for customer_code, customer in enumerate(customers):
+        calendar_rows, log_rows = schedule_customer(customer, library, horizon, build_log)
+        for row in calendar_rows:  # already in week order, one item per week
+            cal_customer.append(customer_code)
+            cal_week.append(week_codes[row["week_bucket"]])
+            cal_activity.append(activity_codes[row["activity_id"]])
+            cal_channel.append(channels(row["channel"]))
+            cal_owner.append(owners(row["owner_type"]))
+            cal_reasons.append(reason_mask(row["reason_codes"]))
+        for row in sorted(log_rows, key=lambda row: activity_codes[row["activity_id"]]):
+            log_customer.append(customer_code)
+            log_activity.append(activity_codes[row["activity_id"]])
+            log_stage.append(stages(row["stage"]))
+            log_result.append(results(row["result"]))
+            log_reason.append(reasons(row["reason_code"]))
+            log_details.append(details(row["details"]))
+        if progress is not None:
+            progress(customer_code + 1, total_customers)
+
+    calendar = pd.DataFrame(
+        {
+            "customer": np.frombuffer(cal_customer, dtype=np.int32),
+            "week": np.frombuffer(cal_week, dtype=np.int16),
+            "activity": np.frombuffer(cal_activity, dtype=np.int32),
+            "channel": channels.categorical(cal_channel),
+            "owner_type": owners.categorical(cal_owner),
+            "reasons": np.frombuffer(cal_reasons, dtype=np.int64),
+        }
+    )
+    decision_log = pd.DataFrame(
+        {
+            "customer": np.frombuffer(log_customer, dtype=np.int32),
+            "activity": np.frombuffer(log_activity, dtype=np.int32),
+            "stage": stages.categorical(log_stage),
+            "result": results.categorical(log_result),
+            "reason_code": reasons.categorical(log_reason),
+            "details": details.categorical(log_details),
+        }
+    )
+    customer_ids = np.array([customer["CustomerID"] for customer in customers], dtype=object)
+    return CompactOutputs(calendar, decision_log, customer_ids, table, horizon)
@@ -6,6 +6,7 @@ from typing import Tuple
 
 import pandas as pd
 
+from city_tiers import PinTierIndex, default_pin_tier_index, resolve_city_tiers
 from ingest import ValidationError
 
 
@@ -44,6 +45,34 @@ OCCUPATION_MAP = {
 
 KIDS_RELATIONSHIPS = {"Son", "Daughter", "Child"}
 
+# prepared Pragati/D365 columns derive_base_profile reads; batch runs project their reads to these
+PRAGATI_PROFILE_INPUTS = (
+    "CustomerID",
+    "CustomerName",
+    "DOB",
+    "PolicyIssuanceDate",
+    "AnnualPremium",
+    "AnnualIncome",
+    "City",
+    "PIN",
+    "Occupation",
+    "NomineeRelationship",
+    "NomineeAge",
+)
+D365_PROFILE_INPUTS = (
+    "CustomerID",
+    "SafariPersona",
+    "LifeStage",
+    "PoliciesPP",
+    "PoliciesRPU",
+    "PoliciesFPU",
+    "PoliciesSurrendered",
+    "PoliciesTotalEver",
+    "ConsentStatus",
+    "PrimaryChannel",
+    "RenewalBucket",
+)
+
 
 def _coerce_unique(df: pd.DataFrame, key: str, source: str) -> None:
     duplicates = df[df.duplicated(subset=[key], keep=False)][key].unique()
@@ -113,7 +142,18 @@ def _pti_band(premium: float, income: float) -> str:
     return _band_value(ratio, PTI_BANDS)
 
 
-def build_customer_profile(pragati_df: pd.DataFrame, d365_df: pd.DataFrame, as_of_date: datetime | None = None) -> pd.DataFrame:
+def derive_base_profile(
+    pragati_df: pd.DataFrame, d365_df: pd.DataFrame, pin_index: PinTierIndex | None = None
+) -> pd.DataFrame:
+    """Date-independent part of :func:`build_customer_profile`.
+
+    CityTier comes from the PIN-range table (``pin_index``, by default the
+    bundled one) and falls back to the city name for unlisted PINs.
+
+    Age, PolicyVintage, RelationshipVintage and the derived RenewalBucket are
+    added per as-of date by :func:`apply_as_of`; RenewalBucket holds the D365
+    value until then.
+    """
     # Aggregate Pragati at customer level when multiple policies exist
     if pragati_df.duplicated(subset=["CustomerID"]).any():
         aggregated = []
@@ -141,17 +181,14 @@ def build_customer_profile(pragati_df: pd.DataFrame, d365_df: pd.DataFrame, as_o
     if "SafariPersona_D365" in merged.columns:
         merged["SafariPersona"] = merged["SafariPersona_D365"]
 
-    today = pd.Timestamp(as_of_date.date() if as_of_date else datetime.utcnow().date())
-    merged["Age"] = ((today - merged["DOB"]).dt.days // 365).astype(int)
-
     merged["PremiumToIncomeBand"] = merged.apply(
         lambda row: _pti_band(float(row["AnnualPremium"]), float(row["AnnualIncome"])), axis=1
     )
 
-    merged["PolicyVintage"] = merged["PolicyIssuanceDate"].apply(lambda d: _policy_vintage(d, today))
-    merged["RelationshipVintage"] = merged["RelationshipStart"].apply(lambda d: _policy_vintage(d, today))
-
-    merged["CityTier"] = merged["City"].apply(_city_to_tier)
+    pins = merged["PIN"] if "PIN" in merged.columns else merged.get("PIN_Pragati")
+    merged["CityTier"] = resolve_city_tiers(
+        pins, merged["City"], default_pin_tier_index() if pin_index is None else pin_index, _city_to_tier
+    )
     merged["OccupationType"] = merged["Occupation"].apply(_occupation_type)
 
     merged["KidsFlag"], merged["KidsAgeBand"] = zip(*merged.apply(
@@ -163,13 +200,8 @@ def build_customer_profile(pragati_df: pd.DataFrame, d365_df: pd.DataFrame, as_o
         axis=1,
     )
 
-    merged["RenewalBucket"] = merged.apply(
-        lambda row: _derive_renewal_bucket(
-            policy_months=max(((today - row["PolicyIssuanceDate"]).days // 30), 0),
-            provided=row.get("RenewalBucket"),
-        ),
-        axis=1,
-    )
+    if "RenewalBucket" not in merged.columns:
+        merged["RenewalBucket"] = None
 
     merged["PortfolioComposition"] = merged.apply(
         lambda row: {
@@ -189,6 +221,41 @@ def build_customer_profile(pragati_df: pd.DataFrame, d365_df: pd.DataFrame, as_o
     return merged
 
 
+def apply_as_of(base: pd.DataFrame, as_of_date: datetime | None = None) -> pd.DataFrame:
+    """Profile at ``as_of_date`` from a :func:`derive_base_profile` frame, which is left unchanged."""
+    today = pd.Timestamp(as_of_date.date() if as_of_date else datetime.utcnow().date())
+    profile = base.copy()
+
+    profile.insert(
+        profile.columns.get_loc("PremiumToIncomeBand"), "Age", ((today - profile["DOB"]).dt.days // 365).astype(int)
+    )
+
+    # vintages and renewal buckets depend only on day counts, so each distinct count is banded once
+    vintage_at = profile.columns.get_loc("CityTier")
+    for offset, (column, start) in enumerate(
+        (("PolicyVintage", "PolicyIssuanceDate"), ("RelationshipVintage", "RelationshipStart"))
+    ):
+        days = (today - profile[start]).dt.days
+        bands = {value: _band_value(value, POLICY_VINTAGE_BUCKETS) for value in days.unique()}
+        profile.insert(vintage_at + offset, column, days.map(bands))
+
+    months = ((today - profile["PolicyIssuanceDate"]).dt.days // 30).clip(lower=0)
+    derived = months.map({value: _derive_renewal_bucket(value, None) for value in months.unique()})
+    provided = base["RenewalBucket"]
+    keep = provided.map(lambda value: bool(isinstance(value, str) and value.strip()))
+    profile["RenewalBucket"] = provided.where(keep, derived)
+    return profile
+
+
+def build_customer_profile(
+    pragati_df: pd.DataFrame,
+    d365_df: pd.DataFrame,
+    as_of_date: datetime | None = None,
+    pin_index: PinTierIndex | None = None,
+) -> pd.DataFrame:
+    return apply_as_of(derive_base_profile(pragati_df, d365_df, pin_index), as_of_date)
+
+
 def profile_columns() -> Tuple[str, ...]:
     return (
         "CustomerID",
@@ -0,0 +1,134 @@
+"""Owner- and channel-partitioned dispatch feeds cut from the engagement calendar.
+
+The call centre, RM app, branch ops and each digital push system read only their
+own slice: calendar rows are appended to one CSV per ``owner_type`` × ``channel``
+× ``week_bucket`` under ``dispatch_<ts>/`` as batches are exported, and
+``dispatch_index.csv`` lists every partition with its row count and relative
+path. Partition files keep the calendar columns and, since batches arrive in
+CustomerID order, the calendar's row order.
+
+Example::
+
+    python dispatch.py data/output/engagement_calendar_<ts>.csv --output-dir data/output
+    python dispatch.py --read data/output/dispatch_<ts> --owner-type RM --channel RMVisit
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+from urllib.parse import quote
+
+import pandas as pd
+
+from export import COMPRESSION_SUFFIXES, _open_text
+from ingest import timestamp_label
+
+PARTITION_KEYS = ("owner_type", "channel", "week_bucket")
+INDEX_COLUMNS = [*PARTITION_KEYS, "rows", "path"]
+INDEX_NAME = "dispatch_index.csv"
+READ_CHUNK_ROWS = 200_000
+
+
+def partition_path(key: Tuple[str, str, str], compression: str | None = None) -> str:
+    """Relative path of a partition; values are percent-encoded (``Event / Webinar`` has a slash)."""
+    owner, channel, week = (quote(str(value), safe="") for value in key)
+    return f"owner_type={owner}/channel={channel}/week_bucket={week}.csv{COMPRESSION_SUFFIXES[compression]}"
+
+
+class DispatchFeeds:
+    """Appends calendar batches to their partitions; :meth:`close` writes the index."""
+
+    def __init__(self, directory: str | Path, compression: str | None = None) -> None:
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.rows: Dict[Tuple[str, str, str], int] = {}
+
+    def write(self, calendar: pd.DataFrame) -> None:
+        if calendar.empty:
+            return
+        for key, rows in calendar.groupby(list(PARTITION_KEYS), sort=False, dropna=False):
+            first = key not in self.rows
+            path = self.directory / partition_path(key, self.compression)
+            if first:
+                path.parent.mkdir(parents=True, exist_ok=True)
+            # compressed appends add a new stream, which the gzip/bz2/lzma readers concatenate
+            with _open_text(path, self.compression, mode="w" if first else "a") as handle:
+                rows.to_csv(handle, index=False, header=first)
+            self.rows[key] = self.rows.get(key, 0) + len(rows)
+
+    def index(self) -> pd.DataFrame:
+        rows = [(*key, count, partition_path(key, self.compression)) for key, count in self.rows.items()]
+        return pd.DataFrame(rows, columns=INDEX_COLUMNS).sort_values(list(PARTITION_KEYS)).reset_index(drop=True)
+
+    def close(self) -> str:
+        """Write ``dispatch_index.csv`` atomically and return its path."""
+        path = self.directory / INDEX_NAME
+        handle, temp = tempfile.mkstemp(dir=self.directory, prefix=f".{INDEX_NAME}.")
+        try:
+            with os.fdopen(handle, "w", newline="", encoding="utf-8") as out:
+                self.index().to_csv(out, index=False)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        return str(path)
+
+
+def read_index(directory: str | Path) -> pd.DataFrame:
+    return pd.read_csv(Path(directory) / INDEX_NAME, dtype={key: str for key in PARTITION_KEYS})
+
+
+def read_feed(
+    directory: str | Path,
+    owner_type: str | None = None,
+    channel: str | None = None,
+    week_bucket: str | None = None,
+) -> pd.DataFrame:
+    """Rows of the partitions matching the given keys, read via the index only."""
+    index = read_index(directory)
+    for column, value in zip(PARTITION_KEYS, (owner_type, channel, week_bucket)):
+        if value is not None:
+            index = index[index[column] == value]
+    frames = [pd.read_csv(Path(directory) / path, dtype=str, keep_default_na=False) for path in index["path"]]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(PARTITION_KEYS))
+
+
+def partition_calendar(calendar_path: str, output_dir: str, compression: str | None = None) -> str:
+    """Partition an exported calendar CSV in bounded memory; returns the index path."""
+    match = re.search(r"engagement_calendar_(.+?)\.csv", Path(calendar_path).name)
+    ts = match.group(1) if match else timestamp_label()
+    feeds = DispatchFeeds(Path(output_dir) / f"dispatch_{ts}", compression)
+    for chunk in pd.read_csv(calendar_path, dtype=str, keep_default_na=False, chunksize=READ_CHUNK_ROWS):
+        feeds.write(chunk)
+    return feeds.close()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Write or read owner/channel/week dispatch feeds")
+    parser.add_argument("calendar", nargs="?", help="Exported engagement_calendar CSV to partition")
+    parser.add_argument("--output-dir", default="data/output")
+    parser.add_argument("--compression", choices=[c for c in COMPRESSION_SUFFIXES if c], default=None)
+    parser.add_argument("--read", metavar="DISPATCH_DIR", help="Print one slice of an existing dispatch directory")
+    parser.add_argument("--owner-type")
+    parser.add_argument("--channel")
+    parser.add_argument("--week-bucket")
+    args = parser.parse_args(argv)
+    if args.read:
+        print(read_feed(args.read, args.owner_type, args.channel, args.week_bucket).to_csv(index=False), end="")
+        return 0
+    if not args.calendar:
+        parser.error("give a calendar CSV to partition, or --read DISPATCH_DIR")
+    index_path = partition_calendar(args.calendar, args.output_dir, args.compression)
+    print(read_index(Path(index_path).parent).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,153 @@
+"""Calendar-only runs with decision-log rows replayed on demand.
+
+:func:`run_explainable` schedules without building the decision log and keeps
+only each customer's scheduling attributes. Scheduling is deterministic given
+those attributes, the compiled library and the horizon, so any customer's log
+rows are rebuilt exactly by replaying that customer.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import pandas as pd
+
+from calendar_engine import (
+    DECISION_LOG_COLUMNS,
+    DECISION_LOG_SORT_KEYS,
+    PLANNING_WEEKS,
+    SCHEDULING_ATTRIBUTES,
+    CompiledLibrary,
+    HorizonTable,
+    compile_activity_library,
+    horizon_table,
+    run_calendar_engine,
+    schedule_customer,
+)
+
+REPLAY_CACHE_SIZE = 256
+
+
+def customer_state(customer_profiles: pd.DataFrame) -> pd.DataFrame:
+    """Scheduling attributes indexed by CustomerID, with text columns stored as categoricals."""
+    columns = [column for column in SCHEDULING_ATTRIBUTES if column in customer_profiles.columns]
+    state = customer_profiles[columns].set_index("CustomerID", drop=False).sort_index()
+    for column in columns:
+        if column != "CustomerID" and state[column].dtype == object:
+            state[column] = state[column].astype("category")
+    return state
+
+
+@dataclass
+class ExplainableRun:
+    calendar: pd.DataFrame
+    customers: pd.DataFrame
+    library: CompiledLibrary
+    horizon: HorizonTable
+    _replays: "OrderedDict[str, List[Dict]]" = field(default_factory=OrderedDict, repr=False)
+
+    def _replay(self, customer_id: str) -> List[Dict]:
+        rows = self._replays.get(customer_id)
+        if rows is not None:
+            self._replays.move_to_end(customer_id)
+            return rows
+        if customer_id not in self.customers.index:
+            raise KeyError(f"Unknown customer {customer_id}")
+        customer = self.customers.loc[customer_id].to_dict()
+        rows = schedule_customer(customer, self.library, self.horizon)[1]
+        rows.sort(key=lambda row: tuple(row[key] for key in DECISION_LOG_SORT_KEYS))
+        self._replays[customer_id] = rows
+        if len(self._replays) > REPLAY_CACHE_SIZE:
+            self._replays.popitem(last=False)
+        return rows
+
+    def explain(self, customer_id: str, activity_id: str) -> Dict:
+        """Decision-log row for one customer × activity."""
+        for row in self._replay(customer_id):
+            if row["activity_id"] == activity_id:
+                return dict(row)
+        raise KeyError(f"Unknown activity {activity_id}")
+
+    def explain_customer(self, customer_id: str) -> pd.DataFrame:
+        return pd.DataFrame(self._replay(customer_id), columns=DECISION_LOG_COLUMNS)
+
+    def iter_decision_log(self, batch_size: int = 1000, customer_ids: Iterable[str] | None = None) -> Iterator[pd.DataFrame]:
+        """Full decision log in sorted batches of ``batch_size`` customers, for explicit exports."""
+        ids = sorted(customer_ids) if customer_ids is not None else list(self.customers.index)
+        for start in range(0, len(ids), max(batch_size, 1)):
+            rows: List[Dict] = []
+            for customer in self.customers.loc[ids[start : start + batch_size]].to_dict("records"):
+                rows.extend(schedule_customer(customer, self.library, self.horizon)[1])
+            yield pd.DataFrame(rows, columns=DECISION_LOG_COLUMNS).sort_values(DECISION_LOG_SORT_KEYS).reset_index(
+                drop=True
+            )
+
+    def decision_log(self, customer_ids: Iterable[str] | None = None) -> pd.DataFrame:
+        batches = list(self.iter_decision_log(customer_ids=customer_ids))
+        if not batches:
+            return pd.DataFrame(columns=DECISION_LOG_COLUMNS)
+        return pd.concat(batches, ignore_index=True)
+
+
+def run_explainable(
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    progress: Callable[[int, int], None] | None = None,
+) -> ExplainableRun:
+    """Schedule the calendar only; decision-log rows are replayed on request."""
+    library = compile_activity_library(activities)
+    calendar, _ = run_calendar_engine(
+        customer_profiles, library, reference_date, planning_weeks, progress=progress, build_log=False
+    )
+    return ExplainableRun(
+        calendar=calendar,
+        customers=customer_state(customer_profiles),
+        library=library,
+        horizon=horizon_table(reference_date, planning_weeks),
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    import argparse
+
+    from activity_library import normalise_activity_library
+    from export import StreamingExporter
+    from ingest import load_activity_library
+
+    parser = argparse.ArgumentParser(description="Replay decision-log rows for a calendar-only run")
+    parser.add_argument("--derived-profile", required=True, help="derived_profile CSV written by the run")
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument("--as-of", required=True, type=lambda v: datetime.strptime(v, "%Y-%m-%d"))
+    parser.add_argument("--planning-weeks", type=int, default=PLANNING_WEEKS)
+    parser.add_argument("--customer", help="CustomerID to explain")
+    parser.add_argument("--activity", help="ActivityID to explain (default: all of the customer's rows)")
+    parser.add_argument("--full-log-dir", help="Export the complete decision log to this directory")
+    args = parser.parse_args(argv)
+
+    profiles = pd.read_csv(args.derived_profile, dtype={"CustomerID": str})
+    library = compile_activity_library(normalise_activity_library(load_activity_library(args.activity_library)))
+    run = ExplainableRun(
+        calendar=pd.DataFrame(),
+        customers=customer_state(profiles),
+        library=library,
+        horizon=horizon_table(args.as_of, args.planning_weeks),
+    )
+    if args.full_log_dir:
+        exporter = StreamingExporter(args.full_log_dir, formats=("csv",))
+        for batch in run.iter_decision_log():
+            exporter.write("decision_log", batch)
+        print(exporter.close()[("decision_log", "csv")])
+    if args.customer:
+        if args.activity:
+            print(pd.Series(run.explain(args.customer, args.activity)).to_string())
+        else:
+            print(run.explain_customer(args.customer).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,12 +2,14 @@
 from __future__ import annotations
 
 import json
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, Tuple
 
 import pandas as pd
 
 from ingest import timestamp_label
+from telemetry import RunTelemetry
 
 
 def _ensure_dir(path: Path) -> None:
@@ -15,8 +17,14 @@ def _ensure_dir(path: Path) -> None:
 
 
 def export_outputs(
-    calendar: pd.DataFrame, decision_log: pd.DataFrame, derived_profile: pd.DataFrame, base_path: str
+    calendar: pd.DataFrame,
+    decision_log: pd.DataFrame,
+    derived_profile: pd.DataFrame,
+    base_path: str,
+    telemetry: RunTelemetry | None = None,
 ) -> Tuple[str, str, str, str, str, str]:
+    """Write CSV and JSON exports; with ``telemetry`` the writes are timed as the
+    ``export`` stage and the run manifest is written alongside them."""
     ts = timestamp_label()
     base = Path(base_path)
     _ensure_dir(base)
@@ -28,13 +36,19 @@ def export_outputs(
     decision_json = base / f"decision_log_{ts}.json"
     derived_json = base / f"derived_profile_{ts}.json"
 
-    calendar.to_csv(calendar_csv, index=False)
-    decision_log.to_csv(decision_csv, index=False)
-    derived_profile.to_csv(derived_csv, index=False)
+    rows = len(calendar) + len(decision_log) + len(derived_profile)
+    with telemetry.stage("export", rows_in=rows) if telemetry else nullcontext() as stage:
+        calendar.to_csv(calendar_csv, index=False)
+        decision_log.to_csv(decision_csv, index=False)
+        derived_profile.to_csv(derived_csv, index=False)
 
-    calendar.to_json(calendar_json, orient="records", date_format="iso")
-    decision_log.to_json(decision_json, orient="records", date_format="iso")
-    derived_profile.to_json(derived_json, orient="records", date_format="iso")
+        calendar.to_json(calendar_json, orient="records", date_format="iso")
+        decision_log.to_json(decision_json, orient="records", date_format="iso")
+        derived_profile.to_json(derived_json, orient="records", date_format="iso")
+        if stage is not None:
+            stage.rows_out = rows
+    if telemetry is not None:
+        telemetry.write(str(base), ts)
 
     return (
         str(calendar_csv),
@@ -44,3 +58,98 @@ def export_outputs(
         str(derived_csv),
         str(derived_json),
     )
+
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+OUTPUT_FORMATS = ("csv", "json")
+
+
+def _open_text(path: Path, compression: str | None, mode: str = "w"):
+    if compression is None:
+        return open(path, mode, newline="", encoding="utf-8")
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(path, f"{mode}t", newline="", encoding="utf-8")
+    if compression == "bz2":
+        import bz2
+
+        return bz2.open(path, f"{mode}t", newline="", encoding="utf-8")
+    if compression == "xz":
+        import lzma
+
+        return lzma.open(path, f"{mode}t", newline="", encoding="utf-8")
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class StreamingExporter:
+    """Appends output batches to timestamped files as they are produced.
+
+    Batches for each artifact must arrive in final sort order; the files are then
+    identical to what :func:`export_outputs` writes for the concatenated frames.
+    With ``dispatch_feeds`` the calendar batches are also appended to the
+    owner/channel/week partitions of ``dispatch_<ts>/`` (see ``dispatch.py``).
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        formats: Tuple[str, ...] = OUTPUT_FORMATS,
+        compression: str | None = None,
+        ts: str | None = None,
+        dispatch_feeds: bool = False,
+    ) -> None:
+        unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unsupported output formats: {unknown}")
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.ts = ts or timestamp_label()
+        self.base = Path(base_path)
+        self.base.mkdir(parents=True, exist_ok=True)
+        self.formats = formats
+        self.compression = compression
+        self._handles: Dict[Tuple[str, str], object] = {}
+        self.paths: Dict[Tuple[str, str], str] = {}
+        self._json_written: set = set()
+        self.rows: Dict[str, int] = {}
+        self.dispatch = None
+        if dispatch_feeds:
+            from dispatch import DispatchFeeds
+
+            self.dispatch = DispatchFeeds(self.base / f"dispatch_{self.ts}", compression)
+
+    def write(self, name: str, frame: pd.DataFrame) -> None:
+        for fmt in self.formats:
+            key = (name, fmt)
+            first = key not in self._handles
+            if first:
+                path = self.base / f"{name}_{self.ts}.{fmt}{COMPRESSION_SUFFIXES[self.compression]}"
+                self._handles[key] = _open_text(path, self.compression)
+                self.paths[key] = str(path)
+            handle = self._handles[key]
+            if fmt == "csv":
+                frame.to_csv(handle, index=False, header=first)
+            else:
+                body = frame.to_json(orient="records", date_format="iso")[1:-1]
+                if first:
+                    handle.write("[")
+                if body:
+                    if key in self._json_written:
+                        handle.write(",")
+                    self._json_written.add(key)
+                    handle.write(body)
+        if self.dispatch is not None and name == "engagement_calendar":
+            self.dispatch.write(frame)
+        self.rows[name] = self.rows.get(name, 0) + len(frame)
+
+    def close(self) -> Dict[Tuple[str, str], str]:
+        for (name, fmt), handle in self._handles.items():
+            if fmt == "json":
+                handle.write("]")
+            handle.close()
+        self._handles = {}
+        if self.dispatch is not None:
+            self.paths[("dispatch_index", "csv")] = self.dispatch.close()
+            self.dispatch = None
+        return dict(self.paths)
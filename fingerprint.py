@@ -0,0 +1,167 @@
+"""Stable per-customer schedule fingerprints, run digests and run-to-run diffs.
+
+A customer's fingerprint is a BLAKE2b hash of their calendar rows and, separately,
+of their decision-log rows, each serialised as text in output order. Hashes
+depend only on the exported values, so in-memory frames and their CSV exports
+fingerprint identically across processes and pandas versions.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+from typing import Dict, Iterable, List, Sequence
+
+import pandas as pd
+
+from calendar_engine import CALENDAR_COLUMNS, DECISION_LOG_COLUMNS
+from verify import DEFAULT_CHUNKSIZE, whole_customer_chunks
+
+FINGERPRINT_COLUMNS = ["customer_id", "calendar_hash", "decision_hash", "fingerprint"]
+DIFF_COLUMNS = ["customer_id", "status", "calendar_changed", "decision_changed"]
+_EMPTY_HASH = hashlib.blake2b(b"", digest_size=8).hexdigest()
+
+
+def _row_text(frame: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    def canonical(column: str) -> pd.Series:
+        values = frame[column].astype(object)
+        return values.where(values.notna(), "").astype(str)
+
+    text = canonical(columns[0])
+    for column in columns[1:]:
+        text = text + "\x1f" + canonical(column)
+    return text
+
+
+def _customer_hashes(frame: pd.DataFrame, columns: Sequence[str]) -> Dict[str, str]:
+    if frame.empty:
+        return {}
+    text = _row_text(frame, columns)
+    return {
+        str(customer_id): hashlib.blake2b("\x1e".join(rows).encode("utf-8"), digest_size=8).hexdigest()
+        for customer_id, rows in text.groupby(frame["customer_id"].astype(str), sort=False)
+    }
+
+
+def _combine(calendar_hashes: Dict[str, str], decision_hashes: Dict[str, str]) -> pd.DataFrame:
+    customers = sorted(set(calendar_hashes) | set(decision_hashes))
+    frame = pd.DataFrame(
+        {
+            "customer_id": customers,
+            "calendar_hash": [calendar_hashes.get(customer, _EMPTY_HASH) for customer in customers],
+            "decision_hash": [decision_hashes.get(customer, _EMPTY_HASH) for customer in customers],
+        }
+    )
+    frame["fingerprint"] = [
+        hashlib.blake2b(f"{cal}:{log}".encode("ascii"), digest_size=8).hexdigest()
+        for cal, log in zip(frame["calendar_hash"], frame["decision_hash"])
+    ]
+    return frame[FINGERPRINT_COLUMNS]
+
+
+def customer_fingerprints(calendar: pd.DataFrame, decision_log: pd.DataFrame | None = None) -> pd.DataFrame:
+    """One row per customer with calendar, decision-log and combined hashes."""
+    log_hashes = _customer_hashes(decision_log, DECISION_LOG_COLUMNS) if decision_log is not None else {}
+    return _combine(_customer_hashes(calendar, CALENDAR_COLUMNS), log_hashes)
+
+
+def _file_hashes(path: str, columns: Sequence[str], chunksize: int) -> Dict[str, str]:
+    hashes: Dict[str, str] = {}
+    chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    for chunk in whole_customer_chunks(chunks):
+        hashes.update(_customer_hashes(chunk, columns))
+    return hashes
+
+
+def fingerprint_files(
+    calendar_path: str, decision_log_path: str | None = None, chunksize: int = DEFAULT_CHUNKSIZE
+) -> pd.DataFrame:
+    """:func:`customer_fingerprints` for customer-sorted CSV exports, read in chunks."""
+    log_hashes = _file_hashes(decision_log_path, DECISION_LOG_COLUMNS, chunksize) if decision_log_path else {}
+    return _combine(_file_hashes(calendar_path, CALENDAR_COLUMNS, chunksize), log_hashes)
+
+
+def run_digest(fingerprints: pd.DataFrame) -> str:
+    """Order-independent SHA-256 over all customer fingerprints."""
+    ordered = fingerprints.sort_values("customer_id")
+    digest = hashlib.sha256()
+    for customer_id, fingerprint in zip(ordered["customer_id"], ordered["fingerprint"]):
+        digest.update(f"{customer_id}:{fingerprint}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def diff_fingerprints(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Customers added, removed or changed between two fingerprint frames."""
+    merged = old.merge(new, on="customer_id", how="outer", suffixes=("_old", "_new"), indicator=True)
+    status = merged["_merge"].astype(str).map({"left_only": "removed", "right_only": "added", "both": "changed"})
+    merged = merged.assign(
+        status=status,
+        calendar_changed=merged["calendar_hash_old"] != merged["calendar_hash_new"],
+        decision_changed=merged["decision_hash_old"] != merged["decision_hash_new"],
+    )
+    differs = (merged["status"] != "changed") | (merged["fingerprint_old"] != merged["fingerprint_new"])
+    return merged.loc[differs, DIFF_COLUMNS].sort_values("customer_id").reset_index(drop=True)
+
+
+def drill_down(old: pd.DataFrame, new: pd.DataFrame, customer_ids: Iterable[str]) -> pd.DataFrame:
+    """Rows of ``customer_ids`` present in only one of two output frames, tagged ``side``."""
+    ids = {str(customer_id) for customer_id in customer_ids}
+    columns = list(old.columns) or list(new.columns)
+    old, new = old.reindex(columns=columns), new.reindex(columns=columns)
+    old = old[old["customer_id"].astype(str).isin(ids)]
+    new = new[new["customer_id"].astype(str).isin(ids)]
+    merged = old.astype(str).merge(new[columns].astype(str), how="outer", on=columns, indicator=True)
+    merged = merged[merged["_merge"] != "both"]
+    merged.insert(0, "side", merged.pop("_merge").astype(str).map({"left_only": "old", "right_only": "new"}))
+    return merged.sort_values(["customer_id", "side"]).reset_index(drop=True)
+
+
+def read_customer_rows(path: str, customer_ids: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """Rows of the given customers from a large CSV export."""
+    ids = {str(customer_id) for customer_id in customer_ids}
+    parts: List[pd.DataFrame] = [
+        chunk[chunk["customer_id"].isin(ids)]
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    ]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Fingerprint engine outputs and diff two runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compute = commands.add_parser("compute", help="Write per-customer fingerprints for one run")
+    compute.add_argument("--calendar", required=True)
+    compute.add_argument("--decision-log")
+    compute.add_argument("--out", required=True)
+
+    diff = commands.add_parser("diff", help="List customers whose fingerprints differ")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--old-calendar", help="Drill into calendar rows of changed customers")
+    diff.add_argument("--new-calendar")
+    diff.add_argument("--limit", type=int, default=20, help="Customers to drill into")
+    args = parser.parse_args(argv)
+
+    if args.command == "compute":
+        fingerprints = fingerprint_files(args.calendar, args.decision_log)
+        fingerprints.to_csv(args.out, index=False)
+        print(f"{len(fingerprints)} customers, digest {run_digest(fingerprints)}")
+        return 0
+
+    old = pd.read_csv(args.old, dtype=str)
+    new = pd.read_csv(args.new, dtype=str)
+    if run_digest(old) == run_digest(new):
+        print("Runs are identical.")
+        return 0
+    changes = diff_fingerprints(old, new)
+    print(changes["status"].value_counts().to_string())
+    print(changes.head(args.limit).to_string(index=False))
+    if args.old_calendar and args.new_calendar:
+        ids = changes.loc[changes["calendar_changed"], "customer_id"].head(args.limit)
+        rows = drill_down(read_customer_rows(args.old_calendar, ids), read_customer_rows(args.new_calendar, ids), ids)
+        print(rows.to_string(index=False))
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
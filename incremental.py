@@ -0,0 +1,338 @@
+"""Delta runs that re-derive and reschedule only customers whose inputs changed.
+
+Each run stores per-customer input fingerprints, the date-independent base
+profiles (:func:`derive.derive_base_profile`), the profiles at the as-of date,
+the normalised library and the spliced outputs in a state directory. The next
+run compares fingerprints and only touches:
+
+- customers whose Pragati or D365 rows (including SR history) changed, or who
+  are new; only they are re-derived. When the as-of date moves, every stored
+  base profile gets fresh ages, vintages and renewal buckets from
+  :func:`derive.apply_as_of`, which is cheap and needs no extracts;
+- of those, customers whose scheduling attributes actually changed;
+- customers for whom an added, removed or edited activity is eligible under
+  either its old or new definition. For everyone else only the decision-log
+  rows of the edited activities are rebuilt.
+
+A change of planning horizon (reference date or number of weeks) reschedules everyone.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence, Set
+
+import pandas as pd
+
+from activity_library import normalise_activity_library
+from calendar_engine import (
+    CALENDAR_SORT_KEYS,
+    DECISION_LOG_SORT_KEYS,
+    PLANNING_WEEKS,
+    SCHEDULING_ATTRIBUTES,
+    compile_activity_library,
+    eligibility_failure,
+    horizon_table,
+    run_calendar_engine,
+    schedule_customer,
+)
+from derive import apply_as_of, derive_base_profile
+from export import export_outputs
+from ingest import prepare_d365, prepare_pragati
+
+STATE_VERSION = 3  # 2: CityTier from PIN ranges; 3: base profiles stored
+_STATE_FILES = (
+    "inputs",
+    "profile_prints",
+    "activities",
+    "bases",
+    "profiles",
+    "library",
+    "calendar",
+    "decision_log",
+)
+
+
+@dataclass
+class IncrementalResult:
+    calendar: pd.DataFrame
+    decision_log: pd.DataFrame
+    profiles: pd.DataFrame
+    rederived: int = 0
+    rescheduled: int = 0
+    log_patched: int = 0
+    removed: int = 0
+    full_reason: str | None = None
+    seconds: float = 0.0
+
+
+def raw_customer_ids(raw: pd.DataFrame) -> pd.Series:
+    """Customer key of each raw extract row (policy-level extracts use ``customer_id``)."""
+    column = "customer_id" if "record_type" in raw.columns else "CustomerID"
+    return raw[column].astype(str)
+
+
+def _row_fingerprints(frame: pd.DataFrame, keys: pd.Series) -> pd.Series:
+    # order-independent per-key combination of row hashes (uint64 sum wraps)
+    hashes = pd.util.hash_pandas_object(frame.astype(str), index=False)
+    return pd.Series(hashes.to_numpy(), index=keys.to_numpy()).groupby(level=0).sum()
+
+
+def input_fingerprints(raw_pragati: pd.DataFrame, raw_d365: pd.DataFrame) -> pd.Series:
+    """One fingerprint per customer present in both extracts, over all of their raw rows."""
+    pragati = _row_fingerprints(raw_pragati, raw_customer_ids(raw_pragati))
+    d365 = _row_fingerprints(raw_d365, raw_customer_ids(raw_d365))
+    both = pd.DataFrame({"pragati": pragati, "d365": d365}).dropna().astype("uint64")
+    return pd.Series(pd.util.hash_pandas_object(both, index=False).to_numpy(), index=both.index, name="input")
+
+
+def _changed_keys(current: pd.Series, previous: pd.Series) -> Set[str]:
+    """Keys that are new in ``current`` or whose fingerprint differs from ``previous``."""
+    common = current.index.intersection(previous.index)
+    differs = current.loc[common].to_numpy() != previous.loc[common].to_numpy()
+    return set(current.index.difference(previous.index)) | set(common[differs])
+
+
+def profile_fingerprints(profiles: pd.DataFrame) -> pd.Series:
+    columns = [column for column in SCHEDULING_ATTRIBUTES if column in profiles.columns]
+    hashes = pd.util.hash_pandas_object(profiles[columns].astype(str), index=False)
+    return pd.Series(hashes.to_numpy(), index=profiles["CustomerID"].astype(str).to_numpy(), name="profile")
+
+
+def activity_fingerprints(raw_library: pd.DataFrame) -> pd.Series:
+    return _row_fingerprints(raw_library, raw_library["activity_id"].astype(str))
+
+
+class IncrementalState:
+    """Previous run's fingerprints, profiles, library and outputs stored under ``state_dir``."""
+
+    def __init__(self, state_dir: str) -> None:
+        self.path = Path(state_dir)
+
+    def exists(self) -> bool:
+        return (self.path / "state.json").exists() and all(
+            (self.path / f"{name}.pkl").exists() for name in _STATE_FILES
+        )
+
+    def load(self) -> Dict:
+        meta = json.loads((self.path / "state.json").read_text(encoding="utf-8"))
+        if meta.get("version") != STATE_VERSION:
+            return {}
+        meta.update({name: pd.read_pickle(self.path / f"{name}.pkl") for name in _STATE_FILES})
+        return meta
+
+    def save(self, meta: Dict, frames: Dict[str, pd.DataFrame]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in _STATE_FILES:
+            frames[name].to_pickle(self.path / f"{name}.pkl")
+        # written last so a crash mid-save leaves the previous metadata pointing at a full run
+        (self.path / "state.json").write_text(json.dumps({"version": STATE_VERSION, **meta}), encoding="utf-8")
+
+
+def _derive_bases(raw_pragati: pd.DataFrame, raw_d365: pd.DataFrame, ids: Set[str]) -> pd.DataFrame:
+    if not ids:
+        return pd.DataFrame(columns=["CustomerID"])
+    pragati = prepare_pragati(raw_pragati[raw_customer_ids(raw_pragati).isin(ids)].copy())
+    d365 = prepare_d365(raw_d365[raw_customer_ids(raw_d365).isin(ids)].copy())
+    bases = derive_base_profile(pragati, d365)
+    bases["CustomerID"] = bases["CustomerID"].astype(str)
+    return bases
+
+
+def _at(bases: pd.DataFrame, as_of: datetime) -> pd.DataFrame:
+    return apply_as_of(bases, as_of) if not bases.empty else bases
+
+
+def _library_affected(
+    profiles: pd.DataFrame,
+    candidates: Set[str],
+    old_library: pd.DataFrame,
+    new_library: pd.DataFrame,
+    changed: Set[str],
+) -> Set[str]:
+    """Customers in ``candidates`` for whom a changed activity is eligible before or after the change."""
+    versions = [
+        record
+        for library in (old_library, new_library)
+        for record in compile_activity_library(library[library["ActivityID"].isin(changed)]).records
+    ]
+    affected = set()
+    for customer in profiles[profiles["CustomerID"].isin(candidates)].to_dict("records"):
+        if any(eligibility_failure(customer, activity) is None for activity in versions):
+            affected.add(customer["CustomerID"])
+    return affected
+
+
+def _patched_log_rows(
+    profiles: pd.DataFrame, customer_ids: Set[str], new_library: pd.DataFrame, changed: Set[str], horizon
+) -> pd.DataFrame:
+    # every changed activity is ineligible for these customers, so each call only yields failure rows
+    library = compile_activity_library(new_library[new_library["ActivityID"].isin(changed)])
+    rows: List[Dict] = []
+    for customer in profiles[profiles["CustomerID"].isin(customer_ids)].to_dict("records"):
+        rows.extend(schedule_customer(customer, library, horizon)[1])
+    return pd.DataFrame(rows)
+
+
+def _splice(previous: pd.DataFrame, keep: pd.Series, additions: Sequence[pd.DataFrame], sort_keys: List[str]):
+    parts = [previous[keep]] + [frame for frame in additions if not frame.empty]
+    spliced = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return spliced.sort_values(sort_keys).reset_index(drop=True)
+
+
+def run_incremental(
+    raw_pragati: pd.DataFrame,
+    raw_d365: pd.DataFrame,
+    raw_library: pd.DataFrame,
+    state_dir: str,
+    as_of: datetime,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+) -> IncrementalResult:
+    """Bring the stored outputs up to date with the given raw extracts and library.
+
+    ``reference_date`` anchors the planning horizon and defaults to ``as_of``;
+    keeping it fixed across daily runs lets unchanged customers keep their
+    calendars while the as-of date advances.
+    """
+    started = time.perf_counter()
+    state = IncrementalState(state_dir)
+    previous = state.load() if state.exists() else {}
+    horizon = horizon_table(reference_date or as_of, planning_weeks)
+    as_of_label = as_of.strftime("%Y-%m-%d")
+
+    library = normalise_activity_library(raw_library)
+    compiled = compile_activity_library(library)
+    fingerprints = input_fingerprints(raw_pragati, raw_d365)
+    activities = activity_fingerprints(raw_library)
+    current_ids = set(fingerprints.index)
+
+    full_reason = None if previous else "no previous state"
+    rederive = _changed_keys(fingerprints, previous["inputs"]) if previous else current_ids
+    removed: Set[str] = set(previous["profiles"]["CustomerID"]) - current_ids if previous else set()
+
+    derived = _derive_bases(raw_pragati, raw_d365, rederive)
+    derived_ids = set(derived["CustomerID"])
+    # customers that stopped matching between the extracts drop out like removed ones
+    removed |= rederive - derived_ids
+
+    if previous:
+        stale = rederive | removed
+        bases = _splice(previous["bases"], ~previous["bases"]["CustomerID"].isin(stale), [derived], ["CustomerID"])
+        if previous["as_of"] != as_of_label:
+            # only the as-of columns move; the scheduling fingerprints decide who is rescheduled
+            profiles = _at(bases, as_of)
+            profile_prints = profile_fingerprints(profiles)
+        else:
+            keep_profile = ~previous["profiles"]["CustomerID"].isin(stale)
+            profiles = _splice(previous["profiles"], keep_profile, [_at(derived, as_of)], ["CustomerID"])
+            old_prints = previous["profile_prints"]
+            profile_prints = pd.concat(
+                [old_prints[~old_prints.index.isin(stale)], profile_fingerprints(_at(derived, as_of))]
+            )
+        reschedule = _changed_keys(profile_prints, previous["profile_prints"])
+    else:
+        bases = derived.sort_values("CustomerID").reset_index(drop=True)
+        profiles = _at(bases, as_of)
+        profile_prints = profile_fingerprints(profiles)
+        reschedule = set(derived_ids)
+
+    horizon_changed = bool(previous) and previous["horizon"] != [horizon.weeks[0], len(horizon)]
+    patch_ids: Set[str] = set()
+    changed_activities: Set[str] = set()
+    if horizon_changed:
+        full_reason = full_reason or "planning horizon changed"
+        reschedule = set(profiles["CustomerID"])
+    elif previous:
+        changed_activities = _changed_keys(activities, previous["activities"]) | set(
+            previous["activities"].index.difference(activities.index)
+        )
+        if changed_activities:
+            candidates = set(profiles["CustomerID"]) - reschedule
+            affected = _library_affected(profiles, candidates, previous["library"], library, changed_activities)
+            reschedule |= affected
+            patch_ids = candidates - affected
+
+    calendar, decision_log = run_calendar_engine(
+        profiles[profiles["CustomerID"].isin(reschedule)],
+        compiled,
+        reference_date=reference_date or as_of,
+        planning_weeks=planning_weeks,
+    )
+    if previous:
+        dropped = reschedule | removed
+        calendar = _splice(
+            previous["calendar"], ~previous["calendar"]["customer_id"].isin(dropped), [calendar], CALENDAR_SORT_KEYS
+        )
+        old_log = previous["decision_log"]
+        keep_log = ~old_log["customer_id"].isin(dropped) & ~(
+            old_log["customer_id"].isin(patch_ids) & old_log["activity_id"].isin(changed_activities)
+        )
+        patched = _patched_log_rows(profiles, patch_ids, library, changed_activities, horizon) if patch_ids else None
+        additions = [decision_log] + ([patched] if patched is not None else [])
+        decision_log = _splice(old_log, keep_log, additions, DECISION_LOG_SORT_KEYS)
+
+    state.save(
+        {"as_of": as_of_label, "horizon": [horizon.weeks[0], len(horizon)]},
+        {
+            "inputs": fingerprints,
+            "profile_prints": profile_prints,
+            "activities": activities,
+            "bases": bases,
+            "profiles": profiles,
+            "library": library,
+            "calendar": calendar,
+            "decision_log": decision_log,
+        },
+    )
+    return IncrementalResult(
+        calendar=calendar,
+        decision_log=decision_log,
+        profiles=profiles,
+        rederived=len(derived_ids),
+        rescheduled=len(reschedule),
+        log_patched=len(patch_ids),
+        removed=len(removed),
+        full_reason=full_reason,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from derive import profile_columns
+
+    parser = argparse.ArgumentParser(description="Incremental run touching only changed customers")
+    parser.add_argument("--pragati", required=True)
+    parser.add_argument("--d365", required=True)
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument("--as-of", required=True, type=lambda v: datetime.strptime(v, "%Y-%m-%d"))
+    parser.add_argument("--reference-date", type=lambda v: datetime.strptime(v, "%Y-%m-%d"), help="Horizon anchor")
+    parser.add_argument("--planning-weeks", type=int, default=PLANNING_WEEKS)
+    parser.add_argument("--state-dir", default="data/state")
+    parser.add_argument("--output-dir", default="data/output")
+    args = parser.parse_args(argv)
+
+    result = run_incremental(
+        pd.read_csv(args.pragati),
+        pd.read_csv(args.d365),
+        pd.read_csv(args.activity_library, sep=",", engine="python"),
+        args.state_dir,
+        args.as_of,
+        reference_date=args.reference_date,
+        planning_weeks=args.planning_weeks,
+    )
+    export_outputs(result.calendar, result.decision_log, result.profiles[list(profile_columns())], args.output_dir)
+    print(
+        f"re-derived {result.rederived}, rescheduled {result.rescheduled}, log-patched {result.log_patched}, "
+        f"removed {result.removed} customers in {result.seconds:.2f}s"
+        + (f" (full: {result.full_reason})" if result.full_reason else "")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,10 +2,12 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Set
+from typing import Dict, Iterable, List, Set
 
 import pandas as pd
 
+from sr_timeline import SR_FIELDS, SRTimeline
+
 
 class ValidationError(Exception):
     """Raised when input data fails validation."""
@@ -35,6 +37,31 @@ PRAGATI_REQUIRED_COLUMNS = [
 
 PRAGATI_PLAN_TYPES: Set[str] = {"PAR", "NON-PAR", "ULIP"}
 PRAGATI_POLICY_STATUS: Set[str] = {"Active", "Lapsed", "PaidUp", "Surrendered"}
+PRAGATI_ENUMS: Dict[str, Set[str]] = {"PlanType": PRAGATI_PLAN_TYPES, "PolicyStatus": PRAGATI_POLICY_STATUS}
+PRAGATI_DATE_COLUMNS = ["DOB", "PolicyIssuanceDate", "LastPremiumDate", "NextPremiumDate"]
+PRAGATI_NUMERIC_COLUMNS = ["AnnualPremium", "AnnualIncome", "PolicyTerm", "PremiumPayingTerm", "SumAssured", "NomineeAge"]
+
+# record_type extract column -> Pragati column
+PRAGATI_EXTRACT_RENAMES = {
+    "customer_id": "CustomerID",
+    "policy_issuance_date_ymd": "PolicyIssuanceDate",
+    "plan_type": "PlanType",
+    "annualised_premium": "AnnualPremium",
+    "la_annual_income": "AnnualIncome",
+    "premium_frequency": "PremiumFrequency",
+    "pt": "PolicyTerm",
+    "ppt": "PremiumPayingTerm",
+    "sam": "SumAssured",
+    "la_name": "CustomerName",
+    "la_dob_ymd": "DOB",
+    "la_occupation": "Occupation",
+    "la_city": "City",
+    "la_pin": "PIN",
+    "nominee_relation": "NomineeRelationship",
+    "policy_status": "PolicyStatus",
+}
+# Pragati columns the extract mapping fills in itself
+PRAGATI_EXTRACT_DERIVED = ["LastPremiumDate", "NextPremiumDate", "NomineeAge"]
 
 D365_REQUIRED_COLUMNS = [
     "CustomerID",
@@ -66,6 +93,34 @@ D365_KIDS_AGE_BAND: Set[str] = {"0-5", "6-15", "16-22", "22+", "Unknown"}
 D365_CITY_TIER: Set[str] = {"Metro", "Tier1", "Tier2", "Tier3/4", "Unknown"}
 D365_OCCUPATION: Set[str] = {"Salaried", "Business", "Professional", "Retired", "Homemaker", "Student", "Unknown"}
 D365_PTI: Set[str] = {"Light", "Comfortable", "Heavy", "Stretched", "Unknown"}
+D365_ENUMS: Dict[str, Set[str]] = {
+    "ConsentStatus": D365_CONSENT_VALUES,
+    "RiskTier": D365_RISK_TIERS,
+    "SafariPersona": D365_SAFARI_PERSONA,
+    "LifeStage": D365_LIFESTAGE,
+    "RenewalBucket": D365_RENEWAL_BUCKETS,
+}
+# validated only when the extract carries them
+D365_OPTIONAL_ENUMS: Dict[str, Set[str]] = {
+    "KidsFlag": D365_KIDS_FLAG,
+    "KidsAgeBand": D365_KIDS_AGE_BAND,
+    "CityTier": D365_CITY_TIER,
+    "OccupationType": D365_OCCUPATION,
+    "PremiumToIncomeBand": D365_PTI,
+}
+D365_DATE_COLUMNS = ["LastEngagementDate"]
+D365_NUMERIC_COLUMNS = ["PoliciesPP", "PoliciesRPU", "PoliciesFPU", "PoliciesSurrendered", "PoliciesTotalEver"]
+# columns a record_type D365 extract needs for the per-customer mapping
+D365_EXTRACT_COLUMNS = ["customer_id", "policy_issuance_date_ymd", "la_dob_ymd", "policy_status"]
+# every raw column map_d365_extract reads, including the optional ones and the SR events
+D365_EXTRACT_SOURCES = [
+    "record_type",
+    *D365_EXTRACT_COLUMNS,
+    "SafariPersona",
+    "renewal_bucket",
+    "SR_date",
+    *SR_FIELDS,
+]
 
 ACTIVITY_REQUIRED_COLUMNS = [
     "ActivityID",
@@ -109,8 +164,12 @@ def _require_columns(df: pd.DataFrame, required: List[str], source: str) -> None
         raise ValidationError(f"{source} missing columns: {', '.join(missing)}")
 
 
+def invalid_enum_values(values: pd.Series, allowed: Set[str]) -> List:
+    return sorted({value for value in values.dropna().unique() if value not in allowed})
+
+
 def _validate_enums(df: pd.DataFrame, column: str, allowed: Set[str], source: str) -> None:
-    bad_values = sorted({value for value in df[column].dropna().unique() if value not in allowed})
+    bad_values = invalid_enum_values(df[column], allowed)
     if bad_values:
         raise ValidationError(
             f"{source} column '{column}' has invalid values: {', '.join(map(str, bad_values))}. "
@@ -134,31 +193,54 @@ def _require_numeric(df: pd.DataFrame, columns: List[str], source: str) -> None:
             raise ValidationError(f"{source} field '{field}' must be numeric.")
 
 
-def load_pragati(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+def pragati_read_columns(columns: Iterable[str] = ()) -> Set[str]:
+    """Raw header names to parse so :func:`prepare_pragati` can validate and yield the prepared ``columns``.
+
+    Names for both extract layouts are included; absent ones are simply not read.
+    """
+    wanted = set(PRAGATI_REQUIRED_COLUMNS) | set(columns)
+    sources = {source for source, target in PRAGATI_EXTRACT_RENAMES.items() if target in wanted}
+    return wanted | sources | {"record_type"}
+
+
+def d365_read_columns(columns: Iterable[str] = ()) -> Set[str]:
+    """Raw header names to parse so :func:`prepare_d365` can validate and yield the prepared ``columns``."""
+    return set(D365_REQUIRED_COLUMNS) | set(D365_OPTIONAL_ENUMS) | set(columns) | set(D365_EXTRACT_SOURCES)
+
+
+def read_projected(path, read_columns: Set[str] | None = None) -> pd.DataFrame:
+    """``pd.read_csv`` that parses only the header names in ``read_columns`` (every column when None)."""
+    return pd.read_csv(path, usecols=None if read_columns is None else read_columns.__contains__)
+
+
+def load_pragati(path: str, columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """Load and validate a Pragati extract.
+
+    With ``columns`` (prepared column names the caller needs) the read is
+    projected to those plus the validated columns; other extract columns are
+    never parsed.
+    """
+    return prepare_pragati(read_projected(path, None if columns is None else pragati_read_columns(columns)))
+
+
+def prepare_pragati(df: pd.DataFrame) -> pd.DataFrame:
+    """Map and validate a raw Pragati extract already read into a frame."""
+    df = map_pragati_extract(df)
+    _require_columns(df, PRAGATI_REQUIRED_COLUMNS, "Pragati")
+    for column, allowed in PRAGATI_ENUMS.items():
+        _validate_enums(df, column, allowed, "Pragati")
+    df = _parse_dates(df, PRAGATI_DATE_COLUMNS, "Pragati")
+    _require_numeric(df, PRAGATI_NUMERIC_COLUMNS, "Pragati")
+    return df
+
+
+def map_pragati_extract(df: pd.DataFrame) -> pd.DataFrame:
+    """Map a policy-level record_type extract onto the Pragati columns; other frames pass through."""
 
     # Allow policy-level extracts with record_type + extended fields
     if "record_type" in df.columns:
         policy_df = df[df["record_type"].str.upper() == "POLICY"].copy()
-        rename_map = {
-            "customer_id": "CustomerID",
-            "policy_issuance_date_ymd": "PolicyIssuanceDate",
-            "plan_type": "PlanType",
-            "annualised_premium": "AnnualPremium",
-            "la_annual_income": "AnnualIncome",
-            "premium_frequency": "PremiumFrequency",
-            "pt": "PolicyTerm",
-            "ppt": "PremiumPayingTerm",
-            "sam": "SumAssured",
-            "la_name": "CustomerName",
-            "la_dob_ymd": "DOB",
-            "la_occupation": "Occupation",
-            "la_city": "City",
-            "la_pin": "PIN",
-            "nominee_relation": "NomineeRelationship",
-            "policy_status": "PolicyStatus",
-        }
-        policy_df = policy_df.rename(columns=rename_map)
+        policy_df = policy_df.rename(columns=PRAGATI_EXTRACT_RENAMES)
 
         # Normalise plan/status values
         policy_df["PlanType"] = policy_df["PlanType"].str.replace("_", "-").str.upper()
@@ -181,21 +263,33 @@ def load_pragati(path: str) -> pd.DataFrame:
             policy_df["NomineeAge"] = 0
 
         df = policy_df
+    return df
 
-    _require_columns(df, PRAGATI_REQUIRED_COLUMNS, "Pragati")
-    _validate_enums(df, "PlanType", PRAGATI_PLAN_TYPES, "Pragati")
-    _validate_enums(df, "PolicyStatus", PRAGATI_POLICY_STATUS, "Pragati")
-    df = _parse_dates(df, ["DOB", "PolicyIssuanceDate", "LastPremiumDate", "NextPremiumDate"], "Pragati")
-    _require_numeric(df, ["AnnualPremium", "AnnualIncome", "PolicyTerm", "PremiumPayingTerm", "SumAssured", "NomineeAge"], "Pragati")
+
+def load_d365(path: str, columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """Load and validate a D365 extract; ``columns`` projects the read as in :func:`load_pragati`."""
+    return prepare_d365(read_projected(path, None if columns is None else d365_read_columns(columns)))
+
+
+def prepare_d365(df: pd.DataFrame) -> pd.DataFrame:
+    """Map and validate a raw D365 extract already read into a frame."""
+    df = map_d365_extract(df)
+    _require_columns(df, D365_REQUIRED_COLUMNS, "D365")
+    for column, allowed in D365_ENUMS.items():
+        _validate_enums(df, column, allowed, "D365")
+    for derived_field, allowed in D365_OPTIONAL_ENUMS.items():
+        if derived_field in df.columns:
+            _validate_enums(df, derived_field, allowed, "D365")
+    df = _parse_dates(df, D365_DATE_COLUMNS, "D365")
+    _require_numeric(df, D365_NUMERIC_COLUMNS, "D365")
     return df
 
 
-def load_d365(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+def map_d365_extract(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate a record_type extract into one D365 row per customer; other frames pass through."""
 
     if "record_type" in df.columns:
         policies = df[df["record_type"].str.upper() == "POLICY"].copy()
-        srs = df[df["record_type"].str.upper() == "SR"].copy()
 
         policies["policy_issuance_date_ymd"] = pd.to_datetime(policies["policy_issuance_date_ymd"], format="%d-%m-%Y", errors="coerce")
         policies["la_dob_ymd"] = pd.to_datetime(policies["la_dob_ymd"], format="%d-%m-%Y", errors="coerce")
@@ -218,12 +312,11 @@ def load_d365(path: str) -> pd.DataFrame:
         def _count(status: str, cid: str) -> int:
             return int(status_counts.get(status, pd.Series()).get(cid, 0))
 
-        records = []
-        for cid, row in latest_policy.iterrows():
-            sr_rows = srs[srs["customer_id"] == cid]
-            sr_rows["SR_date"] = pd.to_datetime(sr_rows["SR_date"], format="%d-%m-%Y", errors="coerce")
-            latest_sr = sr_rows.sort_values("SR_date", ascending=False).head(1)
+        # one indexed pass over the SR rows instead of a rescan per customer
+        latest_srs = SRTimeline.from_frame(df).latest(latest_policy.index)
 
+        records = []
+        for (cid, row), latest_sr in zip(latest_policy.iterrows(), latest_srs.itertuples(index=False)):
             records.append(
                 {
                     "CustomerID": cid,
@@ -234,37 +327,19 @@ def load_d365(path: str) -> pd.DataFrame:
                     "PoliciesFPU": _count("FPU", cid),
                     "PoliciesSurrendered": _count("SURRENDERED", cid),
                     "PoliciesTotalEver": int(status_counts.loc[cid].sum()) if cid in status_counts.index else 0,
-                    "LastEngagementDate": latest_sr["SR_date"].iloc[0] if not latest_sr.empty else today,
+                    "LastEngagementDate": latest_sr.LastEngagementDate if latest_sr.HasSR else today,
                     "ConsentStatus": "OptedIn",
-                    "PrimaryChannel": latest_sr["SR_Channel"].iloc[0] if not latest_sr.empty else "Email",
+                    "PrimaryChannel": latest_sr.PrimaryChannel if latest_sr.HasSR else "Email",
                     "SecondaryChannel": "WhatsApp",
                     "RiskTier": "Medium",
                     "RenewalBucket": str(row.get("renewal_bucket", "")),
-                    "RecentPCT": latest_sr["PCT"].iloc[0] if not latest_sr.empty else "Servicing Documents",
-                    "RecentCT": latest_sr["CT"].iloc[0] if not latest_sr.empty else "Premium Paid Certificate",
-                    "RecentST": latest_sr["ST"].iloc[0] if not latest_sr.empty else "Copy",
+                    "RecentPCT": latest_sr.RecentPCT if latest_sr.HasSR else "Servicing Documents",
+                    "RecentCT": latest_sr.RecentCT if latest_sr.HasSR else "Premium Paid Certificate",
+                    "RecentST": latest_sr.RecentST if latest_sr.HasSR else "Copy",
                 }
             )
 
         df = pd.DataFrame.from_records(records)
-
-    _require_columns(df, D365_REQUIRED_COLUMNS, "D365")
-    _validate_enums(df, "ConsentStatus", D365_CONSENT_VALUES, "D365")
-    _validate_enums(df, "RiskTier", D365_RISK_TIERS, "D365")
-    _validate_enums(df, "SafariPersona", D365_SAFARI_PERSONA, "D365")
-    _validate_enums(df, "LifeStage", D365_LIFESTAGE, "D365")
-    _validate_enums(df, "RenewalBucket", D365_RENEWAL_BUCKETS, "D365")
-    for derived_field, allowed in (
-        ("KidsFlag", D365_KIDS_FLAG),
-        ("KidsAgeBand", D365_KIDS_AGE_BAND),
-        ("CityTier", D365_CITY_TIER),
-        ("OccupationType", D365_OCCUPATION),
-        ("PremiumToIncomeBand", D365_PTI),
-    ):
-        if derived_field in df.columns:
-            _validate_enums(df, derived_field, allowed, "D365")
-    df = _parse_dates(df, ["LastEngagementDate"], "D365")
-    _require_numeric(df, ["PoliciesPP", "PoliciesRPU", "PoliciesFPU", "PoliciesSurrendered", "PoliciesTotalEver"], "D365")
     return df
 
 
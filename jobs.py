@@ -0,0 +1,155 @@
+"""Local background job store for long-running engine runs."""
+from __future__ import annotations
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List
+
+import pandas as pd
+
+from calendar_engine import PLANNING_WEEKS, CompiledLibrary, run_calendar_engine
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+JOB_CANCELLED = "CANCELLED"
+FINISHED_STATES = {JOB_DONE, JOB_FAILED, JOB_CANCELLED}
+DEFAULT_KEEP_FINISHED = 20
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once cancellation was requested."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    label: str
+    status: str = JOB_QUEUED
+    processed: int = 0
+    total: int = 0
+    result: Any = None
+    # items published through progress(..., partial=...) while the job runs
+    partial: List[Any] = field(default_factory=list)
+    error: str | None = None
+    submitted_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def fraction(self) -> float:
+        return self.processed / self.total if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+
+class JobStore:
+    """Runs submitted callables on a worker pool and keeps their state for polling.
+
+    Callables receive a ``progress(done, total)`` keyword argument that records
+    progress and raises :class:`JobCancelled` once :meth:`cancel` was called.
+    ``progress(done, total, partial=items)`` also appends ``items`` to
+    :attr:`Job.partial`, so pollers see results before the job finishes.
+
+    Only the ``keep_finished`` most recently finished jobs are kept; older ones
+    are dropped, results and all, when the next job is submitted.
+    """
+
+    def __init__(self, max_workers: int = 1, keep_finished: int = DEFAULT_KEEP_FINISHED) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="engine-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.keep_finished = keep_finished
+
+    def submit(self, label: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        job = Job(job_id=uuid.uuid4().hex[:12], label=label)
+        with self._lock:
+            finished = sorted(
+                (old for old in self._jobs.values() if old.finished),
+                key=lambda old: old.finished_at,
+                reverse=True,
+            )
+            for old in finished[self.keep_finished :]:
+                del self._jobs[old.job_id]
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.job_id
+
+    def get(self, job_id: str | None) -> Job | None:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def discard(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        for job in self.jobs():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        if job.cancel_event.is_set():
+            job.finished_at = datetime.utcnow()
+            job.status = JOB_CANCELLED
+            return
+
+        def progress(done: int, total: int, partial: Iterable[Any] = ()) -> None:
+            job.processed, job.total = done, total
+            job.partial.extend(partial)
+            if job.cancel_event.is_set():
+                raise JobCancelled(job.job_id)
+
+        job.status = JOB_RUNNING
+        try:
+            job.result = fn(*args, progress=progress, **kwargs)
+            status = JOB_DONE
+        except JobCancelled:
+            status = JOB_CANCELLED
+        except Exception as exc:  # surfaced to the UI via job.error
+            job.error = f"{type(exc).__name__}: {exc}"
+            status = JOB_FAILED
+        # a job reads as finished only once finished_at is set
+        job.finished_at = datetime.utcnow()
+        job.status = status
+
+
+def submit_engine_run(
+    store: JobStore,
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+) -> str:
+    """Queue a calendar engine run; the job result is ``(calendar, decision_log)``."""
+    label = f"{len(customer_profiles)} customers as of {reference_date}"
+    return store.submit(
+        label,
+        run_calendar_engine,
+        customer_profiles,
+        activities,
+        reference_date=reference_date,
+        planning_weeks=planning_weeks,
+    )
@@ -0,0 +1,172 @@
+"""Versioned binary artifacts of the compiled activity library.
+
+``normalise_activity_library`` followed by ``compile_activity_library`` is
+cached as a pickle in a cache directory, keyed by a digest of the source
+library (the CSV bytes, or the rows of an already-loaded frame) and of the
+normalisation code. An artifact is only used when its header matches the
+current :data:`ARTIFACT_VERSION`, source digest and pandas version; anything
+else is rebuilt from the source and rewritten.
+
+Example::
+
+    python library_artifact.py data/sample/activity_library.csv --cache-dir data/cache
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import logging
+import os
+import pickle
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Sequence
+
+import pandas as pd
+
+import activity_library
+import calendar_engine
+from activity_library import normalise_activity_library
+from calendar_engine import CompiledLibrary, compile_activity_library
+from ingest import load_activity_library
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "data" / "cache"
+
+
+@lru_cache(maxsize=1)
+def _code_digest() -> bytes:
+    # normalisation or compilation changes invalidate artifacts without a version bump
+    digest = hashlib.sha256()
+    for module in (activity_library, calendar_engine):
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.digest()
+
+
+def source_digest(sources: Sequence[bytes]) -> str:
+    """Digest of library CSV contents, in the order they are concatenated."""
+    digest = hashlib.sha256(_code_digest())
+    for source in sources:
+        digest.update(source)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def file_digest(paths: Sequence[str]) -> str:
+    """Digest of the library CSVs, in the order they are concatenated."""
+    return source_digest([Path(path).read_bytes() for path in paths])
+
+
+def frame_digest(raw_library: pd.DataFrame) -> str:
+    """Digest of a raw library frame's columns and rows (e.g. an uploaded CSV)."""
+    digest = hashlib.sha256(_code_digest())
+    digest.update("\x1f".join(map(str, raw_library.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(raw_library.astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def artifact_path(cache_dir: str | Path, digest: str) -> Path:
+    return Path(cache_dir) / f"activity_library_{digest[:16]}.pkl"
+
+
+def _header(digest: str) -> Dict:
+    return {"version": ARTIFACT_VERSION, "source_digest": digest, "pandas": pd.__version__}
+
+
+def read_artifact(path: str | Path, digest: str) -> CompiledLibrary | None:
+    """The compiled library stored at ``path``, or ``None`` if it is missing, stale or unreadable."""
+    try:
+        with open(path, "rb") as handle:
+            header = pickle.load(handle)
+            if header != _header(digest):
+                logger.info("Rejecting stale library artifact %s: %s", path, header)
+                return None
+            library = pickle.load(handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError) as exc:
+        logger.warning("Ignoring unreadable library artifact %s: %s", path, exc)
+        return None
+    return library if isinstance(library, CompiledLibrary) else None
+
+
+def write_artifact(path: str | Path, digest: str, library: CompiledLibrary) -> Path:
+    """Write atomically, so concurrent readers never see a partial artifact."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(handle, "wb") as out:
+            pickle.dump(_header(digest), out, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(library, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return path
+
+
+def _cached(digest: str, cache_dir: str | Path | None, build: Callable[[], CompiledLibrary]) -> CompiledLibrary:
+    if cache_dir is None:
+        return build()
+    path = artifact_path(cache_dir, digest)
+    library = read_artifact(path, digest)
+    if library is None:
+        library = build()
+        try:
+            write_artifact(path, digest, library)
+        except OSError as exc:  # a read-only cache only costs the rebuild
+            logger.warning("Could not write library artifact %s: %s", path, exc)
+    return library
+
+
+def load_compiled_library(paths: Sequence[str], cache_dir: str | Path | None = DEFAULT_CACHE_DIR) -> CompiledLibrary:
+    """Normalised, compiled library of the CSVs at ``paths``; ``cache_dir=None`` disables the artifact."""
+    sources = [Path(path).read_bytes() for path in paths]
+    return compile_library_sources(sources, source_digest(sources), cache_dir)
+
+
+def compile_library_sources(
+    sources: Sequence[bytes], digest: str, cache_dir: str | Path | None = DEFAULT_CACHE_DIR
+) -> CompiledLibrary:
+    """:func:`load_compiled_library` for CSV contents already read, keyed by their :func:`source_digest`."""
+
+    def build() -> CompiledLibrary:
+        frames = [load_activity_library(io.BytesIO(source)) for source in sources]
+        raw = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return compile_activity_library(normalise_activity_library(raw))
+
+    return _cached(digest, cache_dir, build)
+
+
+def compile_library_frame(
+    raw_library: pd.DataFrame, cache_dir: str | Path | None = DEFAULT_CACHE_DIR
+) -> CompiledLibrary:
+    """:func:`load_compiled_library` for a raw library frame that is already loaded."""
+    return _cached(
+        frame_digest(raw_library),
+        cache_dir,
+        lambda: compile_activity_library(normalise_activity_library(raw_library)),
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build (or verify) the compiled activity-library artifact")
+    parser.add_argument("paths", nargs="+", help="Activity library CSVs, in concatenation order")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    args = parser.parse_args(argv)
+    digest = file_digest(args.paths)
+    path = artifact_path(args.cache_dir, digest)
+    started = time.perf_counter()
+    library = load_compiled_library(args.paths, args.cache_dir)
+    print(f"{path}: {len(library.records)} activities in {1000 * (time.perf_counter() - started):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""Calendars at several as-of dates from a single ingest and derivation.
+
+The date-independent profile columns are derived once (:func:`derive.derive_base_profile`);
+each as-of date only recomputes Age, the vintages and the derived renewal bucket
+(:func:`derive.apply_as_of`). Every date × customer batch is then scheduled in
+one process pool, each date anchored on its own planning horizon.
+
+Example::
+
+    python multi_as_of.py --pragati data/sample/pragati.csv --d365 data/sample/d365.csv \
+        --activity-library data/sample/activity_library.csv \
+        --as-of 2024-07-01 2024-08-01 2024-09-01 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+from calendar_engine import CALENDAR_COLUMNS, DECISION_LOG_COLUMNS, PLANNING_WEEKS, compile_activity_library
+from compact import CompactOutputs, run_calendar_engine_compact
+from derive import apply_as_of, derive_base_profile
+from run_batch import DEFAULT_BATCH_SIZE, customer_batches
+from sr_timeline import SRTimeline
+
+
+@dataclass
+class AsOfRun:
+    as_of: datetime
+    profiles: pd.DataFrame
+    calendar: pd.DataFrame
+    decision_log: pd.DataFrame
+
+
+def profiles_as_of(
+    base: pd.DataFrame,
+    as_of_dates: Sequence[datetime],
+    sr_timeline: SRTimeline | None = None,
+    sr_window_days: int = 90,
+) -> Dict[datetime, pd.DataFrame]:
+    """Profiles for each date from one :func:`derive.derive_base_profile` frame.
+
+    With ``sr_timeline`` each date also gets the point-in-time engagement-recency
+    columns of :meth:`sr_timeline.SRTimeline.recency_features`, all from the one index.
+    """
+    profiles = {}
+    for as_of in as_of_dates:
+        profile = apply_as_of(base, as_of)
+        if sr_timeline is not None:
+            recency = sr_timeline.recency_features(profile["CustomerID"], as_of, sr_window_days)
+            for column in recency.columns:
+                profile[column] = recency[column].to_numpy()
+        profiles[as_of] = profile
+    return profiles
+
+
+_WORKER_STATE: Dict[str, object] = {}
+
+
+def _init_worker(library, planning_weeks: int, build_log: bool) -> None:
+    _WORKER_STATE.update(library=library, planning_weeks=planning_weeks, build_log=build_log)
+
+
+def _schedule(as_of: datetime, batch: pd.DataFrame) -> CompactOutputs:
+    return run_calendar_engine_compact(
+        batch,
+        _WORKER_STATE["library"],
+        reference_date=as_of,
+        planning_weeks=_WORKER_STATE["planning_weeks"],
+        build_log=_WORKER_STATE["build_log"],
+    )
+
+
+def _concat(frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def run_multi_as_of(
+    pragati: pd.DataFrame,
+    d365: pd.DataFrame,
+    activities: pd.DataFrame,
+    as_of_dates: Sequence[datetime],
+    planning_weeks: int = PLANNING_WEEKS,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    build_log: bool = True,
+    sr_timeline: SRTimeline | None = None,
+) -> Dict[datetime, AsOfRun]:
+    """Schedule ingested extracts at every as-of date; each date uses itself as the horizon anchor.
+
+    Each :class:`AsOfRun` matches ``build_customer_profile`` followed by
+    ``run_calendar_engine`` at that date; ``sr_timeline`` adds the recency
+    columns of :func:`profiles_as_of` to the profiles.
+    """
+    library = compile_activity_library(activities)
+    profiles = profiles_as_of(derive_base_profile(pragati, d365), as_of_dates, sr_timeline)
+    tasks: List[Tuple[datetime, pd.DataFrame]] = [
+        (as_of, batch) for as_of, frame in profiles.items() for batch in customer_batches(frame, batch_size)
+    ]
+
+    if workers <= 1:
+        _init_worker(library, planning_weeks, build_log)
+        outputs = [_schedule(as_of, batch) for as_of, batch in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(library, planning_weeks, build_log)
+        ) as pool:
+            futures = [pool.submit(_schedule, as_of, batch) for as_of, batch in tasks]
+            outputs = [future.result() for future in futures]
+
+    calendars: Dict[datetime, List[pd.DataFrame]] = {as_of: [] for as_of in profiles}
+    logs: Dict[datetime, List[pd.DataFrame]] = {as_of: [] for as_of in profiles}
+    for (as_of, _), coded in zip(tasks, outputs):
+        calendars[as_of].append(coded.decode_calendar())
+        logs[as_of].append(coded.decode_decision_log())
+    return {
+        as_of: AsOfRun(
+            as_of=as_of,
+            profiles=frame,
+            calendar=_concat(calendars[as_of], CALENDAR_COLUMNS),
+            decision_log=_concat(logs[as_of], DECISION_LOG_COLUMNS),
+        )
+        for as_of, frame in profiles.items()
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from activity_library import normalise_activity_library
+    from derive import D365_PROFILE_INPUTS, PRAGATI_PROFILE_INPUTS, profile_columns
+    from export import export_outputs
+    from ingest import load_activity_library, load_d365, load_pragati
+
+    parser = argparse.ArgumentParser(description="Schedule one ingest at several as-of dates")
+    parser.add_argument("--pragati", required=True)
+    parser.add_argument("--d365", required=True)
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument(
+        "--as-of", nargs="+", required=True, type=lambda v: datetime.strptime(v, "%Y-%m-%d"), help="YYYY-MM-DD ..."
+    )
+    parser.add_argument("--planning-weeks", type=int, default=PLANNING_WEEKS)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output-dir", default="data/output", help="One as_of_YYYY-MM-DD subdirectory per date")
+    args = parser.parse_args(argv)
+
+    runs = run_multi_as_of(
+        load_pragati(args.pragati, PRAGATI_PROFILE_INPUTS),
+        load_d365(args.d365, D365_PROFILE_INPUTS),
+        normalise_activity_library(load_activity_library(args.activity_library)),
+        args.as_of,
+        planning_weeks=args.planning_weeks,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    for as_of, run in runs.items():
+        out_dir = Path(args.output_dir) / f"as_of_{as_of:%Y-%m-%d}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        export_outputs(run.calendar, run.decision_log, run.profiles[list(profile_columns())], str(out_dir))
+        print(f"{as_of:%Y-%m-%d}: {len(run.calendar)} calendar rows -> {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
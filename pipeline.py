@@ -0,0 +1,281 @@
+"""Pipelined batch runs: ingest, derive, engine and export overlap on customer ranges.
+
+The raw extracts are split into contiguous CustomerID ranges of
+``batch_size`` customers. Each range flows through four stages running on
+their own threads — ``prepare_*`` validation, ``build_customer_profile``, the
+engine (on a process pool when ``workers > 1``) and the streaming export —
+connected by bounded queues, so a slow stage blocks the ones upstream of it
+instead of letting batches pile up in memory. Ranges stay in customer order
+end to end, so the exported files match :func:`run_batch.run_pipeline`.
+
+CSV parsing itself is not pipelined. The extracts are read completely,
+with projected columns, before the first range is produced. Extracts are
+not guaranteed to be sorted by customer, so a range is only complete once
+every file has been read. Chunked reads would also infer column dtypes per
+chunk, so prepared frames would differ from the staged path. What
+overlaps is validation, derivation, the engine and export. Each range's
+raw rows are released once they are handed downstream, so the raw book
+shrinks as the run proceeds.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from derive import build_customer_profile, profile_columns
+from export import StreamingExporter
+from ingest import (
+    ValidationError,
+    d365_read_columns,
+    pragati_read_columns,
+    prepare_d365,
+    prepare_pragati,
+    read_projected,
+)
+from run_batch import (
+    BatchConfig,
+    BatchResult,
+    StageStats,
+    _check_config,
+    _finish,
+    _init_worker,
+    _load_all,
+    _load_library,
+    _schedule_batch,
+    expand_inputs,
+    input_columns,
+    project_profiles,
+)
+from shard import shard_rows
+from telemetry import RunTelemetry
+from verify import PROFILE_COLUMNS as VERIFY_PROFILE_COLUMNS
+
+DEFAULT_QUEUE_DEPTH = 2
+_DONE = object()
+
+
+def _customer_column(raw: pd.DataFrame) -> str:
+    # record_type extracts key rows on the source column; flat extracts are already mapped
+    return "customer_id" if "record_type" in raw.columns else "CustomerID"
+
+
+def customer_ranges(
+    raw_pragati: pd.DataFrame, raw_d365: pd.DataFrame, batch_size: int
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Raw Pragati and D365 rows of consecutive CustomerID ranges of ``batch_size`` customers."""
+    pragati_ids = raw_pragati[_customer_column(raw_pragati)].astype(str)
+    d365_ids = raw_d365[_customer_column(raw_d365)].astype(str)
+    starts = np.array(sorted(set(pragati_ids) | set(d365_ids))[:: max(batch_size, 1)], dtype=object)
+    pragati_groups = raw_pragati.groupby(np.searchsorted(starts, pragati_ids.to_numpy(), side="right"), sort=False)
+    d365_groups = raw_d365.groupby(np.searchsorted(starts, d365_ids.to_numpy(), side="right"), sort=False)
+    pragati_parts = {number: part for number, part in pragati_groups}
+    d365_parts = {number: part for number, part in d365_groups}
+    # the parts are copies: drop the whole frames and hand each part over exactly once
+    empty_pragati, empty_d365 = raw_pragati.iloc[:0], raw_d365.iloc[:0]
+    del raw_pragati, raw_d365, pragati_ids, d365_ids, pragati_groups, d365_groups
+    for number in range(1, len(starts) + 1):
+        yield (
+            pragati_parts.pop(number, empty_pragati).reset_index(drop=True),
+            d365_parts.pop(number, empty_d365).reset_index(drop=True),
+        )
+
+
+class _Stop(Exception):
+    pass
+
+
+def _put(channel: queue.Queue, item, stop: threading.Event) -> None:
+    while True:
+        if stop.is_set():
+            raise _Stop
+        try:
+            channel.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _drain(channel: queue.Queue, stop: threading.Event) -> Iterator:
+    while True:
+        try:
+            item = channel.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stop
+            continue
+        if item is _DONE:
+            return
+        yield item
+
+
+def _stage_thread(
+    name: str,
+    work: Callable[[Iterable], Iterable],
+    inbox: queue.Queue | None,
+    outbox: queue.Queue,
+    stop: threading.Event,
+    errors: List[BaseException],
+) -> threading.Thread:
+    def run() -> None:
+        try:
+            for item in work(_drain(inbox, stop) if inbox is not None else ()):
+                _put(outbox, item, stop)
+            _put(outbox, _DONE, stop)
+        except _Stop:
+            pass
+        except BaseException as exc:  # surfaced by the consumer on the calling thread
+            errors.append(exc)
+            stop.set()
+
+    return threading.Thread(target=run, name=f"pipeline-{name}", daemon=True)
+
+
+def run_pipelined(
+    config: BatchConfig, queue_depth: int = DEFAULT_QUEUE_DEPTH, telemetry: RunTelemetry | None = None
+) -> BatchResult:
+    """:func:`run_batch.run_pipeline` with ingest, derive, engine and export overlapping.
+
+    Each queue holds at most ``queue_depth`` ranges; stage ``seconds`` are busy
+    time and ``BatchResult.wall_seconds`` the end-to-end time. The overlapping
+    stages share the process, so ``telemetry`` gets only their busy time; CPU
+    and memory are measured for the run as a whole.
+    """
+    telemetry = telemetry or RunTelemetry(label="batch", trace_memory=config.trace_memory)
+    if config.capacities or config.branch_capacities:
+        raise ValidationError("Capacities rebalance the whole calendar and cannot be pipelined")
+    output_dir = _check_config(config)
+    run_started = time.perf_counter()
+    stages: Dict[str, StageStats] = {
+        name: StageStats(name) for name in ("ingest", "derive", "normalise", "engine", "export")
+    }
+    compiled, stages["normalise"] = _load_library(config, telemetry)
+    library = compiled.frame
+
+    def ingest(_: Iterable) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        stats = stages["ingest"]
+        started = time.perf_counter()
+        pragati_columns, d365_columns = input_columns(config)
+        pragati_reads, d365_reads = pragati_read_columns(pragati_columns), d365_read_columns(d365_columns)
+        raw_pragati = _load_all(expand_inputs(config.pragati), lambda path: read_projected(path, pragati_reads))
+        raw_d365 = _load_all(expand_inputs(config.d365), lambda path: read_projected(path, d365_reads))
+        if config.shard is not None:
+            raw_pragati = shard_rows(raw_pragati, *config.shard, column=_customer_column(raw_pragati))
+            raw_d365 = shard_rows(raw_d365, *config.shard, column=_customer_column(raw_d365))
+        stats.rows_in = len(raw_pragati) + len(raw_d365)
+        ranges = customer_ranges(raw_pragati, raw_d365, config.batch_size)
+        del raw_pragati, raw_d365  # owned by the generator from here on
+        stats.seconds += time.perf_counter() - started
+        for raw_part_pragati, raw_part_d365 in ranges:
+            started = time.perf_counter()
+            pragati, d365 = prepare_pragati(raw_part_pragati), prepare_d365(raw_part_d365)
+            stats.seconds += time.perf_counter() - started
+            stats.rows_out += len(pragati) + len(d365)
+            yield pragati, d365
+
+    def derive(items: Iterable[Tuple[pd.DataFrame, pd.DataFrame]]) -> Iterator[pd.DataFrame]:
+        stats = stages["derive"]
+        for pragati, d365 in items:
+            started = time.perf_counter()
+            stats.rows_in += len(pragati) + len(d365)
+            if set(pragati["CustomerID"]) & set(d365["CustomerID"]):
+                profiles = project_profiles(build_customer_profile(pragati, d365, as_of_date=config.as_of), config)
+                stats.rows_out += len(profiles)
+                stats.seconds += time.perf_counter() - started
+                yield profiles
+            else:
+                stats.seconds += time.perf_counter() - started
+
+    def engine(batches: Iterable[pd.DataFrame]) -> Iterator[Tuple[pd.DataFrame, object]]:
+        stats = stages["engine"]
+        if config.workers <= 1:
+            _init_worker(compiled, config.as_of, config.planning_weeks, config.decision_log, config.vectorised)
+            for batch in batches:
+                started = time.perf_counter()
+                outputs = _schedule_batch(batch)
+                stats.seconds += time.perf_counter() - started
+                stats.rows_in += len(batch)
+                yield batch, outputs
+            return
+        with ProcessPoolExecutor(
+            max_workers=config.workers,
+            initializer=_init_worker,
+            initargs=(compiled, config.as_of, config.planning_weeks, config.decision_log, config.vectorised),
+        ) as pool:
+            # busy time is the span during which at least one batch was in flight
+            pending: Deque[Tuple[pd.DataFrame, Future]] = deque()
+            busy_since = None
+            for batch in batches:
+                busy_since = busy_since or time.perf_counter()
+                pending.append((batch, pool.submit(_schedule_batch, batch)))
+                stats.rows_in += len(batch)
+                while pending and (len(pending) >= 2 * config.workers or pending[0][1].done()):
+                    done_batch, future = pending.popleft()
+                    yield done_batch, future.result()
+                if not pending:
+                    stats.seconds += time.perf_counter() - busy_since
+                    busy_since = None
+            while pending:
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+            if busy_since is not None:
+                stats.seconds += time.perf_counter() - busy_since
+
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    channels = [queue.Queue(maxsize=max(queue_depth, 1)) for _ in range(3)]
+    threads = [
+        _stage_thread("ingest", ingest, None, channels[0], stop, errors),
+        _stage_thread("derive", derive, channels[0], channels[1], stop, errors),
+        _stage_thread("engine", engine, channels[1], channels[2], stop, errors),
+    ]
+    for thread in threads:
+        thread.start()
+
+    exporter = StreamingExporter(
+        output_dir, formats=config.formats, compression=config.compression, dispatch_feeds=config.dispatch_feeds
+    )
+    derived_cols = list(profile_columns())
+    # the verifier needs the persona and life stage behind each customer's cap
+    verify_profiles: List[pd.DataFrame] = []
+    export_stats = stages["export"]
+    try:
+        for batch, outputs in _drain(channels[2], stop):
+            started = time.perf_counter()
+            calendar, decision_log = outputs.decode_calendar(), outputs.decode_decision_log()
+            stages["engine"].rows_out += len(calendar) + len(decision_log)
+            exporter.write("engagement_calendar", calendar)
+            if config.decision_log:
+                exporter.write("decision_log", decision_log)
+            exporter.write("derived_profile", batch[derived_cols])
+            if config.verify:
+                verify_profiles.append(batch[VERIFY_PROFILE_COLUMNS])
+            export_stats.seconds += time.perf_counter() - started
+            export_stats.rows_in += len(calendar) + len(decision_log) + len(batch)
+    except _Stop:
+        pass
+    finally:
+        # unblocks upstream stages if the export failed; they have finished otherwise
+        stop.set()
+        paths = exporter.close()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    export_stats.rows_out = sum(exporter.rows.values())
+    for name in ("ingest", "derive", "engine", "export"):
+        telemetry.record(name, stages[name].seconds)
+
+    profiles = (
+        pd.concat(verify_profiles, ignore_index=True) if verify_profiles else pd.DataFrame(columns=VERIFY_PROFILE_COLUMNS)
+    )
+    result = BatchResult(paths=paths, stages=list(stages.values()))
+    result = _finish(config, result, exporter, library, profiles, output_dir, telemetry)
+    result.wall_seconds = time.perf_counter() - run_started
+    return result
@@ -0,0 +1,301 @@
+"""Instant upload previews: header and sampled-row checks, with full validation in the background.
+
+:func:`preview_upload` checks a Pragati or D365 CSV's header against the
+loader's required columns, suggesting near-miss names for missing ones. It
+then runs the loader's enum, date and numeric checks on a stratified sample:
+a few rows from each of several evenly spaced byte ranges of the file, so
+problems confined to one part of a large extract still show up. Neither step
+parses the whole file, so the report is ready in well under a second.
+
+:func:`validate_upload` is the full validation, meant to run as a
+:class:`jobs.JobStore` job (see :func:`submit_upload_validation`). It parses
+the file in chunks, running the checks on each chunk as it is read and
+publishing its failing checks as the job's ``partial`` items, then returns the frame
+``load_pragati`` / ``load_d365`` would (raising the same
+:class:`ingest.ValidationError`).
+"""
+from __future__ import annotations
+
+import difflib
+import io
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Sequence, Set
+
+import pandas as pd
+
+from ingest import (
+    D365_DATE_COLUMNS,
+    D365_ENUMS,
+    D365_EXTRACT_COLUMNS,
+    D365_NUMERIC_COLUMNS,
+    D365_OPTIONAL_ENUMS,
+    D365_REQUIRED_COLUMNS,
+    PRAGATI_DATE_COLUMNS,
+    PRAGATI_ENUMS,
+    PRAGATI_EXTRACT_DERIVED,
+    PRAGATI_EXTRACT_RENAMES,
+    PRAGATI_NUMERIC_COLUMNS,
+    PRAGATI_REQUIRED_COLUMNS,
+    map_d365_extract,
+    map_pragati_extract,
+    prepare_d365,
+    prepare_pragati,
+)
+from jobs import JobStore
+
+SAMPLE_ROWS = 2000
+SAMPLE_STRATA = 20
+# files up to this size are small enough to check every row in the preview
+FULL_READ_BYTES = 1 << 20
+CHUNK_ROWS = 100_000
+MAX_EXAMPLES = 5
+REPORT_COLUMNS = ["column", "check", "status", "checked", "failed", "examples"]
+
+
+@dataclass(frozen=True)
+class UploadSchema:
+    """What ``prepare_pragati`` / ``prepare_d365`` require and check, per upload kind."""
+
+    name: str
+    required: List[str]
+    extract_required: List[str]
+    enums: Dict[str, Set[str]]
+    optional_enums: Dict[str, Set[str]]
+    dates: List[str]
+    numeric: List[str]
+    map_extract: Callable[[pd.DataFrame], pd.DataFrame]
+    prepare: Callable[[pd.DataFrame], pd.DataFrame]
+
+
+_EXTRACT_SOURCES = {target: source for source, target in PRAGATI_EXTRACT_RENAMES.items()}
+SCHEMAS: Dict[str, UploadSchema] = {
+    "pragati": UploadSchema(
+        name="Pragati",
+        required=PRAGATI_REQUIRED_COLUMNS,
+        extract_required=[
+            _EXTRACT_SOURCES.get(column, column)
+            for column in PRAGATI_REQUIRED_COLUMNS
+            if column not in PRAGATI_EXTRACT_DERIVED
+        ],
+        enums=PRAGATI_ENUMS,
+        optional_enums={},
+        dates=PRAGATI_DATE_COLUMNS,
+        numeric=PRAGATI_NUMERIC_COLUMNS,
+        map_extract=map_pragati_extract,
+        prepare=prepare_pragati,
+    ),
+    "d365": UploadSchema(
+        name="D365",
+        required=D365_REQUIRED_COLUMNS,
+        extract_required=D365_EXTRACT_COLUMNS,
+        enums=D365_ENUMS,
+        optional_enums=D365_OPTIONAL_ENUMS,
+        dates=D365_DATE_COLUMNS,
+        numeric=D365_NUMERIC_COLUMNS,
+        map_extract=map_d365_extract,
+        prepare=prepare_d365,
+    ),
+}
+
+
+@contextmanager
+def _binary(source: str | Path | bytes | BinaryIO) -> Iterator[BinaryIO]:
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+    elif isinstance(source, (str, Path)):
+        with open(source, "rb") as handle:
+            yield handle
+    else:
+        source.seek(0)
+        yield source
+
+
+def _rewound(handle: BinaryIO) -> BinaryIO:
+    handle.seek(0)
+    return handle
+
+
+def _normalised(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _suggestion(column: str, present: Sequence[str]) -> str:
+    by_normalised = {_normalised(name): name for name in present}
+    match = by_normalised.get(_normalised(column))
+    if match is None:
+        close = difflib.get_close_matches(_normalised(column), list(by_normalised), n=1, cutoff=0.8)
+        match = by_normalised[close[0]] if close else None
+    return f"did you mean '{match}'?" if match is not None else ""
+
+
+def header_report(columns: Sequence[str], kind: str) -> pd.DataFrame:
+    """One row per required column: ``OK`` or ``MISSING`` with a near-miss suggestion."""
+    schema = SCHEMAS[kind]
+    present = [str(column) for column in columns]
+    required = schema.extract_required if "record_type" in present else schema.required
+    rows = []
+    for column in required:
+        if column in present:
+            rows.append((column, "present", "OK", 1, 0, ""))
+        else:
+            rows.append((column, "present", "MISSING", 1, 1, _suggestion(column, present)))
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def _check_row(column: str, check: str, values: pd.Series, bad: pd.Series) -> tuple:
+    failed = int(bad.sum())
+    examples = sorted({"<blank>" if pd.isna(value) else str(value) for value in values[bad]})[:MAX_EXAMPLES]
+    return (column, check, "FAIL" if failed else "OK", len(values), failed, ", ".join(examples))
+
+
+def check_report(raw: pd.DataFrame, kind: str) -> pd.DataFrame:
+    """The loader's enum, date and numeric checks on ``raw`` rows, counted instead of raised.
+
+    Columns missing from ``raw`` are skipped; :func:`header_report` covers them.
+    """
+    schema = SCHEMAS[kind]
+    try:
+        # object columns, so an all-blank column in a sample or chunk still maps like text
+        frame = schema.map_extract(raw.astype(object))
+    except (KeyError, AttributeError, TypeError, ValueError) as exc:
+        row = ("record_type extract", "mapping", "FAIL", len(raw), len(raw), f"{type(exc).__name__}: {exc}")
+        return pd.DataFrame([row], columns=REPORT_COLUMNS)
+
+    rows = []
+    enums = {**schema.enums, **{c: allowed for c, allowed in schema.optional_enums.items() if c in frame.columns}}
+    for column, allowed in enums.items():
+        if column in frame.columns:
+            values = frame[column]
+            rows.append(_check_row(column, "enum", values, values.notna() & ~values.isin(allowed)))
+    for column in schema.dates:
+        if column in frame.columns:
+            values = frame[column]
+            parsed = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+            rows.append(_check_row(column, "date YYYY-MM-DD", values, values.notna() & parsed.isna()))
+    for column in schema.numeric:
+        if column in frame.columns:
+            values = frame[column]
+            rows.append(_check_row(column, "numeric", values, pd.to_numeric(values, errors="coerce").isna()))
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def sample_rows(source: str | Path | bytes | BinaryIO, rows: int = SAMPLE_ROWS, strata: int = SAMPLE_STRATA):
+    """``(sample, total_bytes)``: every row of a small file, else ``rows`` spread over ``strata`` byte ranges.
+
+    Lines are read as text after seeking, so a quoted field spanning lines can
+    misalign a stratum; such lines are skipped and full validation is authoritative.
+    """
+    with _binary(source) as handle:
+        handle.seek(0, io.SEEK_END)
+        size = handle.tell()
+        handle.seek(0)
+        if size <= FULL_READ_BYTES:
+            return pd.read_csv(handle, dtype=str), size
+        lines = [handle.readline()]
+        start = end = handle.tell()
+        per_stratum = -(-rows // strata)
+        for stratum in range(strata):
+            offset = max(start + (size - start) * stratum // strata, end)
+            handle.seek(offset)
+            if offset > end:
+                handle.readline()  # finish the line the offset landed in
+            for _ in range(per_stratum):
+                line = handle.readline()
+                if not line:
+                    break
+                lines.append(line if line.endswith(b"\n") else line + b"\n")
+            end = handle.tell()
+    sample = pd.read_csv(io.BytesIO(b"".join(lines)), dtype=str, on_bad_lines="skip")
+    return sample, size
+
+
+@dataclass
+class UploadPreview:
+    kind: str
+    header: pd.DataFrame
+    checks: pd.DataFrame
+    sampled_rows: int
+    total_bytes: int
+    seconds: float
+    record_types: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def report(self) -> pd.DataFrame:
+        return pd.concat([self.header, self.checks], ignore_index=True)
+
+    @property
+    def ok(self) -> bool:
+        return bool((self.report["status"] == "OK").all())
+
+
+def preview_upload(
+    source: str | Path | bytes | BinaryIO, kind: str, rows: int = SAMPLE_ROWS, strata: int = SAMPLE_STRATA
+) -> UploadPreview:
+    """Header report plus the loader's checks on a stratified sample of rows."""
+    started = time.perf_counter()
+    sample, size = sample_rows(source, rows, strata)
+    header = header_report(sample.columns, kind)
+    missing = (header["status"] == "MISSING").any()
+    # a misnamed required column makes every row check moot until the header is fixed
+    checks = pd.DataFrame(columns=REPORT_COLUMNS) if missing else check_report(sample, kind)
+    record_types = (
+        sample["record_type"].str.upper().value_counts().to_dict() if "record_type" in sample.columns else {}
+    )
+    return UploadPreview(
+        kind=kind,
+        header=header,
+        checks=checks,
+        sampled_rows=len(sample),
+        total_bytes=size,
+        seconds=time.perf_counter() - started,
+        record_types=record_types,
+    )
+
+
+def validate_upload(
+    source: str | Path | bytes | BinaryIO,
+    kind: str,
+    progress: Callable[..., None] | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Full validation, checked as each chunk is parsed; returns the loaded frame or raises :class:`ingest.ValidationError`.
+
+    ``progress(bytes_read, total_bytes, partial=issues)`` receives each chunk's
+    failing :func:`check_report` rows with a ``rows`` range attached.
+    """
+    schema = SCHEMAS[kind]
+    chunks = []
+    with _binary(source) as handle:
+        handle.seek(0, io.SEEK_END)
+        size = handle.tell()
+        handle.seek(0)
+        start = 0
+        for chunk in pd.read_csv(handle, chunksize=max(chunk_rows, 1)):
+            report = check_report(chunk, kind)
+            done = start + len(chunk)
+            failed = report[report["status"] != "OK"].assign(rows=f"{start + 1}-{done}")
+            if progress is not None:
+                progress(min(handle.tell(), size), size, partial=failed.to_dict("records"))
+            chunks.append(chunk)
+            start = done
+        frame = pd.concat(chunks, ignore_index=True) if chunks else pd.read_csv(_rewound(handle))
+        # dtypes are inferred per chunk (an all-blank chunk column reads as float); where the
+        # chunks disagree, re-read just those columns so they get the whole-file inference
+        mixed = [column for column in frame.columns if len({str(chunk[column].dtype) for chunk in chunks}) > 1]
+        if mixed:
+            reread = pd.read_csv(_rewound(handle), usecols=mixed)
+            for column in mixed:
+                frame[column] = reread[column]
+    return schema.prepare(frame)
+
+
+def submit_upload_validation(
+    store: JobStore, data: bytes, kind: str, label: str | None = None, chunk_rows: int = CHUNK_ROWS
+) -> str:
+    """Queue :func:`validate_upload`; the job's ``partial`` fills with failing checks as chunks are read."""
+    label = label or f"{SCHEMAS[kind].name} upload validation ({len(data):,} bytes)"
+    return store.submit(label, validate_upload, data, kind, chunk_rows=chunk_rows)
@@ -0,0 +1,236 @@
+"""Pre-flight activity-library pruning against the population segment histogram.
+
+Eligibility depends only on a handful of profile attributes, so the book
+collapses into a histogram of distinct attribute tuples (segments). Every
+activity is checked once per segment: an activity that fails for every segment
+is dead for this book. Dead activities are dropped from the library the engine
+iterates, and their decision-log rows — always the first eligibility failure —
+are emitted in bulk per segment, so :func:`run_pruned` matches
+:func:`calendar_engine.run_calendar_engine` exactly.
+"""
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+import pandas as pd
+
+from calendar_engine import (
+    DECISION_LOG_COLUMNS,
+    DECISION_LOG_SORT_KEYS,
+    PLANNING_WEEKS,
+    CompiledLibrary,
+    compile_activity_library,
+    eligibility_failure,
+    run_calendar_engine,
+)
+from ingest import (
+    D365_CITY_TIER,
+    D365_KIDS_AGE_BAND,
+    D365_KIDS_FLAG,
+    D365_LIFESTAGE,
+    D365_OCCUPATION,
+    D365_PTI,
+    D365_RENEWAL_BUCKETS,
+    D365_SAFARI_PERSONA,
+)
+
+# normalised library list column -> (profile attribute, derived vocabulary)
+ELIGIBILITY_FIELDS: Dict[str, Tuple[str, Set[str]]] = {
+    "life_stage_eligibility": ("LifeStage", D365_LIFESTAGE),
+    "persona_eligibility": ("SafariPersona", D365_SAFARI_PERSONA),
+    "renewal_eligibility": ("RenewalBucket", D365_RENEWAL_BUCKETS - {""}),
+    "kids_flags": ("KidsFlag", D365_KIDS_FLAG),
+    "kids_age_bands": ("KidsAgeBand", D365_KIDS_AGE_BAND),
+    "pti_eligibility": ("PremiumToIncomeBand", D365_PTI),
+    "city_eligibility": ("CityTier", D365_CITY_TIER),
+    "occupation_eligibility": ("OccupationType", D365_OCCUPATION),
+}
+SEGMENT_COLUMNS = [attribute for attribute, _ in ELIGIBILITY_FIELDS.values()] + ["HasSurrenders"]
+LINT_COLUMNS = ["activity_id", "field", "value", "issue"]
+
+
+@dataclass
+class PruningPlan:
+    """Outcome of :func:`plan_pruning`.
+
+    ``segments`` is the histogram (one row per attribute tuple with a
+    ``customers`` count), ``live`` the compiled library without the ``dead``
+    activity IDs, and ``failures`` each dead activity's eligibility failure per
+    segment.
+    """
+
+    segments: pd.DataFrame
+    live: CompiledLibrary
+    dead: List[str]
+    failures: pd.DataFrame
+    lint: pd.DataFrame
+
+
+def _segment_keys(customer_profiles: pd.DataFrame) -> pd.DataFrame:
+    attributes = [attribute for attribute, _ in ELIGIBILITY_FIELDS.values()]
+    keys = customer_profiles.reindex(columns=attributes)
+    surrenders = customer_profiles.get("PercentSurrenders", pd.Series(0, index=customer_profiles.index))
+    return keys.assign(HasSurrenders=pd.to_numeric(surrenders, errors="coerce").fillna(0) > 0)
+
+
+def segment_histogram(customer_profiles: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """Distinct eligibility attribute tuples with customer counts, and each customer's segment number."""
+    grouped = _segment_keys(customer_profiles).groupby(SEGMENT_COLUMNS, dropna=False, sort=True)
+    segments = grouped.size().rename("customers").reset_index()
+    return segments, grouped.ngroup()
+
+
+def segment_representative(segment: Dict) -> Dict:
+    """A profile mapping carrying exactly the eligibility attributes of a histogram segment."""
+    customer = {column: segment[column] for column in SEGMENT_COLUMNS if column != "HasSurrenders"}
+    customer["PercentSurrenders"] = 1.0 if segment["HasSurrenders"] else 0.0
+    return customer
+
+
+def lint_library(activities: pd.DataFrame, customer_profiles: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Eligibility values no derived profile can carry (``UNSATISFIABLE``) or, given a
+    book, that no customer in it carries (``ABSENT_IN_BOOK``)."""
+    present = {}
+    if customer_profiles is not None:
+        present = {
+            field: set(customer_profiles[attribute].dropna().astype(str)) if attribute in customer_profiles else set()
+            for field, (attribute, _) in ELIGIBILITY_FIELDS.items()
+        }
+    rows = []
+    for activity in activities.sort_values("ActivityID").to_dict("records"):
+        for field, (_, vocabulary) in ELIGIBILITY_FIELDS.items():
+            for value in activity.get(field) or []:
+                if value not in vocabulary:
+                    rows.append((activity["ActivityID"], field, value, "UNSATISFIABLE"))
+                elif present and value not in present[field]:
+                    rows.append((activity["ActivityID"], field, value, "ABSENT_IN_BOOK"))
+    return pd.DataFrame(rows, columns=LINT_COLUMNS)
+
+
+def plan_pruning(customer_profiles: pd.DataFrame, activities: pd.DataFrame | CompiledLibrary) -> PruningPlan:
+    """Find activities no segment of ``customer_profiles`` is eligible for."""
+    library = compile_activity_library(activities)
+    segments, _ = segment_histogram(customer_profiles)
+    representatives = [segment_representative(segment) for segment in segments.to_dict("records")]
+
+    dead: List[str] = []
+    failures = []
+    for activity in library.records:
+        outcomes = [eligibility_failure(customer, activity) for customer in representatives]
+        if representatives and all(outcome is not None for outcome in outcomes):
+            dead.append(activity["ActivityID"])
+            failures.extend((number, activity["ActivityID"], *outcome) for number, outcome in enumerate(outcomes))
+
+    dead_ids = set(dead)
+    keep = ~library.frame["ActivityID"].isin(dead_ids)
+    live = CompiledLibrary(
+        frame=library.frame[keep].reset_index(drop=True),
+        records=tuple(record for record in library.records if record["ActivityID"] not in dead_ids),
+    )
+    return PruningPlan(
+        segments=segments,
+        live=live,
+        dead=dead,
+        failures=pd.DataFrame(failures, columns=["segment", "activity_id", "stage", "reason_code", "details"]),
+        lint=lint_library(library.frame, customer_profiles),
+    )
+
+
+def dead_activity_log(
+    customer_profiles: pd.DataFrame, activities: pd.DataFrame | CompiledLibrary, plan: PruningPlan
+) -> pd.DataFrame:
+    """Decision-log rows of the plan's dead activities, broadcast from segments to customers.
+
+    ``customer_profiles`` is the planned book or any part of it, such as one
+    engine batch; customers are matched to the plan's segments by attribute tuple.
+    """
+    if not plan.dead or customer_profiles.empty:
+        return pd.DataFrame(columns=DECISION_LOG_COLUMNS)
+    numbered = plan.segments[SEGMENT_COLUMNS].assign(segment=range(len(plan.segments)))
+    customers = (
+        _segment_keys(customer_profiles)
+        .assign(customer_id=customer_profiles["CustomerID"].to_numpy())
+        .merge(numbered, on=SEGMENT_COLUMNS)[["customer_id", "segment"]]
+    )
+    names = compile_activity_library(activities).frame[["ActivityID", "ActivityName", "Category", "SubCategory"]]
+    names = names.rename(
+        columns={
+            "ActivityID": "activity_id",
+            "ActivityName": "activity_name",
+            "Category": "category",
+            "SubCategory": "sub_category",
+        }
+    )
+    rows = customers.merge(plan.failures, on="segment").merge(names, on="activity_id")
+    return rows.assign(result="EXCLUDED")[DECISION_LOG_COLUMNS]
+
+
+def with_dead_activities(
+    decision_log: pd.DataFrame,
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    plan: PruningPlan,
+) -> pd.DataFrame:
+    """``decision_log`` of a run over ``plan.live`` with the dead activities' rows merged in, sorted."""
+    dead_log = dead_activity_log(customer_profiles, activities, plan)
+    if dead_log.empty:
+        return decision_log
+    parts = [frame for frame in (decision_log, dead_log) if not frame.empty]
+    return pd.concat(parts, ignore_index=True).sort_values(DECISION_LOG_SORT_KEYS).reset_index(drop=True)
+
+
+def run_pruned(
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    progress: Callable[[int, int], None] | None = None,
+    build_log: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame, PruningPlan]:
+    """:func:`calendar_engine.run_calendar_engine` over the live library only.
+
+    Dead activities are never evaluated per customer; their log rows come from
+    :func:`dead_activity_log` and are merged into the engine's sorted log.
+    """
+    library = compile_activity_library(activities)
+    plan = plan_pruning(customer_profiles, library)
+    calendar, decision_log = run_calendar_engine(
+        customer_profiles, plan.live, reference_date, planning_weeks, progress=progress, build_log=build_log
+    )
+    if build_log:
+        decision_log = with_dead_activities(decision_log, customer_profiles, library, plan)
+    return calendar, decision_log, plan
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from activity_library import normalise_activity_library
+    from derive import D365_PROFILE_INPUTS, PRAGATI_PROFILE_INPUTS, build_customer_profile
+    from ingest import load_activity_library, load_d365, load_pragati
+
+    parser = argparse.ArgumentParser(description="Report dead activities and unsatisfiable eligibility values")
+    parser.add_argument("--pragati", required=True)
+    parser.add_argument("--d365", required=True)
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument("--as-of", required=True, type=lambda v: datetime.strptime(v, "%Y-%m-%d"))
+    parser.add_argument("--lint-out", help="Write the lint report to this CSV")
+    args = parser.parse_args(argv)
+
+    profiles = build_customer_profile(
+        load_pragati(args.pragati, PRAGATI_PROFILE_INPUTS), load_d365(args.d365, D365_PROFILE_INPUTS), args.as_of
+    )
+    activities = normalise_activity_library(load_activity_library(args.activity_library))
+    plan = plan_pruning(profiles, activities)
+    print(f"{len(profiles)} customers in {len(plan.segments)} segments")
+    print(f"{len(plan.dead)} of {len(activities)} activities dead for this book: {', '.join(plan.dead) or '-'}")
+    if not plan.lint.empty:
+        print(plan.lint.to_string(index=False))
+    if args.lint_out:
+        plan.lint.to_csv(args.lint_out, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,578 @@
+"""Out-of-core execution path: ingest, derivation and eligibility as SQL in DuckDB.
+
+DuckDB (optional dependency, ``pip install duckdb``) reads the raw CSV or
+Parquet extracts directly, aggregates Pragati policies per customer, joins
+D365, derives the profile bands and evaluates every eligibility/modifier check
+of :func:`calendar_engine.eligibility_failure` as one set-based query. Sorts,
+joins and aggregates spill to ``temp_directory`` past ``memory_limit``. Only
+profile attributes and per-customer eligibility results stream back, in
+CustomerID order, into :func:`calendar_engine.schedule_customer`; without the
+decision log only the eligible (customer, activity) pairs are transferred.
+
+The SQL mirrors ``ingest.prepare_*``, ``derive`` and ``eligibility_failure``;
+``tests/test_pushdown.py`` checks the outputs against the pandas path.
+
+Example::
+
+    python run_batch.py ... --sql-pushdown --memory-limit 4GB --spill-dir /scratch/spill
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import pandas as pd
+
+from calendar_engine import (
+    PLANNING_WEEKS,
+    _bool_from_flag,
+    _calendar_frame,
+    _decision_log_frame,
+    compile_activity_library,
+    horizon_table,
+    schedule_customer,
+)
+from city_tiers import PinTierIndex, default_pin_tier_index
+from derive import CITY_TIER_MAP, KIDS_RELATIONSHIPS, OCCUPATION_MAP, POLICY_VINTAGE_BUCKETS, PTI_BANDS
+from ingest import (
+    D365_CONSENT_VALUES,
+    D365_LIFESTAGE,
+    D365_RENEWAL_BUCKETS,
+    D365_RISK_TIERS,
+    D365_SAFARI_PERSONA,
+    PRAGATI_PLAN_TYPES,
+    PRAGATI_POLICY_STATUS,
+    ValidationError,
+    _validate_enums,
+)
+
+DEFAULT_FETCH_SIZE = 10_000
+
+# (library list column, profile column, stage, reason_code, details) in the order of
+# calendar_engine.eligibility_failure; the surrender-percent check follows them
+ELIGIBILITY_CHECKS: Tuple[Tuple[str, str, str, str, str], ...] = (
+    ("life_stage_eligibility", "LifeStage", "ELIGIBILITY", "FAIL_LIFESTAGE", "Life stage not eligible"),
+    ("persona_eligibility", "SafariPersona", "ELIGIBILITY", "FAIL_SAFARI", "Safari persona not eligible"),
+    ("renewal_eligibility", "RenewalBucket", "ELIGIBILITY", "FAIL_RENEWAL_BUCKET", "Renewal bucket not eligible"),
+    ("kids_flags", "KidsFlag", "MODIFIER", "FAIL_KIDS", "Kids flag not eligible"),
+    ("kids_age_bands", "KidsAgeBand", "MODIFIER", "FAIL_KIDS_AGE", "Kids age band not eligible"),
+    ("pti_eligibility", "PremiumToIncomeBand", "MODIFIER", "FAIL_PTI", "PTI band not eligible"),
+    ("city_eligibility", "CityTier", "MODIFIER", "FAIL_CITY", "City not eligible"),
+    ("occupation_eligibility", "OccupationType", "MODIFIER", "FAIL_OCCUPATION", "Occupation not eligible"),
+)
+SURRENDER_FAILURE = ("MODIFIER", "FAIL_SURRENDER_PCT", "High surrender percent")
+FAILURES: Tuple[Tuple[str, str, str], ...] = tuple(check[2:] for check in ELIGIBILITY_CHECKS) + (SURRENDER_FAILURE,)
+
+PROFILE_OUTPUT_COLUMNS = [
+    "CustomerID",
+    "CustomerName",
+    "Age",
+    "LifeStage",
+    "SafariPersona",
+    "PolicyVintage",
+    "RelationshipVintage",
+    "PremiumToIncomeBand",
+    "RenewalBucket",
+    "CityTier",
+    "OccupationType",
+    "KidsFlag",
+    "KidsAgeBand",
+    "PercentSurrenders",
+    "PreferredChannel",
+]
+
+
+def connect(memory_limit: str | None = None, temp_directory: str | None = None, database: str = ":memory:"):
+    """DuckDB connection with spilling configured; raises if duckdb is not installed."""
+    try:
+        import duckdb
+    except ImportError as exc:  # optional dependency
+        raise RuntimeError("The SQL pushdown path needs duckdb: pip install duckdb") from exc
+    con = duckdb.connect(database)
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    if temp_directory:
+        Path(temp_directory).mkdir(parents=True, exist_ok=True)
+        con.execute(f"SET temp_directory = '{temp_directory}'")
+    return con
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _in_list(values) -> str:
+    return ", ".join(_quote(value) for value in sorted(values))
+
+
+def _band_sql(expression: str, bands) -> str:
+    # derive._band_value: first [lower, upper) band that matches, else the last label
+    clauses = " ".join(
+        f"WHEN {expression} >= {lower} AND {expression} < {upper} THEN {_quote(label)}"
+        if upper != float("inf")
+        else f"WHEN {expression} >= {lower} THEN {_quote(label)}"
+        for lower, upper, label in bands
+    )
+    return f"CASE {clauses} ELSE {_quote(bands[-1][2])} END"
+
+
+def _map_sql(expression: str, mapping: Dict[str, str], default: str) -> str:
+    """``mapping.get(expression, default)``; ``default`` is itself an SQL expression."""
+    clauses = " ".join(f"WHEN {_quote(key)} THEN {_quote(value)}" for key, value in mapping.items())
+    return f"CASE {expression} {clauses} ELSE {default} END"
+
+
+def _source(paths: Sequence[str]) -> str:
+    files = "[" + ", ".join(_quote(path) for path in paths) + "]"
+    if all(str(path).endswith(".parquet") for path in paths):
+        return f"read_parquet({files})"
+    return f"read_csv({files}, header = true, all_varchar = true)"
+
+
+def _columns(con, relation: str) -> List[str]:
+    return [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+
+
+def _load_pragati(con, paths: Sequence[str]) -> None:
+    source = _source(paths)
+    con.execute(f"CREATE OR REPLACE TABLE pragati_raw AS SELECT *, row_number() OVER () AS rn FROM {source}")
+    columns = _columns(con, "pragati_raw")
+    if "record_type" in columns:
+        nominee_age = "TRY_CAST(NomineeAge AS DOUBLE)" if "NomineeAge" in columns else "0"
+        status_map = {"PP": "Active", "RPU": "PaidUp", "FPU": "PaidUp", "Surrendered": "Surrendered"}
+        con.execute(
+            f"""
+            CREATE OR REPLACE TABLE pragati AS
+            SELECT
+                CAST(customer_id AS VARCHAR) AS CustomerID,
+                CAST(la_name AS VARCHAR) AS CustomerName,
+                CAST(try_strptime(CAST(la_dob_ymd AS VARCHAR), '%d-%m-%Y') AS DATE) AS DOB,
+                CAST(try_strptime(CAST(policy_issuance_date_ymd AS VARCHAR), '%d-%m-%Y') AS DATE) AS PolicyIssuanceDate,
+                TRY_CAST(annualised_premium AS DOUBLE) AS AnnualPremium,
+                TRY_CAST(la_annual_income AS DOUBLE) AS AnnualIncome,
+                CAST(la_occupation AS VARCHAR) AS Occupation,
+                CAST(la_city AS VARCHAR) AS City,
+                TRY_CAST(la_pin AS DOUBLE) AS PIN,
+                CAST(nominee_relation AS VARCHAR) AS NomineeRelationship,
+                coalesce({nominee_age}, 0) AS NomineeAge,
+                upper(replace(CAST(plan_type AS VARCHAR), '_', '-')) AS PlanType,
+                {_map_sql("CAST(policy_status AS VARCHAR)", status_map, "CAST(policy_status AS VARCHAR)")} AS PolicyStatus,
+                rn
+            FROM pragati_raw
+            WHERE upper(record_type) = 'POLICY'
+            """
+        )
+    else:
+        con.execute(
+            """
+            CREATE OR REPLACE TABLE pragati AS
+            SELECT
+                CAST(CustomerID AS VARCHAR) AS CustomerID,
+                CAST(CustomerName AS VARCHAR) AS CustomerName,
+                CAST(try_strptime(CAST(DOB AS VARCHAR), '%Y-%m-%d') AS DATE) AS DOB,
+                CAST(try_strptime(CAST(PolicyIssuanceDate AS VARCHAR), '%Y-%m-%d') AS DATE) AS PolicyIssuanceDate,
+                TRY_CAST(AnnualPremium AS DOUBLE) AS AnnualPremium,
+                TRY_CAST(AnnualIncome AS DOUBLE) AS AnnualIncome,
+                CAST(Occupation AS VARCHAR) AS Occupation,
+                CAST(City AS VARCHAR) AS City,
+                TRY_CAST(PIN AS DOUBLE) AS PIN,
+                CAST(NomineeRelationship AS VARCHAR) AS NomineeRelationship,
+                TRY_CAST(NomineeAge AS DOUBLE) AS NomineeAge,
+                CAST(PlanType AS VARCHAR) AS PlanType,
+                CAST(PolicyStatus AS VARCHAR) AS PolicyStatus,
+                rn
+            FROM pragati_raw
+            """
+        )
+    for column, allowed in (("PlanType", PRAGATI_PLAN_TYPES), ("PolicyStatus", PRAGATI_POLICY_STATUS)):
+        _validate_enums(con.execute(f"SELECT DISTINCT {column} FROM pragati").df(), column, allowed, "Pragati")
+    for column in ("DOB", "PolicyIssuanceDate"):
+        if con.execute(f"SELECT count(*) FROM pragati WHERE {column} IS NULL").fetchone()[0]:
+            raise ValidationError(f"Pragati column '{column}' has invalid date format. Use YYYY-MM-DD.")
+    for column in ("AnnualPremium", "AnnualIncome", "NomineeAge"):
+        if con.execute(f"SELECT count(*) FROM pragati WHERE {column} IS NULL OR isnan({column})").fetchone()[0]:
+            raise ValidationError(f"Pragati field '{column}' must be numeric.")
+
+
+def _load_d365(con, paths: Sequence[str], today: datetime) -> None:
+    source = _source(paths)
+    con.execute(f"CREATE OR REPLACE TABLE d365_raw AS SELECT *, row_number() OVER () AS rn FROM {source}")
+    columns = _columns(con, "d365_raw")
+    if "record_type" in columns:
+        age = "coalesce(floor(date_diff('day', dob, $today) / 365), 0)"
+        life_stage = (
+            f"CASE WHEN age < 30 THEN 'Young Adult' WHEN age < 40 THEN 'Early Nester' "
+            f"WHEN age < 55 THEN 'Mature Nester' ELSE 'Golden Preserver' END"
+        )
+        counts = ",\n".join(
+            f"count(*) FILTER (WHERE upper(policy_status) = '{status}') AS {column}"
+            for status, column in (
+                ("PP", "PoliciesPP"),
+                ("RPU", "PoliciesRPU"),
+                ("FPU", "PoliciesFPU"),
+                ("SURRENDERED", "PoliciesSurrendered"),
+            )
+        )
+        order = "ORDER BY issued DESC NULLS LAST, rn"
+        con.execute(
+            f"""
+            CREATE OR REPLACE TABLE d365 AS
+            WITH policies AS (
+                SELECT *,
+                    try_strptime(CAST(policy_issuance_date_ymd AS VARCHAR), '%d-%m-%Y') AS issued,
+                    try_strptime(CAST(la_dob_ymd AS VARCHAR), '%d-%m-%Y') AS dob
+                FROM d365_raw WHERE upper(record_type) = 'POLICY'
+            ),
+            customers AS (
+                SELECT
+                    CAST(customer_id AS VARCHAR) AS CustomerID,
+                    first(CAST(SafariPersona AS VARCHAR) {order}) FILTER (WHERE SafariPersona IS NOT NULL) AS SafariPersona,
+                    first({age} {order}) AS age,
+                    coalesce(first(CAST(renewal_bucket AS VARCHAR) {order}) FILTER (WHERE renewal_bucket IS NOT NULL), 'nan')
+                        AS RenewalBucket,
+                    {counts},
+                    count(policy_status) AS PoliciesTotalEver
+                FROM policies
+                WHERE customer_id IS NOT NULL
+                GROUP BY customer_id
+            ),
+            latest_sr AS (
+                SELECT CAST(customer_id AS VARCHAR) AS CustomerID, CAST(SR_Channel AS VARCHAR) AS SR_Channel
+                FROM d365_raw
+                WHERE upper(record_type) = 'SR'
+                QUALIFY row_number() OVER (
+                    PARTITION BY customer_id
+                    ORDER BY try_strptime(CAST(SR_date AS VARCHAR), '%d-%m-%Y') DESC NULLS LAST, rn
+                ) = 1
+            )
+            SELECT
+                c.CustomerID,
+                c.SafariPersona,
+                {life_stage} AS LifeStage,
+                c.RenewalBucket,
+                c.PoliciesPP, c.PoliciesRPU, c.PoliciesFPU, c.PoliciesSurrendered, c.PoliciesTotalEver,
+                'OptedIn' AS ConsentStatus,
+                'Medium' AS RiskTier,
+                CASE WHEN s.CustomerID IS NULL THEN 'Email' ELSE s.SR_Channel END AS PrimaryChannel
+            FROM customers c LEFT JOIN latest_sr s USING (CustomerID)
+            """,
+            {"today": today.date()},
+        )
+    else:
+        con.execute(
+            """
+            CREATE OR REPLACE TABLE d365 AS
+            SELECT
+                CAST(CustomerID AS VARCHAR) AS CustomerID,
+                CAST(SafariPersona AS VARCHAR) AS SafariPersona,
+                CAST(LifeStage AS VARCHAR) AS LifeStage,
+                CAST(RenewalBucket AS VARCHAR) AS RenewalBucket,
+                TRY_CAST(PoliciesPP AS DOUBLE) AS PoliciesPP,
+                TRY_CAST(PoliciesRPU AS DOUBLE) AS PoliciesRPU,
+                TRY_CAST(PoliciesFPU AS DOUBLE) AS PoliciesFPU,
+                TRY_CAST(PoliciesSurrendered AS DOUBLE) AS PoliciesSurrendered,
+                TRY_CAST(PoliciesTotalEver AS DOUBLE) AS PoliciesTotalEver,
+                CAST(ConsentStatus AS VARCHAR) AS ConsentStatus,
+                CAST(RiskTier AS VARCHAR) AS RiskTier,
+                CAST(PrimaryChannel AS VARCHAR) AS PrimaryChannel
+            FROM d365_raw
+            """
+        )
+    for column, allowed in (
+        ("ConsentStatus", D365_CONSENT_VALUES),
+        ("RiskTier", D365_RISK_TIERS),
+        ("SafariPersona", D365_SAFARI_PERSONA),
+        ("LifeStage", D365_LIFESTAGE),
+        ("RenewalBucket", D365_RENEWAL_BUCKETS),
+    ):
+        _validate_enums(con.execute(f"SELECT DISTINCT {column} FROM d365").df(), column, allowed, "D365")
+    duplicates = con.execute(
+        "SELECT CustomerID FROM d365 GROUP BY CustomerID HAVING count(*) > 1 ORDER BY CustomerID"
+    ).fetchall()
+    if duplicates:
+        raise ValidationError(f"D365 has duplicate CustomerID values: {', '.join(row[0] for row in duplicates)}")
+
+
+def _derive_profiles(con, as_of: datetime, pin_index: PinTierIndex | None) -> None:
+    if pin_index is not None:
+        pins = pd.DataFrame({"pin_start": pin_index.starts, "pin_end": pin_index.ends, "city_tier": pin_index.tiers})
+    else:
+        pins = pd.DataFrame({"pin_start": pd.Series(dtype="int64"), "pin_end": pd.Series(dtype="int64"), "city_tier": []})
+    con.register("pin_tiers_frame", pins)
+    con.execute("CREATE OR REPLACE TABLE pin_tiers AS SELECT * FROM pin_tiers_frame")
+    con.unregister("pin_tiers_frame")
+
+    policy_days = "date_diff('day', PolicyIssuanceDate, $today)"
+    renewal_months = f"greatest(floor({policy_days} / 30), 0)"
+    kids = f"NomineeRelationship IN ({_in_list(KIDS_RELATIONSHIPS)})"
+    city_by_name = (
+        f"CASE WHEN City IS NULL OR City = '' THEN 'Unknown' ELSE {_map_sql('City', CITY_TIER_MAP, _quote('Tier3/4'))} END"
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE profiles AS
+        WITH customers AS (
+            SELECT
+                CustomerID,
+                sum(AnnualPremium) AS AnnualPremium,
+                max(AnnualIncome) AS AnnualIncome,
+                min(PolicyIssuanceDate) AS RelationshipStart,
+                first(NomineeRelationship ORDER BY rn) FILTER (WHERE NomineeRelationship IS NOT NULL)
+                    AS NomineeRelationship,
+                max(coalesce(NomineeAge, 0)) AS NomineeAge
+            FROM pragati GROUP BY CustomerID
+        ),
+        latest AS (
+            SELECT CustomerID, CustomerName, DOB, PolicyIssuanceDate, Occupation, City, PIN
+            FROM pragati
+            QUALIFY row_number() OVER (PARTITION BY CustomerID ORDER BY PolicyIssuanceDate DESC NULLS LAST, rn) = 1
+        ),
+        merged AS (
+            SELECT l.*, c.* EXCLUDE (CustomerID), d.* EXCLUDE (CustomerID)
+            FROM latest l
+            JOIN customers c USING (CustomerID)
+            JOIN d365 d USING (CustomerID)
+        ),
+        tiered AS (
+            SELECT m.*, t.city_tier AS PinTier
+            FROM merged m
+            LEFT JOIN pin_tiers t ON CAST(trunc(m.PIN) AS BIGINT) BETWEEN t.pin_start AND t.pin_end
+        )
+        SELECT
+            CustomerID,
+            CustomerName,
+            CAST(floor(date_diff('day', DOB, $today) / 365) AS BIGINT) AS Age,
+            LifeStage,
+            SafariPersona,
+            {_band_sql(policy_days, POLICY_VINTAGE_BUCKETS)} AS PolicyVintage,
+            {_band_sql("date_diff('day', RelationshipStart, $today)", POLICY_VINTAGE_BUCKETS)} AS RelationshipVintage,
+            CASE WHEN AnnualIncome IS NULL OR isnan(AnnualIncome) OR AnnualIncome <= 0 THEN 'Unknown'
+                ELSE {_band_sql("(AnnualPremium / AnnualIncome)", PTI_BANDS)} END AS PremiumToIncomeBand,
+            CASE WHEN RenewalBucket IS NOT NULL AND trim(RenewalBucket) <> '' THEN RenewalBucket
+                WHEN {renewal_months} <= 24 THEN '13M'
+                WHEN {renewal_months} <= 36 THEN '25M'
+                WHEN {renewal_months} <= 48 THEN '37M'
+                WHEN {renewal_months} <= 60 THEN '49M'
+                WHEN {renewal_months} <= 72 THEN '61M'
+                ELSE '61+' END AS RenewalBucket,
+            coalesce(PinTier, {city_by_name}) AS CityTier,
+            CASE WHEN Occupation IS NULL OR Occupation = '' THEN 'Unknown'
+                ELSE {_map_sql('Occupation', OCCUPATION_MAP, _quote('Unknown'))} END AS OccupationType,
+            CASE WHEN {kids} THEN 'Y' ELSE 'Unsure' END AS KidsFlag,
+            CASE WHEN NOT {kids} OR {kids} IS NULL OR NomineeAge IS NULL OR isnan(NomineeAge) THEN 'Unknown'
+                WHEN NomineeAge <= 5 THEN '0-5'
+                WHEN NomineeAge <= 15 THEN '6-15'
+                WHEN NomineeAge <= 22 THEN '16-22'
+                ELSE '22+' END AS KidsAgeBand,
+            CASE WHEN PoliciesTotalEver = 0 THEN 0.0
+                ELSE CAST(PoliciesSurrendered AS DOUBLE) / PoliciesTotalEver END AS PercentSurrenders,
+            CASE WHEN ConsentStatus = 'OptedOut' THEN 'No Contact' ELSE PrimaryChannel END AS PreferredChannel
+        FROM tiered
+        """,
+        {"today": as_of.date()},
+    )
+    if not con.execute("SELECT count(*) FROM profiles").fetchone()[0]:
+        raise ValidationError("No overlapping customers between Pragati and D365 extracts.")
+
+
+def _load_activities(con, library) -> None:
+    frame = pd.DataFrame(
+        {
+            "ActivityID": [record["ActivityID"] for record in library.records],
+            **{
+                column: ["|".join(record.get(column) or []) for record in library.records]
+                for column, *_ in ELIGIBILITY_CHECKS
+            },
+            "exclude_surrender": [
+                _bool_from_flag(record.get("exclude_if_high_surrender_pct")) for record in library.records
+            ],
+        }
+    )
+    con.register("activities_frame", frame)
+    lists = ", ".join(
+        f"CASE WHEN {column} = '' THEN []::VARCHAR[] ELSE string_split({column}, '|') END AS {column}"
+        for column, *_ in ELIGIBILITY_CHECKS
+    )
+    con.execute(
+        f"CREATE OR REPLACE TABLE activities AS SELECT ActivityID, {lists}, exclude_surrender FROM activities_frame"
+    )
+    con.unregister("activities_frame")
+
+
+def _failure_sql() -> str:
+    """Index into :data:`FAILURES` of the first failing check, NULL when eligible."""
+    clauses = [
+        f"WHEN len(a.{column}) > 0 AND NOT coalesce(list_contains(a.{column}, p.{attribute}), false) THEN {number}"
+        for number, (column, attribute, *_) in enumerate(ELIGIBILITY_CHECKS)
+    ]
+    clauses.append(f"WHEN a.exclude_surrender AND p.PercentSurrenders > 0 THEN {len(ELIGIBILITY_CHECKS)}")
+    return "CASE " + " ".join(clauses) + " END"
+
+
+def _stream(cursor, fetch_size: int) -> Iterator[tuple]:
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_pushdown(
+    pragati_paths: Sequence[str],
+    d365_paths: Sequence[str],
+    activities,
+    as_of: datetime,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    build_log: bool = True,
+    batch_size: int = 5000,
+    memory_limit: str | None = None,
+    temp_directory: str | None = None,
+    database: str = ":memory:",
+    pin_index: PinTierIndex | None = None,
+    today: datetime | None = None,
+    fetch_size: int = DEFAULT_FETCH_SIZE,
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """Yield ``(profiles, calendar, decision_log)`` for consecutive ranges of ``batch_size`` customers.
+
+    ``activities`` is the normalised library or a compiled one;
+    ``reference_date`` defaults to ``as_of`` and ``today`` (the clock the
+    record-type D365 LifeStage uses) to the current UTC date. Intermediate
+    tables live in ``database``, an in-memory one unless a file path is given.
+    """
+    library = compile_activity_library(activities)
+    horizon = horizon_table(reference_date or as_of, planning_weeks)
+    con = connect(memory_limit, temp_directory, database)
+    try:
+        _load_pragati(con, pragati_paths)
+        _load_d365(con, d365_paths, today or datetime.utcnow())
+        _derive_profiles(con, as_of, default_pin_tier_index() if pin_index is None else pin_index)
+        _load_activities(con, library)
+        con.execute("DROP TABLE pragati_raw; DROP TABLE d365_raw")
+
+        profiles_cursor = con.cursor()
+        profiles_cursor.execute(f"SELECT {', '.join(PROFILE_OUTPUT_COLUMNS)} FROM profiles ORDER BY CustomerID")
+        pairs_cursor = con.cursor()
+        pairs_cursor.execute(
+            f"""
+            SELECT * FROM (
+                SELECT p.CustomerID, a.ActivityID, {_failure_sql()} AS failure
+                FROM profiles p CROSS JOIN activities a
+            ) {"" if build_log else "WHERE failure IS NULL"}
+            ORDER BY CustomerID
+            """
+        )
+        pairs = _stream(pairs_cursor, fetch_size)
+        pending = next(pairs, None)
+
+        batch: List[Dict] = []
+        calendar_rows: List[Dict] = []
+        log_rows: List[Dict] = []
+        for values in _stream(profiles_cursor, fetch_size):
+            customer = dict(zip(PROFILE_OUTPUT_COLUMNS, values))
+            eligibility: Dict[str, Tuple[str, str, str] | None] = {}
+            while pending is not None and pending[0] == customer["CustomerID"]:
+                eligibility[pending[1]] = None if pending[2] is None else FAILURES[pending[2]]
+                pending = next(pairs, None)
+            customer_calendar, customer_log = schedule_customer(customer, library, horizon, build_log, eligibility)
+            batch.append(customer)
+            calendar_rows.extend(customer_calendar)
+            log_rows.extend(customer_log)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch), _calendar_frame(calendar_rows), _decision_log_frame(log_rows)
+                batch, calendar_rows, log_rows = [], [], []
+        if batch:
+            yield pd.DataFrame(batch), _calendar_frame(calendar_rows), _decision_log_frame(log_rows)
+    finally:
+        con.close()
+
+
+def run_pushdown(
+    pragati_paths: Sequence[str],
+    d365_paths: Sequence[str],
+    activities,
+    as_of: datetime,
+    progress: Callable[[int], None] | None = None,
+    **kwargs,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """All of :func:`iter_pushdown` concatenated: ``(calendar, decision_log, profiles)``."""
+    calendars, logs, profiles = [], [], []
+    for batch_profiles, calendar, decision_log in iter_pushdown(pragati_paths, d365_paths, activities, as_of, **kwargs):
+        profiles.append(batch_profiles)
+        calendars.append(calendar)
+        logs.append(decision_log)
+        if progress is not None:
+            progress(sum(len(frame) for frame in profiles))
+    if not profiles:
+        return _calendar_frame([]), _decision_log_frame([]), pd.DataFrame(columns=PROFILE_OUTPUT_COLUMNS)
+    return (
+        pd.concat(calendars, ignore_index=True),
+        pd.concat(logs, ignore_index=True),
+        pd.concat(profiles, ignore_index=True),
+    )
+
+
+def run_sql_pushdown(config, telemetry=None) -> "BatchResult":
+    """:func:`run_batch.run_pipeline` for ``BatchConfig.sql_pushdown`` runs.
+
+    The ``pushdown`` stage covers DuckDB and the scheduler, whose work
+    interleaves as results stream; ``export`` is timed separately, nested in
+    ``pushdown`` on the ``telemetry`` (a :class:`telemetry.RunTelemetry`).
+    """
+    from export import StreamingExporter
+    from run_batch import BatchResult, StageStats, _check_config, _finish, _load_library, expand_inputs
+    from telemetry import RunTelemetry
+    from verify import PROFILE_COLUMNS as VERIFY_PROFILE_COLUMNS
+
+    if config.capacities or config.branch_capacities:
+        raise ValidationError("Capacities rebalance the whole calendar and cannot run with SQL pushdown")
+    if config.shard is not None:
+        raise ValidationError("Shard runs read pandas extracts; drop --sql-pushdown or the shard options")
+    output_dir = _check_config(config)
+    run_started = time.perf_counter()
+    stages = {name: StageStats(name) for name in ("normalise", "pushdown", "export")}
+    telemetry = telemetry or RunTelemetry(label="batch", trace_memory=config.trace_memory)
+    library, stages["normalise"] = _load_library(config, telemetry)
+
+    exporter = StreamingExporter(
+        output_dir, formats=config.formats, compression=config.compression, dispatch_feeds=config.dispatch_feeds
+    )
+    # only the verifier needs profiles after export, and only three of their columns
+    profiles: List[pd.DataFrame] = []
+    try:
+        with telemetry.stage("pushdown") as pushdown_record:
+            for batch, calendar, decision_log in iter_pushdown(
+                expand_inputs(config.pragati),
+                expand_inputs(config.d365),
+                library,
+                config.as_of,
+                planning_weeks=config.planning_weeks,
+                build_log=config.decision_log,
+                batch_size=config.batch_size,
+                memory_limit=config.memory_limit,
+                temp_directory=config.spill_dir,
+            ):
+                with telemetry.stage("export"):
+                    exporter.write("engagement_calendar", calendar)
+                    if config.decision_log:
+                        exporter.write("decision_log", decision_log)
+                    exporter.write("derived_profile", batch)
+                if config.verify:
+                    profiles.append(batch[VERIFY_PROFILE_COLUMNS])
+                stages["pushdown"].rows_in += len(batch)
+                stages["export"].rows_in += len(calendar) + len(decision_log) + len(batch)
+                stages["pushdown"].rows_out += len(calendar) + len(decision_log)
+    finally:
+        with telemetry.stage("export") as export_record:
+            paths = exporter.close()
+    stages["pushdown"].seconds = pushdown_record.wall_seconds
+    stages["export"].seconds = export_record.wall_seconds
+    stages["export"].rows_out = sum(exporter.rows.values())
+
+    profiles_frame = pd.concat(profiles, ignore_index=True) if profiles else pd.DataFrame(columns=VERIFY_PROFILE_COLUMNS)
+    result = BatchResult(paths=paths, stages=list(stages.values()))
+    result = _finish(config, result, exporter, library.frame, profiles_frame, output_dir, telemetry)
+    result.wall_seconds = time.perf_counter() - run_started
+    return result
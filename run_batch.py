@@ -0,0 +1,512 @@
+"""Headless batch entry point running ingest → derive → normalise → engine → export.
+
+Example::
+
+    python run_batch.py --pragati 'extracts/pragati_*.csv' --d365 extracts/d365.csv \
+        --activity-library data/sample/activity_library.csv --as-of 2024-01-01 \
+        --workers 8 --format csv --compression gzip --output-dir data/output
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Sequence, Tuple
+
+import pandas as pd
+
+from calendar_engine import PLANNING_WEEKS, SCHEDULING_ATTRIBUTES, CompiledLibrary
+from capacity import rebalance_capacity
+from compact import CompactOutputs, run_calendar_engine_compact
+from derive import D365_PROFILE_INPUTS, PRAGATI_PROFILE_INPUTS, build_customer_profile, profile_columns
+from export import COMPRESSION_SUFFIXES, OUTPUT_FORMATS, StreamingExporter
+from fingerprint import fingerprint_files, run_digest
+from ingest import ValidationError, load_d365, load_pragati
+from library_artifact import DEFAULT_CACHE_DIR, load_compiled_library
+from pruning import PruningPlan, plan_pruning, with_dead_activities
+from shard import MERGE_KEYS, shard_dir, shard_rows, write_shard_manifest
+from telemetry import RunTelemetry
+from vector_engine import run_calendar_engine_vectorised
+from verify import verify_output_files
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class BatchConfig:
+    pragati: List[str]
+    d365: List[str]
+    activity_library: List[str]
+    as_of: datetime
+    planning_weeks: int = PLANNING_WEEKS
+    workers: int = 1
+    batch_size: int = DEFAULT_BATCH_SIZE
+    formats: Tuple[str, ...] = ("csv",)
+    compression: str | None = None
+    output_dir: str = "data/output"
+    # owner_type -> weekly slots; enables the capacity post-pass (buffers the calendar)
+    capacities: Dict[str, int] = field(default_factory=dict)
+    branch_capacities: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    # re-read the exported CSVs and attach a violation report to the result
+    verify: bool = False
+    # False skips building and exporting the decision log (see explain.py for replays)
+    decision_log: bool = True
+    # write per-customer schedule fingerprints next to the exports and report the run digest
+    fingerprints: bool = False
+    # also append the calendar to owner_type x channel x week_bucket partitions (see dispatch.py)
+    dispatch_feeds: bool = False
+    # overlap ingest, derive, engine and export on customer ranges (see pipeline.py)
+    pipelined: bool = False
+    # run ingest, derivation and eligibility as DuckDB SQL, spilling past memory_limit (see pushdown.py)
+    sql_pushdown: bool = False
+    memory_limit: str | None = None
+    spill_dir: str | None = None
+    # schedule each batch with the customer-parallel array engine (see vector_engine.py)
+    vectorised: bool = False
+    # directory of compiled activity-library artifacts (see library_artifact.py); None always normalises
+    library_cache: str | None = None
+    # (index, count): schedule only this CustomerID hash shard into output_dir/shard_<index>_of_<count>
+    shard: Tuple[int, int] | None = None
+    # trace per-stage peak memory in the run manifest; tracemalloc slows the engine severalfold
+    trace_memory: bool = False
+    # schedule against the library without activities no customer segment is eligible for (see pruning.py)
+    prune: bool = False
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_out / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class BatchResult:
+    paths: Dict[Tuple[str, str], str]
+    stages: List[StageStats] = field(default_factory=list)
+    violations: pd.DataFrame | None = None
+    digest: str | None = None
+    # end-to-end time when stages overlap, so it is below the sum of stage times
+    wall_seconds: float | None = None
+    # timestamp shared by the run's export file names
+    ts: str | None = None
+
+
+def expand_inputs(patterns: Sequence[str]) -> List[str]:
+    """Expand paths or glob patterns into a sorted, de-duplicated file list."""
+    paths: List[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise ValidationError(f"No input files match {pattern!r}")
+        paths.extend(path for path in matches if path not in paths)
+    return paths
+
+
+def _load_all(paths: Sequence[str], loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+    frames = [loader(path) for path in paths]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _pass_through_columns(config: BatchConfig) -> List[str]:
+    # extract columns carried unchanged through the profile to a post-pass
+    return ["branch_name"] if config.capacities or config.branch_capacities else []
+
+
+def input_columns(config: BatchConfig) -> Tuple[List[str], List[str]]:
+    """Prepared Pragati and D365 columns a run needs; the loaders parse only these and what they validate."""
+    return [*PRAGATI_PROFILE_INPUTS, *_pass_through_columns(config)], list(D365_PROFILE_INPUTS)
+
+
+def project_profiles(profiles: pd.DataFrame, config: BatchConfig) -> pd.DataFrame:
+    """Only the profile columns later stages read: scheduling attributes, the exported profile, pass-throughs."""
+    wanted = {*SCHEDULING_ATTRIBUTES, *profile_columns(), *_pass_through_columns(config)}
+    return profiles[[column for column in profiles.columns if column in wanted]]
+
+
+def customer_batches(profiles: pd.DataFrame, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Contiguous slices of the CustomerID-sorted profile frame."""
+    ordered = profiles.sort_values("CustomerID").reset_index(drop=True)
+    for start in range(0, len(ordered), max(batch_size, 1)):
+        yield ordered.iloc[start : start + batch_size]
+
+
+_WORKER_STATE: Dict[str, object] = {}
+
+
+def _init_worker(
+    library: CompiledLibrary,
+    reference_date: datetime,
+    planning_weeks: int,
+    build_log: bool = True,
+    vectorised: bool = False,
+) -> None:
+    _WORKER_STATE.update(
+        library=library,
+        reference_date=reference_date,
+        planning_weeks=planning_weeks,
+        build_log=build_log,
+        vectorised=vectorised,
+    )
+
+
+def _schedule_batch(batch: pd.DataFrame) -> CompactOutputs:
+    # coded outputs keep the result pickled back from worker processes small
+    engine = run_calendar_engine_vectorised if _WORKER_STATE.get("vectorised") else run_calendar_engine_compact
+    return engine(
+        batch,
+        _WORKER_STATE["library"],
+        reference_date=_WORKER_STATE["reference_date"],
+        planning_weeks=_WORKER_STATE["planning_weeks"],
+        build_log=_WORKER_STATE["build_log"],
+    )
+
+
+def _load_library(config: BatchConfig, telemetry: RunTelemetry) -> Tuple[CompiledLibrary, StageStats]:
+    """The compiled library, from its artifact when ``library_cache`` holds a current one."""
+    stats = StageStats("normalise")
+    with telemetry.stage("normalise") as record:
+        library = load_compiled_library(expand_inputs(config.activity_library), config.library_cache)
+    stats.seconds = record.wall_seconds
+    stats.rows_in = stats.rows_out = len(library.records)
+    return library, stats
+
+
+def _check_config(config: BatchConfig) -> str:
+    """Reject unsupported option combinations; returns the directory outputs go to."""
+    if (config.verify or config.fingerprints) and "csv" not in config.formats:
+        raise ValidationError("Verification and fingerprints read the CSV outputs; add csv to the output formats")
+    if config.verify and not config.decision_log:
+        raise ValidationError("Verification needs the decision log; drop --skip-decision-log")
+    if config.pipelined and config.sql_pushdown:
+        raise ValidationError("Choose one of --pipelined and --sql-pushdown")
+    if config.vectorised and config.sql_pushdown:
+        raise ValidationError("--sql-pushdown streams per-customer eligibility and cannot use --vectorised")
+    if config.shard is not None and "csv" not in config.formats:
+        raise ValidationError("Shard outputs are merged from CSV; add csv to the output formats")
+    if config.shard is not None and (config.capacities or config.branch_capacities):
+        raise ValidationError("Capacities are global across customers and cannot be applied per shard")
+    if config.shard is not None and config.dispatch_feeds:
+        raise ValidationError("Partition the merged shard calendar with dispatch.py instead of per shard")
+    if config.prune and (config.pipelined or config.sql_pushdown):
+        raise ValidationError("--prune plans against the whole book; drop --pipelined or --sql-pushdown")
+    return shard_dir(config.output_dir, *config.shard) if config.shard is not None else config.output_dir
+
+
+def run_pipeline(config: BatchConfig) -> BatchResult:
+    """Run the batch and write ``run_manifest_<ts>.json`` (see telemetry.py) next to the exports."""
+    output_dir = _check_config(config)
+    telemetry = RunTelemetry(label="batch", trace_memory=config.trace_memory)
+    with telemetry.run():
+        if config.pipelined:
+            from pipeline import run_pipelined
+
+            result = run_pipelined(config, telemetry=telemetry)
+        elif config.sql_pushdown:
+            from pushdown import run_sql_pushdown
+
+            result = run_sql_pushdown(config, telemetry=telemetry)
+        else:
+            result = _run_staged(config, telemetry)
+    # rows are counted once, on the StageStats
+    records = {record.name: record for record in telemetry.stages}
+    for stats in result.stages:
+        records[stats.name].rows_in, records[stats.name].rows_out = stats.rows_in, stats.rows_out
+    result.paths[("run_manifest", "json")] = telemetry.write(output_dir, result.ts)
+    return result
+
+
+def _run_staged(config: BatchConfig, telemetry: RunTelemetry) -> BatchResult:
+    names = ("ingest", "derive", "normalise", *(("prune",) if config.prune else ()), "engine", "export")
+    stages: Dict[str, StageStats] = {name: StageStats(name) for name in names}
+    output_dir = _check_config(config)
+
+    with telemetry.stage("ingest") as record:
+        pragati_columns, d365_columns = input_columns(config)
+        pragati = _load_all(expand_inputs(config.pragati), lambda path: load_pragati(path, pragati_columns))
+        d365 = _load_all(expand_inputs(config.d365), lambda path: load_d365(path, d365_columns))
+        if config.shard is not None:
+            pragati, d365 = shard_rows(pragati, *config.shard), shard_rows(d365, *config.shard)
+    stages["ingest"].seconds = record.wall_seconds
+    stages["ingest"].rows_out = len(pragati) + len(d365)
+
+    with telemetry.stage("derive") as record:
+        if config.shard is not None and not set(pragati["CustomerID"]) & set(d365["CustomerID"]):
+            profiles = pd.DataFrame(columns=["CustomerID"])  # a shard may legitimately hold no customers
+        else:
+            profiles = project_profiles(build_customer_profile(pragati, d365, as_of_date=config.as_of), config)
+    stages["derive"].seconds = record.wall_seconds
+    stages["derive"].rows_in = len(pragati) + len(d365)
+    stages["derive"].rows_out = len(profiles)
+    del pragati, d365
+
+    compiled, stages["normalise"] = _load_library(config, telemetry)
+    library = compiled.frame
+    plan: PruningPlan | None = None
+    if config.prune:
+        with telemetry.stage("prune") as record:
+            plan = plan_pruning(profiles, compiled)
+        stages["prune"].seconds = record.wall_seconds
+        stages["prune"].rows_in, stages["prune"].rows_out = len(compiled.records), len(plan.live.records)
+    engine_library = plan.live if plan is not None else compiled
+
+    exporter = StreamingExporter(
+        output_dir, formats=config.formats, compression=config.compression, dispatch_feeds=config.dispatch_feeds
+    )
+    batches = customer_batches(profiles, config.batch_size)
+    derived_cols = list(profile_columns())
+    rebalance = bool(config.capacities or config.branch_capacities)
+    buffered_calendars: List[pd.DataFrame] = []
+
+    def _consume(batch: pd.DataFrame, outputs: CompactOutputs) -> None:
+        calendar, decision_log = outputs.decode_calendar(), outputs.decode_decision_log()
+        if plan is not None and config.decision_log:
+            # dead activities were never evaluated; their exclusions come from the segment plan
+            decision_log = with_dead_activities(decision_log, batch, compiled, plan)
+        stages["engine"].rows_in += len(batch)
+        stages["engine"].rows_out += len(calendar) + len(decision_log)
+        # nested in the engine stage, whose time excludes it
+        with telemetry.stage("export"):
+            if rebalance:
+                buffered_calendars.append(calendar)
+            else:
+                exporter.write("engagement_calendar", calendar)
+            if config.decision_log:
+                exporter.write("decision_log", decision_log)
+            exporter.write("derived_profile", batch[derived_cols])
+        stages["export"].rows_in += len(calendar) + len(decision_log) + len(batch)
+
+    try:
+        with telemetry.stage("engine") as engine_record:
+            if config.workers <= 1:
+                _init_worker(
+                    engine_library, config.as_of, config.planning_weeks, config.decision_log, config.vectorised
+                )
+                for batch in batches:
+                    _consume(batch, _schedule_batch(batch))
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=config.workers,
+                    initializer=_init_worker,
+                    initargs=(
+                        engine_library, config.as_of, config.planning_weeks, config.decision_log, config.vectorised
+                    ),
+                ) as pool:
+                    # results are consumed in submission order; at most 2x workers batches in flight
+                    pending: Deque[Tuple[pd.DataFrame, Future]] = deque()
+                    for batch in batches:
+                        pending.append((batch, pool.submit(_schedule_batch, batch)))
+                        if len(pending) >= 2 * config.workers:
+                            done_batch, future = pending.popleft()
+                            _consume(done_batch, future.result())
+                    while pending:
+                        done_batch, future = pending.popleft()
+                        _consume(done_batch, future.result())
+        if rebalance:
+            # capacities are global across customers, so the calendar is rebalanced as a whole
+            with telemetry.stage("export"):
+                branches = (
+                    profiles.set_index("CustomerID")["branch_name"] if "branch_name" in profiles.columns else None
+                )
+                calendar = rebalance_capacity(
+                    pd.concat(buffered_calendars, ignore_index=True),
+                    library,
+                    config.capacities,
+                    reference_date=config.as_of,
+                    planning_weeks=config.planning_weeks,
+                    branch_capacities=config.branch_capacities,
+                    customer_branches=branches.to_dict() if branches is not None else None,
+                )
+                exporter.write("engagement_calendar", calendar)
+    finally:
+        with telemetry.stage("export") as export_record:
+            paths = exporter.close()
+    stages["engine"].seconds = engine_record.wall_seconds
+    stages["export"].seconds = export_record.wall_seconds
+    stages["export"].rows_out = sum(exporter.rows.values())
+
+    result = BatchResult(paths=paths, stages=list(stages.values()))
+    return _finish(config, result, exporter, library, profiles, output_dir, telemetry)
+
+
+def _finish(
+    config: BatchConfig,
+    result: BatchResult,
+    exporter: StreamingExporter,
+    library: pd.DataFrame,
+    profiles: pd.DataFrame,
+    output_dir: str,
+    telemetry: RunTelemetry,
+) -> BatchResult:
+    """Post-export steps: verification, fingerprints and the shard manifest."""
+    paths = result.paths
+    result.ts = exporter.ts
+    if config.verify:
+        verify_stage = StageStats("verify")
+        with telemetry.stage("verify") as record:
+            result.violations = verify_output_files(
+                paths[("engagement_calendar", "csv")], paths[("decision_log", "csv")], library, profiles
+            )
+        verify_stage.seconds = record.wall_seconds
+        verify_stage.rows_in = exporter.rows.get("engagement_calendar", 0) + exporter.rows.get("decision_log", 0)
+        verify_stage.rows_out = len(result.violations)
+        result.stages.append(verify_stage)
+    if config.fingerprints:
+        fingerprints = fingerprint_files(
+            paths[("engagement_calendar", "csv")], paths.get(("decision_log", "csv"))
+        )
+        path = str(Path(output_dir) / f"fingerprints_{exporter.ts}.csv")
+        fingerprints.to_csv(path, index=False)
+        result.paths[("fingerprints", "csv")] = path
+        result.digest = run_digest(fingerprints)
+    if config.shard is not None:
+        result.paths[("shard_manifest", "json")] = write_shard_manifest(
+            output_dir,
+            *config.shard,
+            as_of=config.as_of,
+            planning_weeks=config.planning_weeks,
+            compression=config.compression,
+            paths={name: path for (name, fmt), path in paths.items() if fmt == "csv" and name in MERGE_KEYS},
+            rows=dict(exporter.rows),
+        )
+    return result
+
+
+def format_summary(result: BatchResult) -> str:
+    lines = [f"{'stage':<10} {'seconds':>9} {'rows_in':>12} {'rows_out':>12} {'rows/s':>12}"]
+    for stage in result.stages:
+        lines.append(
+            f"{stage.name:<10} {stage.seconds:>9.3f} {stage.rows_in:>12,} {stage.rows_out:>12,} "
+            f"{stage.rows_per_second:>12,.0f}"
+        )
+    lines.append(f"{'total':<10} {sum(stage.seconds for stage in result.stages):>9.3f}")
+    if result.wall_seconds is not None:
+        lines.append(f"{'wall':<10} {result.wall_seconds:>9.3f}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Sequence[str] | None = None) -> BatchConfig:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pragati", nargs="+", required=True, help="Pragati extract paths or globs")
+    parser.add_argument("--d365", nargs="+", required=True, help="D365 extract paths or globs")
+    parser.add_argument("--activity-library", nargs="+", required=True, help="Activity library CSV paths or globs")
+    parser.add_argument("--as-of", required=True, type=lambda v: datetime.strptime(v, "%Y-%m-%d"), help="YYYY-MM-DD")
+    parser.add_argument("--planning-weeks", type=int, default=PLANNING_WEEKS)
+    parser.add_argument("--workers", type=int, default=1, help="Engine worker processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Customers per engine batch")
+    parser.add_argument("--format", nargs="+", choices=OUTPUT_FORMATS, default=["csv"], dest="formats")
+    parser.add_argument("--compression", choices=[c for c in COMPRESSION_SUFFIXES if c], default=None)
+    parser.add_argument("--output-dir", default="data/output")
+    parser.add_argument(
+        "--capacity", action="append", default=[], metavar="OWNER=N", help="Weekly slots per owner_type (repeatable)"
+    )
+    parser.add_argument(
+        "--branch-capacity",
+        action="append",
+        default=[],
+        metavar="OWNER:BRANCH=N",
+        help="Weekly slots per owner_type and branch_name (repeatable)",
+    )
+    parser.add_argument("--verify", action="store_true", help="Check output invariants after export")
+    parser.add_argument("--fingerprints", action="store_true", help="Write per-customer schedule fingerprints")
+    parser.add_argument(
+        "--dispatch-feeds", action="store_true", help="Also write the calendar partitioned by owner, channel and week"
+    )
+    parser.add_argument(
+        "--skip-decision-log", action="store_true", help="Export the calendar only; replay decisions with explain.py"
+    )
+    parser.add_argument(
+        "--pipelined", action="store_true", help="Overlap ingest, derive, engine and export on customer ranges"
+    )
+    parser.add_argument(
+        "--sql-pushdown", action="store_true", help="Ingest, derive and filter eligibility in DuckDB (needs duckdb)"
+    )
+    parser.add_argument(
+        "--vectorised", action="store_true", help="Schedule each batch's customers in lockstep over tracker arrays"
+    )
+    parser.add_argument("--memory-limit", help="DuckDB memory limit for --sql-pushdown, e.g. 4GB")
+    parser.add_argument("--spill-dir", help="Where DuckDB spills past --memory-limit")
+    parser.add_argument(
+        "--library-cache",
+        nargs="?",
+        const=str(DEFAULT_CACHE_DIR),
+        help=f"Reuse compiled activity-library artifacts from this directory (default {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument("--shard-index", type=int, help="This node's CustomerID hash shard (see shard.py)")
+    parser.add_argument("--shard-count", type=int, help="Total number of shards")
+    parser.add_argument(
+        "--prune", action="store_true", help="Skip activities no customer segment of the book is eligible for"
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="Record per-stage peak memory in the run manifest (slow)"
+    )
+    args = parser.parse_args(argv)
+    if (args.shard_index is None) != (args.shard_count is None):
+        parser.error("--shard-index and --shard-count go together")
+    try:
+        capacities = {key: int(value) for key, value in (item.split("=", 1) for item in args.capacity)}
+        branch_capacities = {
+            tuple(key.split(":", 1)): int(value) for key, value in (item.split("=", 1) for item in args.branch_capacity)
+        }
+    except ValueError:
+        parser.error("capacities must look like OWNER=N or OWNER:BRANCH=N")
+    return BatchConfig(
+        pragati=args.pragati,
+        d365=args.d365,
+        activity_library=args.activity_library,
+        as_of=args.as_of,
+        planning_weeks=args.planning_weeks,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        formats=tuple(args.formats),
+        compression=args.compression,
+        output_dir=args.output_dir,
+        capacities=capacities,
+        branch_capacities=branch_capacities,
+        verify=args.verify,
+        decision_log=not args.skip_decision_log,
+        fingerprints=args.fingerprints,
+        dispatch_feeds=args.dispatch_feeds,
+        pipelined=args.pipelined,
+        sql_pushdown=args.sql_pushdown,
+        vectorised=args.vectorised,
+        memory_limit=args.memory_limit,
+        spill_dir=args.spill_dir,
+        library_cache=args.library_cache,
+        shard=(args.shard_index, args.shard_count) if args.shard_count is not None else None,
+        trace_memory=args.trace_memory,
+        prune=args.prune,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    config = parse_args(argv)
+    try:
+        result = run_pipeline(config)
+    except ValidationError as exc:
+        print(f"Validation failed: {exc}", file=sys.stderr)
+        return 2
+    print(format_summary(result))
+    for (name, fmt), path in sorted(result.paths.items()):
+        print(f"{name} ({fmt}): {path}")
+    if result.digest:
+        print(f"run digest: {result.digest}")
+    if result.violations is not None and not result.violations.empty:
+        print("Output invariants violated:", file=sys.stderr)
+        print(result.violations.groupby("check").size().to_string(), file=sys.stderr)
+        return 3
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
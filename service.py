@@ -0,0 +1,302 @@
+"""Long-running HTTP service answering single-customer calendar requests.
+
+The normalised activity library is compiled once and kept in memory; the source
+CSV is re-read only when its modification time or size changes. Customer
+profiles keep only their date-independent part, so a lookup's ``as_of`` date
+ages them exactly as a batch run at that date would. With
+``--library-cache`` a restart loads the compiled library from its artifact
+(see ``library_artifact.py``) instead of normalising the CSV again. Endpoints:
+
+- ``GET /health``
+- ``GET /customers/<CustomerID>/calendar?as_of=YYYY-MM-DD&planning_weeks=52``
+  (requires the service to be started with Pragati and D365 extracts)
+- ``POST /calendar`` with ``{"customer": {...profile attributes...}, "as_of": ..., "planning_weeks": ...}``
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from calendar_engine import (
+    PLANNING_WEEKS,
+    SCHEDULING_ATTRIBUTES,
+    CompiledLibrary,
+    horizon_table,
+    schedule_customer,
+)
+from derive import D365_PROFILE_INPUTS, PRAGATI_PROFILE_INPUTS, apply_as_of, derive_base_profile
+from ingest import ValidationError, load_d365, load_pragati
+from library_artifact import compile_library_sources, source_digest
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_CUSTOMER_FIELDS = ("CustomerID", "LifeStage", "SafariPersona", "RenewalBucket")
+NUMERIC_CUSTOMER_FIELDS = ("PercentSurrenders",)
+
+
+def _check_customer_types(customer: Dict) -> None:
+    """Reject attribute values the engine cannot compare: text attributes must be strings, counts numbers."""
+    bad = []
+    for field in SCHEDULING_ATTRIBUTES:
+        value = customer.get(field)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        if field in NUMERIC_CUSTOMER_FIELDS:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                bad.append(f"{field} must be a number")
+        elif not isinstance(value, str) and not (field == "CustomerID" and isinstance(value, int)):
+            bad.append(f"{field} must be a string")
+    if bad:
+        raise ValidationError("; ".join(bad))
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError) as exc:
+        raise ValidationError(f"Invalid date {value!r}; use YYYY-MM-DD") from exc
+
+
+class CalendarService:
+    """Holds the warm library (and optionally base profiles) behind a reload check.
+
+    Each is swapped in as one tuple, so a request never pairs a library with
+    another load's version.
+    """
+
+    def __init__(
+        self,
+        library_path: str,
+        pragati_path: str | None = None,
+        d365_path: str | None = None,
+        profile_as_of: datetime | None = None,
+        library_cache: str | None = None,
+    ) -> None:
+        self.library_path = library_path
+        self.library_cache = library_cache
+        self.pragati_path = pragati_path
+        self.d365_path = d365_path
+        self.profile_as_of = profile_as_of
+        self._lock = threading.Lock()
+        self._library: Tuple[CompiledLibrary, str] | None = None
+        self._library_signature: Tuple[int, int] | None = None
+        self._profiles: Tuple[pd.DataFrame, Dict[str, int]] = (pd.DataFrame(), {})
+        self._profile_signature: Tuple | None = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> None:
+        """Recompile inputs whose files changed; a broken update keeps the previous state."""
+        signature = _file_signature(self.library_path)
+        if signature != self._library_signature:
+            with self._lock:
+                if signature != self._library_signature:
+                    self._load_library(signature)
+        if self.pragati_path and self.d365_path:
+            signature = (_file_signature(self.pragati_path), _file_signature(self.d365_path))
+            if signature != self._profile_signature:
+                with self._lock:
+                    if signature != self._profile_signature:
+                        self._load_profiles(signature)
+
+    def _load_library(self, signature: Tuple[int, int]) -> None:
+        try:
+            with open(self.library_path, "rb") as handle:
+                sources = [handle.read()]
+            # the version is the digest of the bytes compiled, not of a second read
+            digest = source_digest(sources)
+            library = compile_library_sources(sources, digest, self.library_cache)
+        except (ValidationError, OSError) as exc:
+            if self._library is None:
+                raise
+            logger.error("Keeping library %s; reload failed: %s", self.library_version, exc)
+        else:
+            self._library = (library, digest[:12])
+            logger.info("Loaded activity library %s (%d activities)", self.library_version, len(library.records))
+        self._library_signature = signature
+
+    def _load_profiles(self, signature: Tuple) -> None:
+        try:
+            base = derive_base_profile(
+                load_pragati(self.pragati_path, PRAGATI_PROFILE_INPUTS),
+                load_d365(self.d365_path, D365_PROFILE_INPUTS),
+            ).reset_index(drop=True)
+        except (ValidationError, OSError) as exc:
+            if self._profile_signature is None:
+                raise
+            logger.error("Keeping previous profiles; reload failed: %s", exc)
+        else:
+            self._profiles = (base, {str(customer_id): row for row, customer_id in enumerate(base["CustomerID"])})
+            logger.info("Loaded %d customer profiles", len(base))
+        self._profile_signature = signature
+
+    @property
+    def library_version(self) -> str:
+        return self._library[1] if self._library is not None else ""
+
+    @property
+    def customer_count(self) -> int:
+        return len(self._profiles[1])
+
+    def profile(self, customer_id: str, as_of: datetime | None = None) -> Dict | None:
+        """The customer's profile at ``as_of`` (default: the service's ``--as-of``, else today)."""
+        base, rows = self._profiles
+        row = rows.get(customer_id)
+        if row is None:
+            return None
+        return apply_as_of(base.iloc[[row]], as_of or self.profile_as_of).to_dict("records")[0]
+
+    def schedule(
+        self, customer: Dict, reference_date: datetime | None = None, planning_weeks: int = PLANNING_WEEKS
+    ) -> Dict:
+        missing = [field for field in REQUIRED_CUSTOMER_FIELDS if field not in customer]
+        if missing:
+            raise ValidationError(f"Customer attributes missing: {', '.join(missing)}")
+        _check_customer_types(customer)
+        if planning_weeks <= 0:
+            raise ValidationError("planning_weeks must be positive")
+        started = time.perf_counter()
+        self.reload_if_changed()
+        library, version = self._library
+        calendar_rows, log_rows = schedule_customer(customer, library, horizon_table(reference_date, planning_weeks))
+        return {
+            "customer_id": customer["CustomerID"],
+            "library_version": version,
+            "calendar": calendar_rows,
+            "decision_log": sorted(log_rows, key=lambda row: (row["activity_id"], row["stage"], row["reason_code"])),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+
+def _make_handler(service: CalendarService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: HTTPStatus, payload: Dict) -> None:
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _options(self, query: Dict[str, List[str]], body: Dict | None = None) -> Tuple[datetime | None, int]:
+            body = body or {}
+            # explicit values, including 0, win over the query string and defaults
+            as_of = body.get("as_of")
+            if as_of is None:
+                as_of = query.get("as_of", [None])[0]
+            weeks = body.get("planning_weeks")
+            if weeks is None:
+                weeks = query.get("planning_weeks", [PLANNING_WEEKS])[0]
+            try:
+                weeks = int(weeks)
+            except (TypeError, ValueError) as exc:
+                raise ValidationError(f"planning_weeks must be an integer, got {weeks!r}") from exc
+            return _parse_date(as_of), weeks
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            try:
+                if parts == ["health"]:
+                    service.reload_if_changed()
+                    self._send(
+                        HTTPStatus.OK,
+                        {"status": "ok", "library_version": service.library_version, "customers": service.customer_count},
+                    )
+                elif len(parts) == 3 and parts[0] == "customers" and parts[2] == "calendar":
+                    service.reload_if_changed()
+                    as_of, weeks = self._options(parse_qs(url.query))
+                    customer = service.profile(parts[1], as_of)
+                    if customer is None:
+                        self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown customer {parts[1]}"})
+                        return
+                    self._send(HTTPStatus.OK, service.schedule(customer, as_of, weeks))
+                else:
+                    self._send(HTTPStatus.NOT_FOUND, {"error": f"No route for {url.path}"})
+            except ValidationError as exc:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            except Exception:
+                self._internal_error()
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/calendar":
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"No route for {url.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValidationError("Request body must be a JSON object")
+                customer = payload.get("customer")
+                if not isinstance(customer, dict):
+                    raise ValidationError("Request body must include a 'customer' object")
+                as_of, weeks = self._options(parse_qs(url.query), payload)
+                self._send(HTTPStatus.OK, service.schedule(customer, as_of, weeks))
+            except json.JSONDecodeError as exc:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {exc}"})
+            except ValidationError as exc:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            except Exception:
+                self._internal_error()
+
+        def _internal_error(self) -> None:
+            # answer instead of dropping the connection; the traceback goes to the log
+            logger.exception("Unhandled error serving %s %s", self.command, self.path)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"})
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002 - signature from base class
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def make_server(service: CalendarService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), _make_handler(service))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Single-customer calendar service")
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument("--pragati", help="Pragati extract enabling lookups by CustomerID")
+    parser.add_argument("--d365", help="D365 extract enabling lookups by CustomerID")
+    parser.add_argument("--as-of", help="Default as-of date for profile derivation when a request gives none (YYYY-MM-DD)")
+    parser.add_argument("--library-cache", help="Directory of compiled activity-library artifacts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    service = CalendarService(
+        args.activity_library, args.pragati, args.d365, _parse_date(args.as_of), library_cache=args.library_cache
+    )
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
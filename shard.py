@@ -0,0 +1,182 @@
+"""Hash-partitioned multi-node runs and the deterministic merge of their outputs.
+
+Each node runs ``run_batch.py`` with ``--shard-index I --shard-count N``: the
+ingested extracts are filtered to the customers whose ``CustomerID`` hashes to
+shard ``I`` and the shard's outputs plus a ``shard_manifest.json`` land in
+``<output-dir>/shard_<I>_of_<N>``. Shards hold disjoint customers and each shard
+CSV is already customer-sorted, so :func:`merge_shards` k-way merges them on the
+customer column into files identical to a single-node run.
+
+Example::
+
+    python run_batch.py ... --shard-index 3 --shard-count 8 --output-dir /shared/run
+    python shard.py /shared/run --output-dir /shared/run/merged
+"""
+from __future__ import annotations
+
+import argparse
+import bz2
+import csv
+import gzip
+import heapq
+import json
+import lzma
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from export import COMPRESSION_SUFFIXES
+from ingest import ValidationError, timestamp_label
+
+MANIFEST_NAME = "shard_manifest.json"
+# merged artifacts and the customer column each is sorted on
+MERGE_KEYS = {"engagement_calendar": "customer_id", "decision_log": "customer_id", "derived_profile": "CustomerID"}
+_OPENERS = {None: open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+def shard_numbers(customer_ids: pd.Series, shard_count: int) -> np.ndarray:
+    """Shard of each customer; pandas' fixed-key hash is stable across processes and machines."""
+    hashes = pd.util.hash_pandas_object(customer_ids.astype(str), index=False).to_numpy()
+    return (hashes % np.uint64(shard_count)).astype(np.int64)
+
+
+def shard_rows(frame: pd.DataFrame, shard_index: int, shard_count: int, column: str = "CustomerID") -> pd.DataFrame:
+    """Rows of ``frame`` whose ``column`` falls in shard ``shard_index`` of ``shard_count``."""
+    if not 0 <= shard_index < shard_count:
+        raise ValidationError(f"Shard index {shard_index} is outside 0..{shard_count - 1}")
+    return frame[shard_numbers(frame[column], shard_count) == shard_index].reset_index(drop=True)
+
+
+def shard_dir(output_dir: str, shard_index: int, shard_count: int) -> str:
+    return str(Path(output_dir) / f"shard_{shard_index:04d}_of_{shard_count:04d}")
+
+
+def write_shard_manifest(
+    directory: str,
+    shard_index: int,
+    shard_count: int,
+    as_of: datetime,
+    planning_weeks: int,
+    compression: str | None,
+    paths: Dict[str, str],
+    rows: Dict[str, int],
+) -> str:
+    manifest = {
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "as_of": as_of.strftime("%Y-%m-%d"),
+        "planning_weeks": planning_weeks,
+        "compression": compression,
+        "paths": {name: Path(path).name for name, path in paths.items()},
+        "rows": rows,
+    }
+    path = Path(directory) / MANIFEST_NAME
+    path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return str(path)
+
+
+def read_shard_manifests(root: str) -> List[Dict]:
+    """Manifests under ``root``, checked to form one complete, consistent run."""
+    manifests = []
+    for path in sorted(Path(root).glob(f"shard_*/{MANIFEST_NAME}")):
+        manifest = json.loads(path.read_text())
+        manifest["directory"] = str(path.parent)
+        manifests.append(manifest)
+    if not manifests:
+        raise ValidationError(f"No shard manifests under {root}")
+    settings = {(m["shard_count"], m["as_of"], m["planning_weeks"], m["compression"]) for m in manifests}
+    if len(settings) > 1:
+        raise ValidationError(f"Shards come from different runs: {sorted(settings, key=str)}")
+    shard_count = manifests[0]["shard_count"]
+    indices = sorted(m["shard_index"] for m in manifests)
+    if indices != list(range(shard_count)):
+        missing = sorted(set(range(shard_count)) - set(indices))
+        raise ValidationError(f"Expected shards 0..{shard_count - 1}; missing {missing}, found {indices}")
+    return sorted(manifests, key=lambda m: m["shard_index"])
+
+
+def _rows(handle, key: str) -> Iterator[List[str]]:
+    reader = csv.reader(handle)
+    header = next(reader)
+    position = header.index(key)
+    yield header
+    for row in reader:
+        yield row[position], row
+
+
+def merge_csv(paths: Sequence[str], out_path: str, key: str, compression: str | None = None) -> int:
+    """Stream-merge customer-sorted CSVs with disjoint customers; returns data rows written."""
+    opener = _OPENERS[compression]
+    written = 0
+    with ExitStack() as stack:
+        streams = [_rows(stack.enter_context(opener(path, "rt", newline="", encoding="utf-8")), key) for path in paths]
+        headers = [next(stream) for stream in streams]
+        if any(header != headers[0] for header in headers):
+            raise ValidationError(f"Shard files for {Path(out_path).name} have different columns")
+        out = stack.enter_context(opener(out_path, "wt", newline="", encoding="utf-8"))
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(headers[0])
+        # heapq.merge keeps each shard's row order for equal keys, i.e. within a customer
+        for _, row in heapq.merge(*streams, key=lambda item: item[0]):
+            writer.writerow(row)
+            written += 1
+    return written
+
+
+def merge_shards(root: str, output_dir: str) -> Dict[str, str]:
+    """Merge every artifact of the shard run under ``root`` into timestamped files in ``output_dir``."""
+    manifests = read_shard_manifests(root)
+    compression = manifests[0]["compression"]
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    ts = timestamp_label()
+    merged: Dict[str, str] = {}
+    for name, key in MERGE_KEYS.items():
+        paths = [str(Path(m["directory"]) / m["paths"][name]) for m in manifests if name in m["paths"]]
+        if not paths:
+            continue
+        out_path = str(Path(output_dir) / f"{name}_{ts}.csv{COMPRESSION_SUFFIXES[compression]}")
+        written = merge_csv(paths, out_path, key, compression)
+        expected = sum(m["rows"].get(name, 0) for m in manifests)
+        if written != expected:
+            raise ValidationError(f"{name}: merged {written} rows, shard manifests list {expected}")
+        merged[name] = out_path
+    return merged
+
+
+def run_shards_locally(config, shard_count: int, workers: int | None = None) -> Dict[str, str]:
+    """Run every shard of ``config`` in its own process, standing in for nodes, then merge.
+
+    Merged files go to ``<output_dir>/merged``.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from dataclasses import replace
+
+    from run_batch import run_pipeline
+
+    configs = [replace(config, shard=(index, shard_count)) for index in range(shard_count)]
+    with ProcessPoolExecutor(max_workers=workers or shard_count) as pool:
+        list(pool.map(run_pipeline, configs))
+    return merge_shards(config.output_dir, str(Path(config.output_dir) / "merged"))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Merge the CSV outputs of a sharded run")
+    parser.add_argument("root", help="Directory holding the shard_<I>_of_<N> output directories")
+    parser.add_argument("--output-dir", required=True)
+    args = parser.parse_args(argv)
+    try:
+        merged = merge_shards(args.root, args.output_dir)
+    except ValidationError as exc:
+        print(f"Merge failed: {exc}")
+        return 2
+    for name, path in merged.items():
+        print(f"{name}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
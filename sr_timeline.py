@@ -0,0 +1,161 @@
+"""Point-in-time index of D365 service requests (SRs).
+
+SR rows are sorted once by customer and date into contiguous arrays; customer
+``customers[i]`` owns events ``offsets[i]:offsets[i + 1]``. Point-in-time
+questions — the latest SR as of a date, SRs in a trailing window, the last
+channel before a date — are answered for a whole column of customers with one
+``numpy.searchsorted`` over a combined (customer, day) key, so derivations at
+several as-of dates reuse one index instead of re-filtering the SR rows.
+
+As in :func:`ingest.prepare_d365`, an SR dated the same day as another ranks
+behind the one listed first in the extract. SRs whose date does not parse sort
+before every dated SR: they never answer an as-of query and are only returned
+by :meth:`SRTimeline.latest` without ``as_of`` for customers with no dated SR.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# extract column -> prepare_d365 column for the SR attributes kept per event
+SR_FIELDS = {"SR_Channel": "PrimaryChannel", "PCT": "RecentPCT", "CT": "RecentCT", "ST": "RecentST"}
+_UNDATED = np.int64(np.iinfo(np.int32).min)
+_DAY_SPAN = np.int64(1 << 32)
+
+
+def _as_days(values, length: int) -> np.ndarray:
+    """Days since the epoch for a scalar or per-customer date column; NaT stays NaT-valued (int64 min)."""
+    if isinstance(values, (pd.Series, pd.Index, np.ndarray, list)):
+        stamps = pd.to_datetime(pd.Series(values).reset_index(drop=True))
+        days = stamps.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+        missing = stamps.isna().to_numpy()
+    else:
+        stamp = pd.Timestamp(values)
+        days = np.full(length, np.datetime64(stamp.date(), "D").astype(np.int64) if not pd.isna(stamp) else 0)
+        missing = np.full(length, pd.isna(stamp))
+    return np.where(missing, np.iinfo(np.int64).min, days)
+
+
+@dataclass(frozen=True)
+class SRTimeline:
+    customers: np.ndarray
+    offsets: np.ndarray
+    days: np.ndarray
+    fields: Dict[str, np.ndarray]
+    _keys: np.ndarray = field(repr=False)
+
+    @classmethod
+    def from_frame(cls, raw_d365: pd.DataFrame) -> "SRTimeline":
+        """Index the SR rows of a raw record_type D365 extract."""
+        if "record_type" in raw_d365.columns:
+            srs = raw_d365[raw_d365["record_type"].astype(str).str.upper() == "SR"]
+        else:
+            srs = raw_d365.iloc[:0]
+        if len(srs):
+            customer_ids = srs["customer_id"].astype(str).to_numpy(dtype=object)
+            dates = pd.to_datetime(srs["SR_date"], format="%d-%m-%Y", errors="coerce")
+        else:
+            customer_ids, dates = np.array([], dtype=object), pd.Series([], dtype="datetime64[ns]")
+        days = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+        days = np.where(dates.isna().to_numpy(), _UNDATED, days)
+
+        customers, ranks = np.unique(customer_ids, return_inverse=True)
+        # within a day the first extract row must sort last, i.e. be the "latest"
+        order = np.lexsort((-np.arange(len(days)), days, ranks))
+        ranks, days = ranks[order].astype(np.int64), days[order]
+        offsets = np.searchsorted(ranks, np.arange(len(customers) + 1), side="left").astype(np.int64)
+        values = {
+            column: (srs[column].to_numpy(dtype=object)[order] if column in srs.columns else np.full(len(days), None))
+            for column in SR_FIELDS
+        }
+        return cls(
+            customers=customers,
+            offsets=offsets,
+            days=days,
+            fields=values,
+            _keys=ranks * _DAY_SPAN + (days - _UNDATED),
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _ranks(self, customer_ids) -> tuple[np.ndarray, np.ndarray]:
+        ids = pd.Series(customer_ids).astype(str).to_numpy(dtype=object)
+        ranks = np.searchsorted(self.customers, ids) if len(self.customers) else np.zeros(len(ids), dtype=np.int64)
+        known = ranks < len(self.customers)
+        known[known] = self.customers[ranks[known]] == ids[known]
+        return np.where(known, ranks, 0).astype(np.int64), known
+
+    def _search(self, ranks: np.ndarray, days: np.ndarray, side: str) -> np.ndarray:
+        """Position just past the events of each customer on or before (``right``) / before (``left``) ``days``."""
+        bounded = np.clip(days, _UNDATED + 1, -_UNDATED - 1)
+        return np.searchsorted(self._keys, ranks * _DAY_SPAN + (bounded - _UNDATED), side=side)
+
+    def positions(self, customer_ids, as_of=None, strict: bool = False) -> np.ndarray:
+        """Event index of each customer's latest SR on (or, ``strict``, before) ``as_of``; -1 if none.
+
+        Without ``as_of`` this is the customer's latest SR overall, undated ones included.
+        """
+        ranks, known = self._ranks(customer_ids)
+        if not len(self.days):
+            return np.full(len(ranks), -1, dtype=np.int64)
+        starts = self.offsets[ranks]
+        if as_of is None:
+            found = self.offsets[ranks + 1] - 1
+            return np.where(known & (found >= starts), found, -1)
+        days = _as_days(as_of, len(ranks))
+        found = self._search(ranks, days, "left" if strict else "right") - 1
+        hit = known & (days != np.iinfo(np.int64).min) & (found >= starts)
+        hit[hit] = self.days[found[hit]] != _UNDATED
+        return np.where(hit, found, -1)
+
+    def latest(self, customer_ids, as_of=None) -> pd.DataFrame:
+        """``LastEngagementDate`` and the prepare_d365 SR columns of each customer's latest SR as of ``as_of``."""
+        found = self.positions(customer_ids, as_of)
+        hit = found >= 0
+        dates = np.full(len(found), np.datetime64("NaT"), dtype="datetime64[ns]")
+        dated = hit.copy()
+        dated[hit] = self.days[found[hit]] != _UNDATED
+        dates[dated] = self.days[found[dated]].astype("datetime64[D]")
+        frame = {"LastEngagementDate": dates}
+        for column, name in SR_FIELDS.items():
+            values = np.full(len(found), None, dtype=object)
+            values[hit] = self.fields[column][found[hit]]
+            frame[name] = values
+        frame["HasSR"] = hit
+        return pd.DataFrame(frame, index=pd.Index(pd.Series(customer_ids).to_numpy(), name="CustomerID"))
+
+    def count_in_window(self, customer_ids, as_of, days: int) -> np.ndarray:
+        """Number of dated SRs in the ``days`` days ending on ``as_of`` (inclusive)."""
+        ranks, known = self._ranks(customer_ids)
+        if not len(self.days):
+            return np.zeros(len(ranks), dtype=np.int64)
+        end = _as_days(as_of, len(ranks))
+        valid = known & (end != np.iinfo(np.int64).min)
+        end = np.where(valid, end, 0)
+        counts = self._search(ranks, end, "right") - self._search(ranks, end - days, "right")
+        return np.where(valid, counts, 0)
+
+    def last_channel_before(self, customer_ids, before) -> np.ndarray:
+        """SR channel of each customer's last dated SR strictly before ``before``; ``None`` if none."""
+        found = self.positions(customer_ids, before, strict=True)
+        channels = np.full(len(found), None, dtype=object)
+        channels[found >= 0] = self.fields["SR_Channel"][found[found >= 0]]
+        return channels
+
+    def recency_features(self, customer_ids, as_of, window_days: int = 90) -> pd.DataFrame:
+        """Engagement-recency columns at ``as_of``: last SR date and channel, days since it, SRs in the window."""
+        latest = self.latest(customer_ids, as_of)
+        stamp = pd.Timestamp(as_of)
+        return pd.DataFrame(
+            {
+                "LastSRDate": latest["LastEngagementDate"].to_numpy(),
+                "LastSRChannel": latest["PrimaryChannel"].to_numpy(),
+                "DaysSinceLastSR": (stamp.normalize() - latest["LastEngagementDate"]).dt.days.to_numpy(),
+                f"SRsLast{window_days}Days": self.count_in_window(customer_ids, stamp, window_days),
+            },
+            index=latest.index,
+        )
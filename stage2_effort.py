@@ -1,11 +1,46 @@
-"""Placeholder for Stage 2 effort engine."""
+"""Stage 2 effort engine: per-item effort scoring and owner workload rollups."""
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Any
 
 import pandas as pd
 
+# Handling minutes per scheduled item by channel; digital pushes are near-free, human touches are not.
+CHANNEL_EFFORT_MINUTES = {
+    "WhatsApp": 0.5,
+    "Email": 0.5,
+    "SMS": 0.5,
+    "Portal": 0.25,
+    "Telecalling": 12.0,
+    "RMVisit": 45.0,
+    "Branch": 30.0,
+    "Event / Webinar": 5.0,
+    "Webinar": 5.0,
+}
+DEFAULT_CHANNEL_EFFORT_MINUTES = 1.0
+
+# Multiplier by the library's output_type (activity type).
+OUTPUT_TYPE_EFFORT_MULTIPLIER = {
+    "Human_Outreach": 1.5,
+    "Report": 1.3,
+    "Event_Invite": 1.2,
+    "Toolkit": 1.1,
+    "Service_Update": 1.0,
+    "Content_Push": 1.0,
+    "CTA": 1.0,
+    "Offer": 1.0,
+    "Campaign": 1.0,
+}
+
+# Travel overhead for in-person owners by the customer's derived city tier.
+IN_PERSON_CHANNELS = {"RMVisit", "Branch"}
+CITY_TIER_TRAVEL_MULTIPLIER = {"Metro": 1.0, "Tier1": 1.1, "Tier2": 1.2, "Tier3/4": 1.3}
+
+SCORE_COLUMNS = ["customer_id", "week_bucket", "activity_id", "channel", "owner_type", "effort_minutes"]
+ROLLUP_COLUMNS = ["owner_type", "week_bucket", "items", "effort_minutes"]
+
 
 @dataclass
 class EffortEngineInput:
@@ -14,20 +49,108 @@ class EffortEngineInput:
     activities: pd.DataFrame
 
 
+def effort_fingerprint(customer_profiles: pd.DataFrame, calendar: pd.DataFrame, activities: pd.DataFrame) -> str:
+    """Digest of the input columns effort scores read."""
+    digest = hashlib.sha256()
+    for frame, columns in (
+        (calendar, SCORE_COLUMNS[:-1]),
+        (customer_profiles, ["CustomerID", "CityTier"]),
+        (activities, ["ActivityID", "output_type"]),
+    ):
+        used = frame[[column for column in columns if column in frame.columns]]
+        digest.update("\x1f".join(used.columns).encode("utf-8"))
+        # hashed as stored: a string copy of a large calendar costs more than the scoring it saves
+        digest.update(pd.util.hash_pandas_object(used, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
 class EffortEngine:
-    """Stub interface to capture required inputs for future scoring."""
+    """Vectorised effort scorer over the Stage 1 calendar.
+
+    Inputs are held by reference (callers must not mutate them after
+    :meth:`prepare_inputs`). Scores and the workload rollup are cached for the
+    current inputs only, identified by ``calendar_key``.
+    """
 
     def __init__(self) -> None:
         self.last_inputs: EffortEngineInput | None = None
+        self.calendar_key: str | None = None
+        self._scores: pd.DataFrame | None = None
+        self._rollup: pd.DataFrame | None = None
 
     def prepare_inputs(
-        self, customer_profiles: pd.DataFrame, calendar: pd.DataFrame, activities: pd.DataFrame
+        self,
+        customer_profiles: pd.DataFrame,
+        calendar: pd.DataFrame,
+        activities: pd.DataFrame,
+        calendar_key: str | None = None,
     ) -> EffortEngineInput:
-        self.last_inputs = EffortEngineInput(customer_profiles.copy(), calendar.copy(), activities.copy())
+        """Set the inputs; cached results survive only if ``calendar_key`` is unchanged.
+
+        ``calendar_key`` identifies the inputs, e.g. the engine job that built
+        the calendar; by default it is their :func:`effort_fingerprint`.
+        """
+        key = calendar_key if calendar_key is not None else effort_fingerprint(customer_profiles, calendar, activities)
+        if key != self.calendar_key:
+            self._scores = self._rollup = None
+        self.calendar_key = key
+        self.last_inputs = EffortEngineInput(customer_profiles, calendar, activities)
         return self.last_inputs
 
-    def score(self) -> pd.DataFrame:
+    def _require_inputs(self) -> EffortEngineInput:
         if self.last_inputs is None:
             raise ValueError("No inputs prepared for the effort engine.")
-        # Placeholder: return empty DataFrame until scoring rules are defined.
-        return pd.DataFrame()
+        return self.last_inputs
+
+    def score(self) -> pd.DataFrame:
+        """Effort minutes per calendar row, joined to activity and profile attributes by key."""
+        inputs = self._require_inputs()
+        if self._scores is not None:
+            return self._scores
+
+        calendar = inputs.calendar
+        if calendar.empty:
+            return pd.DataFrame(columns=SCORE_COLUMNS)
+
+        effort = calendar["channel"].map(CHANNEL_EFFORT_MINUTES).fillna(DEFAULT_CHANNEL_EFFORT_MINUTES)
+
+        activities = inputs.activities
+        if "output_type" in activities.columns:
+            output_type = pd.Series(activities["output_type"].to_numpy(), index=activities["ActivityID"].to_numpy())
+            effort = effort * calendar["activity_id"].map(output_type).map(OUTPUT_TYPE_EFFORT_MULTIPLIER).fillna(1.0)
+
+        profiles = inputs.customer_profiles
+        if "CityTier" in profiles.columns:
+            city_tier = pd.Series(profiles["CityTier"].to_numpy(), index=profiles["CustomerID"].to_numpy())
+            travel = calendar["customer_id"].map(city_tier).map(CITY_TIER_TRAVEL_MULTIPLIER).fillna(1.0)
+            effort = effort.where(~calendar["channel"].isin(IN_PERSON_CHANNELS), effort * travel)
+
+        scored = pd.DataFrame(
+            {
+                "customer_id": calendar["customer_id"],
+                "week_bucket": calendar["week_bucket"],
+                "activity_id": calendar["activity_id"],
+                "channel": calendar["channel"],
+                "owner_type": calendar["owner_type"],
+                "effort_minutes": effort.round(2),
+            }
+        )
+        self._scores = scored
+        return scored
+
+    def workload_rollup(self) -> pd.DataFrame:
+        """Items and effort minutes per owner type × week, cached for the current inputs."""
+        if self._rollup is not None:
+            return self._rollup
+        scored = self.score()
+        if scored.empty:
+            rollup = pd.DataFrame(columns=ROLLUP_COLUMNS)
+        else:
+            rollup = (
+                scored.groupby(["owner_type", "week_bucket"], sort=True)
+                .agg(items=("effort_minutes", "size"), effort_minutes=("effort_minutes", "sum"))
+                .reset_index()
+            )
+            rollup["effort_minutes"] = rollup["effort_minutes"].round(2)
+        self._rollup = rollup
+        return rollup
@@ -0,0 +1,226 @@
+"""Run telemetry: per-stage wall/CPU time, row counts and peak traced memory.
+
+A :class:`RunTelemetry` wraps each pipeline stage in :meth:`RunTelemetry.stage`
+(optionally inside :meth:`RunTelemetry.run` for the run as a whole) and is
+written as a JSON manifest next to the timestamped exports
+(``run_manifest_<ts>.json``). :func:`compare_manifests` lines two manifests up
+stage by stage to spot regressions between runs.
+
+Tracing memory slows allocation-heavy code such as the engine severalfold,
+so per-stage ``peak_bytes`` are only recorded with ``trace_memory=True``
+(``run_batch.py --trace-memory``); the manifest always carries the process's
+peak resident set size.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MANIFEST_VERSION = 1
+COMPARED_METRICS = ("wall_seconds", "cpu_seconds", "peak_bytes", "rows_out")
+COMPARISON_COLUMNS = ["stage", "metric", "old", "new", "ratio", "regression"]
+
+
+@dataclass
+class StageRecord:
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float | None = None
+    rows_in: int = 0
+    rows_out: int = 0
+    # peak traced allocation above the stage's starting point, in bytes
+    peak_bytes: int | None = None
+
+
+@dataclass
+class _Measurement:
+    # traced memory when the block started and the highest peak seen inside it
+    baseline: int = 0
+    peak: int = 0
+    # wall and CPU time spent in stages nested inside the block
+    nested_wall: float = 0.0
+    nested_cpu: float = 0.0
+
+
+def _peak_rss_bytes(who: str) -> int | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(getattr(resource, who)).ru_maxrss * scale
+
+
+@dataclass
+class RunTelemetry:
+    label: str = "run"
+    trace_memory: bool = False
+    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat(timespec="seconds"))
+    stages: List[StageRecord] = field(default_factory=list)
+    # the whole run, when measured with run(); stages inside it keep their own records
+    run_record: StageRecord | None = None
+    manifest_path: str | None = None
+    _open: List[_Measurement] = field(default_factory=list, repr=False)
+
+    @contextmanager
+    def _measure(self, record: StageRecord, exclusive: bool) -> Iterator[StageRecord]:
+        # tracemalloc has a single peak, so a nested block folds the peak seen so far into the
+        # enclosing measurement before resetting it, and hands its own peak back on exit
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        measurement = _Measurement()
+        if self.trace_memory:
+            if self._open:
+                self._open[-1].peak = max(self._open[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            measurement.baseline = tracemalloc.get_traced_memory()[0]
+        self._open.append(measurement)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._open.pop()
+            if exclusive:
+                record.wall_seconds += wall - measurement.nested_wall
+                record.cpu_seconds = (record.cpu_seconds or 0.0) + cpu - measurement.nested_cpu
+            else:
+                record.wall_seconds += wall
+                record.cpu_seconds = (record.cpu_seconds or 0.0) + cpu
+            if self.trace_memory:
+                peak = max(measurement.peak, tracemalloc.get_traced_memory()[1])
+                record.peak_bytes = max(record.peak_bytes or 0, peak - measurement.baseline)
+                if self._open:
+                    self._open[-1].peak = max(self._open[-1].peak, peak)
+            if self._open:
+                self._open[-1].nested_wall += wall
+                self._open[-1].nested_cpu += cpu
+            if started_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = 0) -> Iterator[StageRecord]:
+        """Time the block as stage ``name``; set ``rows_out`` on the yielded record.
+
+        Entering a stage name again adds to its record, so a stage interleaved
+        with another (export between engine batches) is measured piecewise.
+        Time spent in stages nested inside the block is not counted towards it;
+        ``peak_bytes`` does include them.
+        """
+        record = next((stage for stage in self.stages if stage.name == name), None)
+        if record is None:
+            record = StageRecord(name)
+            self.stages.append(record)
+        record.rows_in += rows_in
+        with self._measure(record, exclusive=True):
+            yield record
+
+    @contextmanager
+    def run(self) -> Iterator[StageRecord]:
+        """Measure the whole run, including stages timed on other threads with :meth:`record`."""
+        self.run_record = StageRecord("run")
+        with self._measure(self.run_record, exclusive=False):
+            yield self.run_record
+
+    def record(self, name: str, wall_seconds: float, rows_in: int = 0, rows_out: int = 0) -> StageRecord:
+        """Add a stage timed elsewhere (e.g. on a worker thread); CPU and memory are not known."""
+        record = StageRecord(name, wall_seconds=wall_seconds, rows_in=rows_in, rows_out=rows_out)
+        self.stages.append(record)
+        return record
+
+    def manifest(self) -> Dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "label": self.label,
+            "started_at": self.started_at,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "stages": [asdict(stage) for stage in self.stages],
+            "run": asdict(self.run_record) if self.run_record is not None else None,
+            # stages overlap when some were timed on threads, so the run's own time wins
+            "total_wall_seconds": (
+                self.run_record.wall_seconds
+                if self.run_record is not None
+                else sum(stage.wall_seconds for stage in self.stages)
+            ),
+            # process high-water marks, including worker processes that have exited
+            "peak_rss_bytes": _peak_rss_bytes("RUSAGE_SELF"),
+            "children_peak_rss_bytes": _peak_rss_bytes("RUSAGE_CHILDREN"),
+        }
+
+    def write(self, directory: str, ts: str) -> str:
+        path = Path(directory) / f"run_manifest_{ts}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.manifest(), indent=2))
+        self.manifest_path = str(path)
+        return self.manifest_path
+
+
+def read_manifest(path: str) -> Dict:
+    return json.loads(Path(path).read_text())
+
+
+def _stages_by_name(manifest: Dict) -> Dict[str, Dict]:
+    stages = list(manifest.get("stages", []))
+    if manifest.get("run"):
+        stages.append(manifest["run"])
+    return {stage["name"]: stage for stage in stages}
+
+
+def compare_manifests(old: Dict, new: Dict, tolerance: float = 0.25, min_seconds: float = 0.05) -> pd.DataFrame:
+    """Stage × metric comparison of two manifests.
+
+    ``regression`` marks times or peaks that grew by more than ``tolerance``
+    (ignoring times below ``min_seconds`` in both runs) and any change in
+    output rows. Stages present in only one manifest are listed with a missing side.
+    """
+    old_stages, new_stages = _stages_by_name(old), _stages_by_name(new)
+    names = list(old_stages) + [name for name in new_stages if name not in old_stages]
+    rows = []
+    for name in names:
+        for metric in COMPARED_METRICS:
+            before = old_stages.get(name, {}).get(metric)
+            after = new_stages.get(name, {}).get(metric)
+            ratio = after / before if before and after is not None else None
+            if before is None or after is None:
+                regression = False
+            elif metric == "rows_out":
+                regression = before != after
+            elif metric.endswith("seconds") and max(before, after) < min_seconds:
+                regression = False
+            else:
+                regression = after > before * (1 + tolerance)
+            rows.append((name, metric, before, after, ratio, regression))
+    return pd.DataFrame(rows, columns=COMPARISON_COLUMNS)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two run manifests stage by stage")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative growth")
+    args = parser.parse_args(argv)
+
+    comparison = compare_manifests(read_manifest(args.old), read_manifest(args.new), tolerance=args.tolerance)
+    print(comparison.to_string(index=False))
+    return 1 if comparison["regression"].any() else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import run_calendar_engine
+from capacity import capacity_utilisation, rebalance_capacity
+from test_engine import make_activity, make_customer
+
+REFERENCE = datetime(2024, 1, 1)
+
+
+def human_setup(n_customers=3, **activity_overrides):
+    customers = pd.concat([make_customer(CustomerID=f"C{i}") for i in range(n_customers)], ignore_index=True)
+    activity = make_activity(
+        "CALL",
+        "call",
+        channels=["Telecalling", "Email"],
+        PreferredChannel="Telecalling",
+        min_gap_activity_weeks=4,
+        **activity_overrides,
+    )
+    calendar, _ = run_calendar_engine(customers, activity, reference_date=REFERENCE, planning_weeks=8)
+    return calendar, activity
+
+
+def test_overflow_shifts_to_nearest_free_week():
+    calendar, activity = human_setup(requires_human=True)
+    assert (calendar.groupby("week_bucket").size() == 3).all()  # weeks 0 and 4
+
+    rebalanced = rebalance_capacity(calendar, activity, {"CallCentre": 2}, reference_date=REFERENCE, planning_weeks=8)
+    usage = capacity_utilisation(rebalanced, {"CallCentre": 2})
+    assert usage["over_capacity"].sum() == 0
+    shifted = rebalanced[rebalanced["reason_codes"].str.contains("WARN_CAPACITY_SHIFTED")]
+    assert shifted["customer_id"].tolist() == ["C2", "C2"]  # last by customer order in each week
+    # W06 still falls in January, where the HARD variety key was already used by the W02 move
+    assert set(shifted["week_bucket"]) == {"2024-W02", "2024-W07"}
+    assert len(rebalanced) == len(calendar)
+
+    again = rebalance_capacity(calendar, activity, {"CallCentre": 2}, reference_date=REFERENCE, planning_weeks=8)
+    pd.testing.assert_frame_equal(rebalanced, again)
+
+
+def test_falls_back_to_digital_or_flags_overbooking():
+    calendar, activity = human_setup()
+    rebalanced = rebalance_capacity(
+        calendar, activity, {"CallCentre": 1}, reference_date=REFERENCE, planning_weeks=8, max_shift_weeks=0
+    )
+    fallback = rebalanced[rebalanced["reason_codes"].str.contains("WARN_CAPACITY_CHANNEL_FALLBACK")]
+    assert len(fallback) == 4
+    assert set(fallback["channel"]) == {"Email"}
+    assert set(fallback["owner_type"]) == {"Digital"}
+
+    calendar, activity = human_setup(requires_human=True)
+    rebalanced = rebalance_capacity(
+        calendar, activity, {"CallCentre": 1}, reference_date=REFERENCE, planning_weeks=8, max_shift_weeks=0
+    )
+    assert rebalanced["reason_codes"].str.contains("WARN_CAPACITY_OVERBOOKED").sum() == 4
+
+
+def test_branch_capacity_overrides_owner_pool():
+    calendar, activity = human_setup(requires_human=True)
+    rebalanced = rebalance_capacity(
+        calendar,
+        activity,
+        {"CallCentre": 10},
+        reference_date=REFERENCE,
+        planning_weeks=8,
+        branch_capacities={("CallCentre", "Pune"): 1},
+        customer_branches={"C0": "Pune", "C1": "Pune"},
+    )
+    shifted = rebalanced[rebalanced["reason_codes"].str.contains("WARN_CAPACITY_SHIFTED")]
+    assert set(shifted["customer_id"]) == {"C1"}
+
+
+def test_only_hard_items_block_a_variety_month():
+    activities = pd.concat(
+        [
+            make_activity("CALL", "call", channels=["Telecalling"], PreferredChannel="Telecalling", requires_human=True),
+            make_activity("TIP_SOFT", "call", penalty_mode="SOFT"),
+            make_activity("TIP_HARD", "call"),
+        ],
+        ignore_index=True,
+    )
+
+    def item(customer, week, activity, channel, owner):
+        return {
+            "customer_id": customer,
+            "week_bucket": week,
+            "month_bucket": "2024-01",
+            "activity_id": activity,
+            "category": "Everyday Life & Learning",
+            "sub_category": "Test",
+            "channel": channel,
+            "owner_type": owner,
+            "reason_codes": "PASS_SCHEDULE",
+        }
+
+    def rebalanced_c1(tip):
+        # C1's call overflows W01; W02 is its only free week, and its tip shares the January variety key
+        calendar = pd.DataFrame(
+            [
+                item("C0", "2024-W01", "CALL", "Telecalling", "CallCentre"),
+                item("C1", "2024-W01", "CALL", "Telecalling", "CallCentre"),
+                item("C1", "2024-W03", tip, "Email", "Digital"),
+            ]
+        )
+        rebalanced = rebalance_capacity(
+            calendar, activities, {"CallCentre": 1}, reference_date=REFERENCE, planning_weeks=8
+        )
+        return rebalanced[(rebalanced["customer_id"] == "C1") & (rebalanced["activity_id"] == "CALL")].iloc[0]
+
+    moved = rebalanced_c1("TIP_SOFT")
+    assert moved["week_bucket"] == "2024-W02" and moved["reason_codes"].endswith("WARN_CAPACITY_SHIFTED")
+    blocked = rebalanced_c1("TIP_HARD")
+    assert blocked["week_bucket"] == "2024-W01" and blocked["reason_codes"].endswith("WARN_CAPACITY_OVERBOOKED")
@@ -0,0 +1,53 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from city_tiers import PinTierIndex, resolve_city_tiers
+from derive import _city_to_tier, build_customer_profile
+from ingest import ValidationError, load_d365, load_pragati
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "sample"
+TABLE = pd.DataFrame(
+    {
+        "pin_start": [400001, 110001, 682001],
+        "pin_end": [400104, 110097, 682041],
+        "city": ["Mumbai", "Delhi", "Kochi"],
+        "city_tier": ["Metro", "Metro", "Tier2"],
+    }
+)
+
+
+def test_lookup_uses_inclusive_ranges():
+    index = PinTierIndex.from_frame(TABLE)
+    pins = pd.Series([400001, 400104, 400105, 110000, 682041, None, "bad", 999999])
+    assert index.lookup(pins).tolist() == ["Metro", "Metro", None, None, "Tier2", None, None, None]
+
+
+def test_city_name_is_the_fallback():
+    index = PinTierIndex.from_frame(TABLE)
+    pins = pd.Series([682010, None, 560001, None])
+    cities = pd.Series(["Somewhere", "Pune", "Bengaluru", None])
+    assert resolve_city_tiers(pins, cities, index, _city_to_tier).tolist() == ["Tier2", "Tier1", "Metro", "Unknown"]
+
+
+def test_overlapping_ranges_are_rejected():
+    overlapping = pd.concat([TABLE, TABLE.iloc[[0]].assign(pin_start=400100, pin_end=400200)])
+    with pytest.raises(ValidationError, match="overlap"):
+        PinTierIndex.from_frame(overlapping)
+
+
+def test_profiles_are_tiered_by_pin():
+    profiles = build_customer_profile(load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")))
+    tiers = dict(zip(profiles["City"], profiles["CityTier"]))
+    # Kochi is not in the city-name map; its PIN range places it in Tier2
+    assert tiers["Kochi"] == "Tier2"
+    assert tiers["Mumbai"] == "Metro"
+    empty = PinTierIndex.from_frame(TABLE.iloc[:0])
+    by_name = build_customer_profile(
+        load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")), pin_index=empty
+    )
+    assert dict(zip(by_name["City"], by_name["CityTier"]))["Kochi"] == "Tier3/4"
@@ -0,0 +1,39 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import REASON_CODES, run_calendar_engine
+from compact import REASON_BITS, decode_reason_mask, reason_mask, run_calendar_engine_compact
+from test_verify import AS_OF, sample_outputs
+
+
+def test_decoded_outputs_match_engine_frames():
+    calendar, decision_log, activities, profiles = sample_outputs()
+    many = pd.concat([profiles.assign(CustomerID=profiles["CustomerID"] + f"_{i}") for i in range(20)])
+
+    compact = run_calendar_engine_compact(many, activities, reference_date=AS_OF)
+    expected_calendar, expected_log = run_calendar_engine(many, activities, reference_date=AS_OF)
+    pd.testing.assert_frame_equal(compact.decode_calendar(), expected_calendar)
+    pd.testing.assert_frame_equal(compact.decode_decision_log(), expected_log)
+
+    string_bytes = expected_calendar.memory_usage(deep=True).sum() + expected_log.memory_usage(deep=True).sum()
+    assert compact.memory_usage() * 5 < string_bytes
+
+
+def test_reason_masks_round_trip_in_emission_order():
+    assert set(REASON_BITS) == REASON_CODES
+    for codes in (
+        "PASS_ELIGIBILITY|PASS_MODIFIER|PASS_CAP|PASS_SCHEDULE",
+        "PASS_ELIGIBILITY|PASS_MODIFIER|WARN_CAP_FALLBACK_DEFAULT|PASS_CAP|PASS_SCHEDULE|WARN_VARIETY_KEY_RECENT_SOFT",
+        "PASS_ELIGIBILITY|PASS_MODIFIER|PASS_CAP|PASS_SCHEDULE|WARN_CAPACITY_SHIFTED",
+    ):
+        assert decode_reason_mask(reason_mask(codes)) == codes
+
+
+def test_empty_run_decodes_to_empty_frames():
+    _, _, activities, profiles = sample_outputs()
+    compact = run_calendar_engine_compact(profiles.iloc[0:0], activities, reference_date=AS_OF)
+    assert compact.decode_calendar().empty and compact.decode_decision_log().empty
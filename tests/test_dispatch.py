@@ -0,0 +1,75 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from dispatch import DispatchFeeds, main, partition_calendar, read_feed, read_index
+from ingest import ValidationError
+from run_batch import run_pipeline
+from test_run_batch import sample_config
+
+
+def _calendar(result) -> pd.DataFrame:
+    return pd.read_csv(result.paths[("engagement_calendar", "csv")], dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_batch_run_writes_partitions_matching_the_calendar(tmp_path, compression):
+    result = run_pipeline(sample_config(tmp_path, dispatch_feeds=True, compression=compression))
+    index_path = Path(result.paths[("dispatch_index", "csv")])
+    index = read_index(index_path.parent)
+    calendar = _calendar(result)
+
+    expected = calendar.groupby(["owner_type", "channel", "week_bucket"]).size()
+    assert index.set_index(["owner_type", "channel", "week_bucket"])["rows"].to_dict() == expected.to_dict()
+    assert index["rows"].sum() == len(calendar)
+
+    # every slice holds exactly its rows, in calendar order
+    for row in index.itertuples():
+        part = read_feed(index_path.parent, row.owner_type, row.channel, row.week_bucket)
+        mask = (
+            (calendar["owner_type"] == row.owner_type)
+            & (calendar["channel"] == row.channel)
+            & (calendar["week_bucket"] == row.week_bucket)
+        )
+        pd.testing.assert_frame_equal(part, calendar[mask].reset_index(drop=True))
+
+
+def test_partitions_are_appended_across_batches(tmp_path):
+    calendar = pd.DataFrame(
+        {
+            "customer_id": ["C1", "C1", "C2", "C3"],
+            "week_bucket": ["2024-W01", "2024-W02", "2024-W01", "2024-W01"],
+            "owner_type": ["Digital", "Digital", "Digital", "RM"],
+            "channel": ["Event / Webinar", "Email", "Event / Webinar", "RMVisit"],
+        }
+    )
+    feeds = DispatchFeeds(tmp_path / "dispatch")
+    feeds.write(calendar.iloc[:2])
+    feeds.write(calendar.iloc[2:])
+    feeds.close()
+
+    index = read_index(tmp_path / "dispatch")
+    assert index["rows"].tolist() == [1, 2, 1]
+    assert all((tmp_path / "dispatch" / path).exists() for path in index["path"])
+    webinar = read_feed(tmp_path / "dispatch", channel="Event / Webinar")
+    assert webinar["customer_id"].tolist() == ["C1", "C2"]
+    assert read_feed(tmp_path / "dispatch", owner_type="RM")["customer_id"].tolist() == ["C3"]
+
+
+def test_cli_partitions_an_exported_calendar(tmp_path, capsys):
+    result = run_pipeline(sample_config(tmp_path / "run"))
+    calendar_path = result.paths[("engagement_calendar", "csv")]
+    assert main([calendar_path, "--output-dir", str(tmp_path / "feeds")]) == 0
+    (directory,) = (tmp_path / "feeds").glob("dispatch_*")
+    assert Path(calendar_path).name.replace("engagement_calendar_", "dispatch_").removesuffix(".csv") == directory.name
+    assert read_index(directory)["rows"].sum() == len(_calendar(result))
+    assert partition_calendar(calendar_path, str(tmp_path / "feeds")) == str(directory / "dispatch_index.csv")
+
+
+def test_dispatch_feeds_are_not_written_per_shard(tmp_path):
+    with pytest.raises(ValidationError, match="dispatch.py"):
+        run_pipeline(sample_config(tmp_path, dispatch_feeds=True, shard=(0, 2)))
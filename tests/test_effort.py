@@ -0,0 +1,81 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from stage2_effort import EffortEngine, effort_fingerprint
+
+
+def make_inputs():
+    profiles = pd.DataFrame({"CustomerID": ["C1", "C2"], "CityTier": ["Metro", "Tier2"]})
+    activities = pd.DataFrame({"ActivityID": ["A1", "A2"], "output_type": ["Content_Push", "Human_Outreach"]})
+    calendar = pd.DataFrame(
+        [
+            {"customer_id": "C1", "week_bucket": "2024-W01", "activity_id": "A1", "channel": "Email", "owner_type": "Digital"},
+            {"customer_id": "C1", "week_bucket": "2024-W02", "activity_id": "A2", "channel": "RMVisit", "owner_type": "RM"},
+            {"customer_id": "C2", "week_bucket": "2024-W02", "activity_id": "A2", "channel": "RMVisit", "owner_type": "RM"},
+            {"customer_id": "C2", "week_bucket": "2024-W02", "activity_id": "A2", "channel": "Telecalling", "owner_type": "CallCentre"},
+        ]
+    )
+    return profiles, calendar, activities
+
+
+def test_score_requires_inputs():
+    with pytest.raises(ValueError):
+        EffortEngine().score()
+
+
+def test_effort_scoring_by_channel_type_and_city_tier():
+    profiles, calendar, activities = make_inputs()
+    engine = EffortEngine()
+    prepared = engine.prepare_inputs(profiles, calendar, activities)
+    assert prepared.calendar is calendar  # held by reference, not copied
+
+    scored = engine.score()
+    assert scored["effort_minutes"].tolist() == [0.5, 67.5, 81.0, 18.0]
+
+    rollup = engine.workload_rollup()
+    rm = rollup[(rollup["owner_type"] == "RM") & (rollup["week_bucket"] == "2024-W02")].iloc[0]
+    assert rm["items"] == 2
+    assert rm["effort_minutes"] == pytest.approx(148.5)
+    assert engine.workload_rollup() is rollup
+
+    engine.prepare_inputs(profiles, calendar.iloc[:1], activities)
+    assert engine.workload_rollup() is not rollup
+    assert engine.workload_rollup()["items"].sum() == 1
+
+
+def test_results_are_cached_for_the_current_calendar_key_only():
+    profiles, calendar, activities = make_inputs()
+    engine = EffortEngine()
+    engine.prepare_inputs(profiles, calendar, activities, calendar_key="job-1")
+    first = engine.workload_rollup()
+    # a rerun hands over fresh frames for the same job
+    engine.prepare_inputs(profiles.copy(), calendar.copy(), activities.copy(), calendar_key="job-1")
+    assert engine.workload_rollup() is first
+
+    engine.prepare_inputs(profiles, calendar.iloc[:1], activities, calendar_key="job-2")
+    assert engine.workload_rollup()["items"].sum() == 1
+    # only the current calendar's results are held, so going back recomputes
+    engine.prepare_inputs(profiles, calendar, activities, calendar_key="job-1")
+    again = engine.workload_rollup()
+    assert again is not first
+    pd.testing.assert_frame_equal(again, first)
+
+    # without a key the inputs' content identifies them
+    engine.prepare_inputs(profiles.copy(), calendar.copy(), activities.copy())
+    keyed = engine.workload_rollup()
+    engine.prepare_inputs(profiles.copy(), calendar.copy(), activities.copy())
+    assert engine.workload_rollup() is keyed
+
+
+def test_fingerprint_follows_the_scored_columns_only():
+    profiles, calendar, activities = make_inputs()
+    fingerprint = effort_fingerprint(profiles, calendar, activities)
+    assert effort_fingerprint(profiles.copy(), calendar.assign(note="x"), activities) == fingerprint
+    changed = calendar.copy()
+    changed.loc[3, "channel"] = "RMVisit"
+    assert effort_fingerprint(profiles, changed, activities) != fingerprint
@@ -246,3 +246,14 @@ def test_cap_fallback_default_with_warning():
     included = log[(log["activity_id"] == "CAP") & (log["result"] == "INCLUDED")]
     assert "cap_source=DEFAULT" in included.iloc[0]["details"]
     assert "WARN_CAP_FALLBACK_DEFAULT" in included.iloc[0]["details"] or "WARN_CAP_FALLBACK_DEFAULT" in "|".join(calendar["reason_codes"])
+
+
+def test_horizon_table_is_cached_and_indexes_months():
+    from calendar_engine import horizon_table
+
+    table = horizon_table(datetime(2020, 12, 30), 6)
+    assert table is horizon_table(datetime(2020, 12, 28), 6)  # same Monday -> shared table
+    assert table.weeks == ("2020-W53", "2021-W01", "2021-W02", "2021-W03", "2021-W04", "2021-W05")
+    assert table.month_labels == ("2020-12", "2021-01", "2021-02")
+    assert table.month_index == (0, 1, 1, 1, 1, 2)
+    assert table.month_starts == (0, 1, 5)
@@ -0,0 +1,40 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import run_calendar_engine
+from explain import run_explainable
+from test_verify import AS_OF, sample_outputs
+
+
+def test_calendar_only_run_replays_exact_log_rows():
+    _, _, activities, profiles = sample_outputs()
+    many = pd.concat([profiles.assign(CustomerID=profiles["CustomerID"] + f"_{i}") for i in range(10)])
+    calendar, decision_log = run_calendar_engine(many, activities, reference_date=AS_OF)
+
+    run = run_explainable(many, activities, reference_date=AS_OF)
+    pd.testing.assert_frame_equal(run.calendar, calendar)
+    for _, row in decision_log.sample(40, random_state=3).iterrows():
+        assert run.explain(row["customer_id"], row["activity_id"]) == row.to_dict()
+    pd.testing.assert_frame_equal(run.decision_log(), decision_log)
+
+
+def test_skipping_the_log_leaves_calendar_unchanged():
+    _, _, activities, profiles = sample_outputs()
+    calendar, decision_log = run_calendar_engine(profiles, activities, reference_date=AS_OF)
+    lazy_calendar, lazy_log = run_calendar_engine(profiles, activities, reference_date=AS_OF, build_log=False)
+    pd.testing.assert_frame_equal(lazy_calendar, calendar)
+    assert lazy_log.empty
+
+
+def test_unknown_keys_raise():
+    _, _, activities, profiles = sample_outputs()
+    run = run_explainable(profiles, activities, reference_date=AS_OF)
+    with pytest.raises(KeyError):
+        run.explain("NOPE", "ELL_FIN_001")
+    with pytest.raises(KeyError):
+        run.explain(profiles["CustomerID"].iloc[0], "NOPE")
@@ -0,0 +1,47 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import run_calendar_engine
+from fingerprint import customer_fingerprints, diff_fingerprints, drill_down, fingerprint_files, run_digest
+from test_verify import AS_OF, sample_outputs
+
+
+def test_files_and_frames_fingerprint_identically(tmp_path):
+    calendar, decision_log, _, _ = sample_outputs()
+    calendar_path, log_path = tmp_path / "calendar.csv", tmp_path / "log.csv"
+    calendar.to_csv(calendar_path, index=False)
+    decision_log.to_csv(log_path, index=False)
+
+    in_memory = customer_fingerprints(calendar, decision_log)
+    streamed = fingerprint_files(str(calendar_path), str(log_path), chunksize=7)
+    assert in_memory.equals(streamed)
+    assert run_digest(in_memory) == run_digest(streamed.sample(frac=1, random_state=1))
+
+
+def test_diff_lists_only_changed_customers_and_drills_down():
+    calendar, decision_log, activities, profiles = sample_outputs()
+    before = customer_fingerprints(calendar, decision_log)
+
+    changed = profiles.copy()
+    changed.loc[changed["CustomerID"] == "C002", "SafariPersona"] = "Hawk"
+    new_calendar, new_log = run_calendar_engine(changed, activities, reference_date=AS_OF)
+    after = customer_fingerprints(new_calendar, new_log)
+
+    assert run_digest(before) != run_digest(after)
+    diff = diff_fingerprints(before, after)
+    assert diff["customer_id"].tolist() == ["C002"]
+    assert diff.loc[0, "status"] == "changed" and diff.loc[0, "decision_changed"]
+
+    rows = drill_down(calendar, new_calendar, diff["customer_id"])
+    assert set(rows["customer_id"]) <= {"C002"}
+    assert set(rows["side"]) <= {"old", "new"}
+
+
+def test_added_and_removed_customers():
+    calendar, decision_log, _, _ = sample_outputs()
+    full = customer_fingerprints(calendar, decision_log)
+    partial = full[full["customer_id"] != "C001"]
+    assert diff_fingerprints(full, partial)[["customer_id", "status"]].values.tolist() == [["C001", "removed"]]
+    assert diff_fingerprints(partial, full)[["customer_id", "status"]].values.tolist() == [["C001", "added"]]
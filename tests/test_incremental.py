@@ -0,0 +1,114 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import build_customer_profile
+from incremental import run_incremental
+from ingest import prepare_d365, prepare_pragati
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "sample"
+AS_OF = datetime(2024, 1, 1)
+
+
+def raw_inputs():
+    return (
+        pd.read_csv(SAMPLE / "pragati.csv"),
+        pd.read_csv(SAMPLE / "d365.csv"),
+        pd.read_csv(SAMPLE / "activity_library.csv"),
+    )
+
+
+def assert_matches_full_run(result, pragati, d365, library, as_of=AS_OF, reference_date=None):
+    profiles = build_customer_profile(prepare_pragati(pragati.copy()), prepare_d365(d365.copy()), as_of_date=as_of)
+    calendar, decision_log = run_calendar_engine(
+        profiles, normalise_activity_library(library), reference_date=reference_date or as_of
+    )
+    pd.testing.assert_frame_equal(result.calendar, calendar, check_dtype=False)
+    pd.testing.assert_frame_equal(result.decision_log, decision_log, check_dtype=False)
+    assert result.profiles["CustomerID"].tolist() == profiles["CustomerID"].tolist()
+
+
+def test_first_run_then_no_op(tmp_path):
+    pragati, d365, library = raw_inputs()
+    first = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert first.full_reason == "no previous state"
+    assert_matches_full_run(first, pragati, d365, library)
+
+    again = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert (again.rederived, again.rescheduled, again.log_patched, again.full_reason) == (0, 0, 0, None)
+    assert_matches_full_run(again, pragati, d365, library)
+
+
+def test_changed_customer_only_is_rescheduled(tmp_path):
+    pragati, d365, library = raw_inputs()
+    run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+
+    d365.loc[(d365["customer_id"] == "C003") & (d365["record_type"] == "POLICY"), "SafariPersona"] = "Deer"
+    result = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert (result.rederived, result.rescheduled) == (1, 1)
+    assert_matches_full_run(result, pragati, d365, library)
+
+
+def test_unchanged_profile_after_rederive_keeps_schedule(tmp_path):
+    pragati, d365, library = raw_inputs()
+    run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+
+    # a new SR changes the raw rows but none of the scheduling attributes
+    sr = d365[(d365["customer_id"] == "C002") & (d365["record_type"] == "SR")].iloc[[0]].assign(SR_date="01-12-2023")
+    d365 = pd.concat([d365, sr], ignore_index=True)
+    result = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert (result.rederived, result.rescheduled) == (1, 0)
+    assert_matches_full_run(result, pragati, d365, library)
+
+
+def test_library_edit_reschedules_only_affected_customers(tmp_path):
+    pragati, d365, library = raw_inputs()
+    run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+
+    library.loc[library["activity_id"] == "ELL_FIN_003", "eligible_safari_personas"] = "Deer"
+    library = library[library["activity_id"] != "POL_BON_001"]
+    result = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert result.rederived == 0
+    assert result.rescheduled + result.log_patched == len(result.profiles)
+    assert_matches_full_run(result, pragati, d365, library)
+
+
+def test_removed_customer_and_new_as_of(tmp_path):
+    pragati, d365, library = raw_inputs()
+    run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+
+    pragati = pragati[pragati["customer_id"] != "C005"]
+    result = run_incremental(pragati, d365, library, str(tmp_path), AS_OF)
+    assert result.removed == 1
+    assert "C005" not in set(result.decision_log["customer_id"])
+    assert_matches_full_run(result, pragati, d365, library)
+
+    later = datetime(2024, 1, 3)
+    moved = run_incremental(pragati, d365, library, str(tmp_path), later, reference_date=AS_OF)
+    assert (moved.rederived, moved.rescheduled, moved.full_reason) == (0, 0, None)
+    assert_matches_full_run(moved, pragati, d365, library, as_of=later, reference_date=AS_OF)
+
+
+def test_new_as_of_reschedules_only_customers_whose_attributes_moved(tmp_path):
+    pragati, d365, library = raw_inputs()
+    # blank buckets are derived from policy months, so they move with the as-of date
+    d365["renewal_bucket"] = ""
+    run_incremental(pragati, d365, library, str(tmp_path), AS_OF, reference_date=AS_OF)
+
+    later = datetime(2024, 6, 29)
+    moved = run_incremental(pragati, d365, library, str(tmp_path), later, reference_date=AS_OF)
+    assert (moved.rederived, moved.rescheduled, moved.full_reason) == (0, 1, None)
+    assert moved.profiles.set_index("CustomerID")["RenewalBucket"]["C005"] == "61+"
+    assert_matches_full_run(moved, pragati, d365, library, as_of=later, reference_date=AS_OF)
+
+    # a moved horizon anchor still reschedules everyone
+    shifted = run_incremental(pragati, d365, library, str(tmp_path), later)
+    assert shifted.full_reason == "planning horizon changed"
+    assert shifted.rescheduled == len(shifted.profiles)
+    assert_matches_full_run(shifted, pragati, d365, library, as_of=later)
@@ -0,0 +1,103 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import run_calendar_engine
+from jobs import JOB_CANCELLED, JOB_DONE, JOB_FAILED, JobStore, submit_engine_run
+from test_engine import make_activity, make_customer
+
+
+def wait_for(store, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job.finished:
+            # the terminal status is published last, so a finished job always has its time
+            assert job.finished_at is not None
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_engine_job_reports_progress_and_matches_sync_run():
+    customers = pd.concat([make_customer(CustomerID=f"C{i}") for i in range(3)], ignore_index=True)
+    activities = pd.concat([make_activity("A1", "K1"), make_activity("A2", "K2", priority=1)], ignore_index=True)
+    store = JobStore()
+    try:
+        job = wait_for(store, submit_engine_run(store, customers, activities, reference_date=datetime(2024, 1, 1)))
+    finally:
+        store.shutdown()
+
+    assert job.status == JOB_DONE
+    assert (job.processed, job.total) == (3, 3)
+    calendar, log = run_calendar_engine(customers, activities, reference_date=datetime(2024, 1, 1))
+    pd.testing.assert_frame_equal(job.result[0], calendar)
+    pd.testing.assert_frame_equal(job.result[1], log)
+
+
+def test_cancel_and_failure_are_recorded():
+    started = threading.Event()
+
+    def slow(progress):
+        started.set()
+        for done in range(1000):
+            progress(done, 1000)
+            time.sleep(0.005)
+
+    def broken(progress):
+        raise ValueError("bad input")
+
+    store = JobStore(max_workers=2)
+    try:
+        slow_id = store.submit("slow", slow)
+        broken_id = store.submit("broken", broken)
+        started.wait(5)
+        assert store.cancel(slow_id)
+        assert wait_for(store, slow_id).status == JOB_CANCELLED
+        failed = wait_for(store, broken_id)
+    finally:
+        store.shutdown()
+    assert failed.status == JOB_FAILED
+    assert "bad input" in failed.error
+    assert not store.cancel(slow_id)
+
+
+def test_partial_items_accumulate_while_the_job_runs():
+    def work(progress):
+        progress(1, 2, partial=["a"])
+        progress(2, 2, partial=["b", "c"])
+        progress(2, 2)
+        return "done"
+
+    store = JobStore()
+    try:
+        job = wait_for(store, store.submit("partial", work))
+    finally:
+        store.shutdown()
+    assert job.status == JOB_DONE
+    assert job.partial == ["a", "b", "c"]
+
+
+def test_only_the_most_recently_finished_jobs_are_kept():
+    release = threading.Event()
+    store = JobStore(max_workers=2, keep_finished=2)
+    try:
+        finished = [wait_for(store, store.submit(f"quick {n}", lambda progress, n=n: n)).job_id for n in range(3)]
+        blocked = store.submit("blocked", lambda progress: release.wait(5))
+        assert store.get(finished[0]) is None
+        assert [job.job_id for job in store.jobs()] == [blocked, finished[2], finished[1]]
+        # running jobs are never evicted, however many finish after them
+        for n in range(3):
+            wait_for(store, store.submit(f"later {n}", lambda progress: None))
+        assert store.get(blocked) is not None
+        release.set()
+        assert wait_for(store, blocked).status == JOB_DONE
+    finally:
+        release.set()
+        store.shutdown()
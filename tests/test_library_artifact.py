@@ -0,0 +1,106 @@
+from pathlib import Path
+import pickle
+import shutil
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import library_artifact
+from activity_library import normalise_activity_library
+from calendar_engine import compile_activity_library
+from ingest import load_activity_library
+from library_artifact import (
+    artifact_path,
+    compile_library_frame,
+    file_digest,
+    load_compiled_library,
+    read_artifact,
+    write_artifact,
+)
+from run_batch import run_pipeline
+from test_run_batch import SAMPLE, sample_config
+
+LIBRARY_CSV = SAMPLE / "activity_library.csv"
+
+
+def _expected():
+    return compile_activity_library(normalise_activity_library(load_activity_library(str(LIBRARY_CSV))))
+
+
+def assert_same_library(left, right):
+    # records hold NaN for blank optional fields, so compare through the frames
+    pd.testing.assert_frame_equal(left.frame, right.frame)
+    pd.testing.assert_frame_equal(pd.DataFrame(list(left.records)), pd.DataFrame(list(right.records)))
+
+
+def test_artifact_round_trip_matches_normalisation(tmp_path):
+    library = load_compiled_library([str(LIBRARY_CSV)], tmp_path)
+    path = artifact_path(tmp_path, file_digest([str(LIBRARY_CSV)]))
+    assert path.exists()
+
+    cached = read_artifact(path, file_digest([str(LIBRARY_CSV)]))
+    expected = _expected()
+    assert_same_library(cached, expected)
+    assert_same_library(library, expected)
+
+
+def test_second_load_skips_normalisation(tmp_path, monkeypatch):
+    load_compiled_library([str(LIBRARY_CSV)], tmp_path)
+
+    def fail(_):
+        raise AssertionError("normalised again despite a current artifact")
+
+    monkeypatch.setattr(library_artifact, "normalise_activity_library", fail)
+    assert_same_library(load_compiled_library([str(LIBRARY_CSV)], tmp_path), _expected())
+
+
+def test_changed_source_gets_a_new_artifact(tmp_path):
+    csv = tmp_path / "library.csv"
+    shutil.copy(LIBRARY_CSV, csv)
+    cache = tmp_path / "cache"
+    before = load_compiled_library([str(csv)], cache)
+
+    raw = pd.read_csv(csv)
+    raw = raw[raw["activity_id"] != raw["activity_id"].iloc[0]]
+    raw.to_csv(csv, index=False)
+    after = load_compiled_library([str(csv)], cache)
+
+    assert len(after.records) == len(before.records) - 1
+    assert len(list(cache.glob("activity_library_*.pkl"))) == 2
+
+
+def test_stale_or_corrupt_artifacts_are_rejected(tmp_path):
+    digest = file_digest([str(LIBRARY_CSV)])
+    path = artifact_path(tmp_path, digest)
+    write_artifact(path, digest, _expected())
+    assert read_artifact(path, digest) is not None
+    assert read_artifact(path, "0" * 64) is None
+
+    with open(path, "wb") as handle:
+        pickle.dump({"version": library_artifact.ARTIFACT_VERSION - 1, "source_digest": digest}, handle)
+        pickle.dump(_expected(), handle)
+    assert read_artifact(path, digest) is None
+    assert_same_library(load_compiled_library([str(LIBRARY_CSV)], tmp_path), _expected())
+    assert read_artifact(path, digest) is not None  # rebuilt over the stale one
+
+    path.write_bytes(path.read_bytes()[:100])
+    assert read_artifact(path, digest) is None
+
+
+def test_frame_artifacts_are_keyed_by_content(tmp_path):
+    raw = load_activity_library(str(LIBRARY_CSV))
+    assert_same_library(compile_library_frame(raw, tmp_path), _expected())
+    assert_same_library(compile_library_frame(raw.copy(), tmp_path), _expected())
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+    compile_library_frame(raw.iloc[1:], tmp_path)
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+
+
+def test_batch_run_with_library_cache_matches(tmp_path):
+    plain = run_pipeline(sample_config(tmp_path / "plain"))
+    for run in ("cold", "warm"):
+        cached = run_pipeline(sample_config(tmp_path / run, library_cache=str(tmp_path / "cache"), workers=2))
+        for name in ("engagement_calendar", "decision_log"):
+            assert Path(cached.paths[(name, "csv")]).read_text() == Path(plain.paths[(name, "csv")]).read_text()
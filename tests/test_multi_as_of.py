@@ -0,0 +1,81 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import apply_as_of, build_customer_profile, derive_base_profile
+from ingest import load_activity_library, load_d365, load_pragati
+from multi_as_of import run_multi_as_of
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "sample"
+DATES = [datetime(2024, 7, 1), datetime(2024, 8, 1), datetime(2031, 9, 1)]
+
+
+def _extracts():
+    return load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv"))
+
+
+# Age, PolicyVintage, RelationshipVintage, RenewalBucket for C001..C005 at each of DATES,
+# worked out by hand from the fixture's dates (ages and vintages in 365-day years)
+EXPECTED = {
+    DATES[0]: [
+        (36, "1-3Y", "3-5Y", "37M"),
+        (30, "0-1Y", "0-1Y", "13M"),
+        (41, "3-5Y", "3-5Y", "61+"),
+        (46, "1-3Y", "1-3Y", "49M"),
+        (34, "5Y+", "5Y+", "61+"),
+    ],
+    # C002 turns 31 and C004's policy passes 1,095 days
+    DATES[1]: [
+        (36, "1-3Y", "3-5Y", "37M"),
+        (31, "0-1Y", "0-1Y", "13M"),
+        (41, "3-5Y", "3-5Y", "61+"),
+        (46, "3-5Y", "3-5Y", "49M"),
+        (34, "5Y+", "5Y+", "61+"),
+    ],
+    DATES[2]: [
+        (43, "5Y+", "5Y+", "37M"),
+        (38, "5Y+", "5Y+", "13M"),
+        (48, "5Y+", "5Y+", "61+"),
+        (53, "5Y+", "5Y+", "49M"),
+        (41, "5Y+", "5Y+", "61+"),
+    ],
+}
+# RenewalBucket derived from 30-day months since issuance when the extract leaves it blank
+DERIVED_BUCKETS = {
+    DATES[0]: ["13M", "13M", "49M", "25M", "61+"],  # C001: 747 days, 24 months
+    DATES[1]: ["25M", "13M", "49M", "25M", "61+"],  # C001: 778 days, 25 months
+    DATES[2]: ["61+"] * 5,
+}
+AS_OF_COLUMNS = ["Age", "PolicyVintage", "RelationshipVintage", "RenewalBucket"]
+
+
+def test_as_of_columns_match_hand_computed_values():
+    pragati, d365 = _extracts()
+    base = derive_base_profile(pragati, d365)
+    snapshot = base.copy()
+    assert base["CustomerID"].tolist() == ["C001", "C002", "C003", "C004", "C005"]
+    blank = base.assign(RenewalBucket=None)
+    for as_of in DATES:
+        profile = apply_as_of(base, as_of)
+        assert list(profile[AS_OF_COLUMNS].itertuples(index=False, name=None)) == EXPECTED[as_of]
+        assert apply_as_of(blank, as_of)["RenewalBucket"].tolist() == DERIVED_BUCKETS[as_of]
+    pd.testing.assert_frame_equal(base, snapshot)
+
+
+def test_multi_as_of_matches_separate_runs():
+    pragati, d365 = _extracts()
+    activities = normalise_activity_library(load_activity_library(str(SAMPLE / "activity_library.csv")))
+    runs = run_multi_as_of(pragati, d365, activities, DATES, workers=2, batch_size=2)
+    assert list(runs) == DATES
+    for as_of, run in runs.items():
+        profiles = build_customer_profile(pragati, d365, as_of)
+        calendar, decision_log = run_calendar_engine(profiles, activities, reference_date=as_of)
+        pd.testing.assert_frame_equal(run.profiles, profiles)
+        pd.testing.assert_frame_equal(run.calendar, calendar)
+        pd.testing.assert_frame_equal(run.decision_log, decision_log)
@@ -0,0 +1,102 @@
+import io
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ingest import ValidationError, load_d365, load_pragati
+from jobs import JOB_FAILED, JobStore
+from preview import FULL_READ_BYTES, preview_upload, submit_upload_validation, validate_upload
+from test_jobs import wait_for
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "sample"
+
+
+def large_pragati(min_bytes: int = 4 * FULL_READ_BYTES, bad_tail: float = 0.0) -> bytes:
+    """The sample extract repeated with fresh customer IDs; the last ``bad_tail`` share gets a bad plan type."""
+    sample = pd.read_csv(SAMPLE / "pragati.csv", dtype=str, keep_default_na=False)
+    copies = min_bytes // len(sample.to_csv(index=False).encode()) + 1
+    frame = pd.concat(
+        [sample.assign(customer_id=sample["customer_id"] + f"_{copy}") for copy in range(copies)], ignore_index=True
+    )
+    if bad_tail:
+        tail = frame.index >= len(frame) * (1 - bad_tail)
+        frame.loc[tail & (frame["record_type"] == "POLICY"), "plan_type"] = "ENDOWMENT"
+    return frame.to_csv(index=False).encode()
+
+
+@pytest.mark.parametrize("kind", ["pragati", "d365"])
+def test_sample_uploads_preview_clean(kind):
+    preview = preview_upload(SAMPLE / f"{kind}.csv", kind)
+    assert preview.ok
+    assert set(preview.checks["check"]) == {"enum", "date YYYY-MM-DD", "numeric"}
+    assert preview.record_types == {"POLICY": 6, "SR": 6}
+
+
+def test_misnamed_column_is_reported_with_a_suggestion():
+    data = (SAMPLE / "pragati.csv").read_bytes().replace(b",plan_type,", b",Plan_Type,", 1)
+    preview = preview_upload(data, "pragati")
+    missing = preview.header[preview.header["status"] == "MISSING"]
+    assert missing[["column", "examples"]].values.tolist() == [["plan_type", "did you mean 'Plan_Type'?"]]
+    assert not preview.ok and preview.checks.empty
+
+
+def test_stratified_sample_finds_problems_at_the_end_of_a_large_file():
+    data = large_pragati(bad_tail=0.1)
+    preview = preview_upload(data, "pragati")
+    assert preview.sampled_rows == 2000 < data.count(b"\n") // 4
+    plan = preview.checks.set_index("column").loc["PlanType"]
+    assert plan["status"] == "FAIL" and plan["examples"] == "ENDOWMENT"
+    assert preview.seconds < 1
+
+
+@pytest.mark.parametrize("kind, loader", [("pragati", load_pragati), ("d365", load_d365)])
+def test_full_validation_matches_the_loader(kind, loader):
+    calls = []
+    frame = validate_upload(
+        (SAMPLE / f"{kind}.csv").read_bytes(),
+        kind,
+        progress=lambda done, total, partial=(): calls.append((done, total, list(partial))),
+        chunk_rows=5,
+    )
+    pd.testing.assert_frame_equal(frame, loader(SAMPLE / f"{kind}.csv"))
+    size = (SAMPLE / f"{kind}.csv").stat().st_size
+    assert len(calls) == 3 and calls[-1] == (size, size, [])
+    assert all(partial == [] for _, _, partial in calls)
+
+
+def test_chunk_dtype_disagreements_get_whole_file_inference():
+    data = (SAMPLE / "pragati.csv").read_bytes()
+    header, *rows = data.decode().splitlines()
+    column = header.split(",").index("policy_id")
+    # numeric policy ids in the first chunk, text in the second: a per-chunk parse mixes types
+    edited = [
+        ",".join(str(900 + i) if j == column else field for j, field in enumerate(row.split(",")))
+        if i < 5 else row
+        for i, row in enumerate(rows)
+    ]
+    edited_bytes = "\n".join([header, *edited, ""]).encode()
+    frame = validate_upload(edited_bytes, "pragati", chunk_rows=5)
+    pd.testing.assert_frame_equal(frame, load_pragati(io.BytesIO(edited_bytes)))
+
+
+def test_validation_job_publishes_issues_before_failing():
+    data = large_pragati(min_bytes=FULL_READ_BYTES, bad_tail=0.5)
+    store = JobStore()
+    try:
+        job = wait_for(store, submit_upload_validation(store, data, "pragati", chunk_rows=2000), timeout=60)
+    finally:
+        store.shutdown()
+    with pytest.raises(ValidationError) as exc:
+        load_pragati(io.BytesIO(data))
+    assert job.status == JOB_FAILED
+    assert job.error == f"ValidationError: {exc.value}"
+
+    issues = pd.DataFrame(job.partial)
+    assert set(issues["column"]) == {"PlanType"} and set(issues["examples"]) == {"ENDOWMENT"}
+    # only chunks from the corrupted second half report, each with its row range
+    assert int(issues["rows"].iloc[0].split("-")[0]) > 1
+    assert issues["failed"].sum() == (pd.read_csv(io.BytesIO(data))["plan_type"] == "ENDOWMENT").sum()
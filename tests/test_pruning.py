@@ -0,0 +1,40 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import run_calendar_engine
+from pruning import plan_pruning, run_pruned
+from test_verify import AS_OF, sample_outputs
+
+
+def test_pruned_run_matches_full_run():
+    _, _, activities, profiles = sample_outputs()
+    many = pd.concat([profiles.assign(CustomerID=profiles["CustomerID"] + f"_{i}") for i in range(10)])
+    calendar, decision_log = run_calendar_engine(many, activities, reference_date=AS_OF)
+
+    pruned_calendar, pruned_log, plan = run_pruned(many, activities, reference_date=AS_OF)
+    assert plan.dead
+    assert len(plan.segments) == len(profiles)
+    assert plan.segments["customers"].sum() == len(many)
+    pd.testing.assert_frame_equal(pruned_calendar, calendar)
+    pd.testing.assert_frame_equal(pruned_log, decision_log)
+
+
+def test_lint_flags_values_outside_the_derived_vocabulary():
+    _, _, activities, profiles = sample_outputs()
+    plan = plan_pruning(profiles, activities)
+    unsatisfiable = plan.lint[plan.lint["issue"] == "UNSATISFIABLE"]
+    assert {"LOW", "MID"} <= set(unsatisfiable.loc[unsatisfiable["field"] == "pti_eligibility", "value"])
+    assert "0_6" in set(unsatisfiable.loc[unsatisfiable["field"] == "kids_age_bands", "value"])
+    assert set(unsatisfiable["activity_id"]) <= set(activities["ActivityID"])
+
+
+def test_kids_only_activities_die_in_a_book_without_kids():
+    _, _, activities, profiles = sample_outputs()
+    no_kids = profiles.assign(KidsFlag="Unsure", KidsAgeBand="Unknown")
+    kids_only = set(activities.loc[activities["kids_flags"].map(bool), "ActivityID"])
+    assert kids_only
+    assert kids_only <= set(plan_pruning(no_kids, activities).dead)
@@ -0,0 +1,77 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("duckdb")
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import build_customer_profile
+from ingest import ValidationError, load_activity_library, load_d365, load_pragati
+from pushdown import PROFILE_OUTPUT_COLUMNS, run_pushdown
+from run_batch import run_pipeline
+from telemetry import read_manifest
+from test_run_batch import AS_OF, SAMPLE, sample_config
+
+
+def _library():
+    return normalise_activity_library(load_activity_library(str(SAMPLE / "activity_library.csv")))
+
+
+@pytest.mark.parametrize("build_log", [True, False])
+def test_pushdown_matches_pandas_path(build_log):
+    library = _library()
+    profiles = build_customer_profile(
+        load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")), as_of_date=AS_OF
+    )
+    calendar, decision_log = run_calendar_engine(profiles, library, reference_date=AS_OF, build_log=build_log)
+
+    pushed_calendar, pushed_log, pushed_profiles = run_pushdown(
+        [str(SAMPLE / "pragati.csv")], [str(SAMPLE / "d365.csv")], library, AS_OF, build_log=build_log, batch_size=2
+    )
+    pd.testing.assert_frame_equal(pushed_calendar, calendar.reset_index(drop=True))
+    pd.testing.assert_frame_equal(pushed_log, decision_log.reset_index(drop=True))
+    expected = profiles[PROFILE_OUTPUT_COLUMNS].reset_index(drop=True).astype(str)
+    pd.testing.assert_frame_equal(pushed_profiles.astype(str), expected)
+
+
+def test_pushdown_spills_under_a_memory_limit(tmp_path):
+    library = _library()
+    calendar, _, _ = run_pushdown(
+        [str(SAMPLE / "pragati.csv")], [str(SAMPLE / "d365.csv")], library, AS_OF, build_log=False
+    )
+    limited, _, _ = run_pushdown(
+        [str(SAMPLE / "pragati.csv")],
+        [str(SAMPLE / "d365.csv")],
+        library,
+        AS_OF,
+        build_log=False,
+        memory_limit="64MB",
+        temp_directory=str(tmp_path / "spill"),
+    )
+    pd.testing.assert_frame_equal(limited, calendar)
+
+
+def test_pushdown_validates_enums(tmp_path):
+    bad = tmp_path / "pragati.csv"
+    raw = pd.read_csv(SAMPLE / "pragati.csv")
+    raw.loc[raw["record_type"].str.upper() == "POLICY", "plan_type"] = "NOT_A_PLAN"
+    raw.to_csv(bad, index=False)
+    with pytest.raises(ValidationError, match="PlanType"):
+        run_pushdown([str(bad)], [str(SAMPLE / "d365.csv")], _library(), AS_OF)
+
+
+def test_sql_pushdown_batch_run_matches_staged_run(tmp_path):
+    staged = run_pipeline(sample_config(tmp_path / "staged", fingerprints=True, verify=True))
+    pushed = run_pipeline(sample_config(tmp_path / "pushdown", sql_pushdown=True, fingerprints=True, verify=True))
+    for name in ("engagement_calendar", "decision_log", "derived_profile"):
+        assert Path(pushed.paths[(name, "csv")]).read_text() == Path(staged.paths[(name, "csv")]).read_text()
+    assert pushed.digest == staged.digest
+    assert pushed.violations.empty
+    manifest = read_manifest(pushed.paths[("run_manifest", "json")])
+    assert [stage["name"] for stage in manifest["stages"]] == ["normalise", "pushdown", "export", "verify"]
+    assert manifest["run"]["cpu_seconds"] > 0
@@ -0,0 +1,186 @@
+from datetime import datetime
+import gzip
+import json
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import build_customer_profile, profile_columns
+from ingest import (
+    ValidationError,
+    d365_read_columns,
+    load_activity_library,
+    load_d365,
+    load_pragati,
+    pragati_read_columns,
+    read_projected,
+)
+from run_batch import BatchConfig, format_summary, input_columns, project_profiles, run_pipeline
+from telemetry import read_manifest
+
+SAMPLE = ROOT / "data" / "sample"
+AS_OF = datetime(2024, 1, 1)
+
+
+def sample_config(tmp_path, **overrides):
+    config = BatchConfig(
+        pragati=[str(SAMPLE / "prag*.csv")],
+        d365=[str(SAMPLE / "d365.csv")],
+        activity_library=[str(SAMPLE / "activity_library.csv")],
+        as_of=AS_OF,
+        batch_size=2,
+        output_dir=str(tmp_path),
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def reference_outputs():
+    profiles = build_customer_profile(
+        load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")), as_of_date=AS_OF
+    )
+    library = normalise_activity_library(load_activity_library(str(SAMPLE / "activity_library.csv")))
+    return run_calendar_engine(profiles, library, reference_date=AS_OF)
+
+
+def test_reads_are_projected_to_the_columns_the_run_needs(tmp_path):
+    config = sample_config(tmp_path)
+    pragati_columns, d365_columns = input_columns(config)
+    raw_pragati = read_projected(SAMPLE / "pragati.csv", pragati_read_columns(pragati_columns))
+    raw_d365 = read_projected(SAMPLE / "d365.csv", d365_read_columns(d365_columns))
+    assert len(pd.read_csv(SAMPLE / "pragati.csv").columns) == 47
+    assert (len(raw_pragati.columns), len(raw_d365.columns)) == (17, 12)
+
+    pragati = load_pragati(SAMPLE / "pragati.csv", pragati_columns)
+    full_pragati = load_pragati(SAMPLE / "pragati.csv")
+    pd.testing.assert_frame_equal(pragati, full_pragati[pragati.columns])
+    d365 = load_d365(SAMPLE / "d365.csv", d365_columns)
+    full_d365 = load_d365(SAMPLE / "d365.csv")
+    pd.testing.assert_frame_equal(d365, full_d365)
+
+    profiles = project_profiles(build_customer_profile(pragati, d365, as_of_date=AS_OF), config)
+    expected = build_customer_profile(full_pragati, full_d365, as_of_date=AS_OF)
+    pd.testing.assert_frame_equal(profiles[list(profile_columns())], expected[list(profile_columns())])
+    assert "branch_name" not in profiles.columns
+
+    # branch capacities need branch_name carried from the extract to the post-pass
+    config.branch_capacities = {("RM", "Pune Camp"): 1}
+    pragati = load_pragati(SAMPLE / "pragati.csv", input_columns(config)[0])
+    profiles = project_profiles(build_customer_profile(pragati, d365, as_of_date=AS_OF), config)
+    assert profiles.set_index("CustomerID")["branch_name"]["C002"] == "Pune Camp"
+
+
+def test_batched_csv_matches_single_pass(tmp_path):
+    result = run_pipeline(sample_config(tmp_path, workers=2))
+    calendar, decision_log = reference_outputs()
+
+    streamed = Path(result.paths[("engagement_calendar", "csv")]).read_text()
+    assert streamed == calendar.to_csv(index=False)
+    streamed_log = Path(result.paths[("decision_log", "csv")]).read_text()
+    assert streamed_log == decision_log.to_csv(index=False)
+
+    summary = format_summary(result)
+    for stage in ("ingest", "derive", "normalise", "engine", "export"):
+        assert stage in summary
+
+
+def test_compressed_json_is_a_single_record_array(tmp_path):
+    result = run_pipeline(sample_config(tmp_path, formats=("json",), compression="gzip"))
+    path = result.paths[("engagement_calendar", "json")]
+    assert path.endswith(".json.gz")
+    with gzip.open(path, "rt") as handle:
+        records = json.load(handle)
+    calendar, _ = reference_outputs()
+    assert len(records) == len(calendar)
+    assert pd.DataFrame(records)["customer_id"].tolist() == calendar["customer_id"].tolist()
+
+
+def test_capacity_post_pass_caps_human_load(tmp_path):
+    result = run_pipeline(sample_config(tmp_path, capacities={"CallCentre": 1, "RM": 1}))
+    calendar = pd.read_csv(result.paths[("engagement_calendar", "csv")])
+    human = calendar[calendar["channel"].isin(["Telecalling", "RMVisit"])]
+    flagged = human["reason_codes"].str.contains("WARN_CAPACITY_OVERBOOKED")
+    assert (human[~flagged].groupby(["owner_type", "week_bucket"]).size() <= 1).all()
+    assert calendar["reason_codes"].str.contains("WARN_CAPACITY_").any()
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_verify_gate_reports_clean_run(tmp_path, pipelined):
+    result = run_pipeline(sample_config(tmp_path, verify=True, compression="gzip", pipelined=pipelined))
+    assert result.violations is not None and result.violations.empty
+    assert result.stages[-1].name == "verify"
+
+
+def test_skip_decision_log_exports_calendar_only(tmp_path):
+    result = run_pipeline(sample_config(tmp_path, decision_log=False))
+    assert ("decision_log", "csv") not in result.paths
+    calendar, _ = reference_outputs()
+    exported = pd.read_csv(result.paths[("engagement_calendar", "csv")])
+    assert len(exported) == len(calendar)
+
+
+def test_fingerprints_written_with_digest(tmp_path):
+    result = run_pipeline(sample_config(tmp_path, fingerprints=True))
+    fingerprints = pd.read_csv(result.paths[("fingerprints", "csv")], dtype=str)
+    assert len(fingerprints) == 5
+    again = run_pipeline(sample_config(tmp_path / "again", fingerprints=True, workers=2))
+    assert again.digest == result.digest
+
+
+def test_pipelined_run_matches_staged_run(tmp_path):
+    staged = run_pipeline(sample_config(tmp_path / "staged", fingerprints=True))
+    for workers in (1, 2):
+        pipelined = run_pipeline(
+            sample_config(tmp_path / f"pipelined_{workers}", pipelined=True, workers=workers, fingerprints=True)
+        )
+        for name in ("engagement_calendar", "decision_log", "derived_profile"):
+            assert Path(pipelined.paths[(name, "csv")]).read_text() == Path(staged.paths[(name, "csv")]).read_text()
+        assert pipelined.digest == staged.digest
+        assert pipelined.wall_seconds is not None
+        assert "wall" in format_summary(pipelined)
+
+
+def test_pipelined_run_surfaces_stage_errors(tmp_path):
+    bad = tmp_path / "pragati.csv"
+    raw = pd.read_csv(SAMPLE / "pragati.csv")
+    last_policy = raw.index[raw["record_type"].str.upper() == "POLICY"][-1]
+    raw.loc[last_policy, "plan_type"] = "NOT_A_PLAN"
+    raw.to_csv(bad, index=False)
+    with pytest.raises(ValidationError):
+        run_pipeline(sample_config(tmp_path, pragati=[str(bad)], pipelined=True))
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_run_manifest_written_next_to_exports(tmp_path, pipelined):
+    result = run_pipeline(sample_config(tmp_path, pipelined=pipelined, verify=True, trace_memory=True))
+    path = Path(result.paths[("run_manifest", "json")])
+    assert path.parent == tmp_path and path.name == f"run_manifest_{result.ts}.json"
+    manifest = read_manifest(str(path))
+    stages = {stage["name"]: stage for stage in manifest["stages"]}
+    assert set(stages) == {stage.name for stage in result.stages}
+    for stats in result.stages:
+        assert (stages[stats.name]["rows_in"], stages[stats.name]["rows_out"]) == (stats.rows_in, stats.rows_out)
+    # threaded stages have busy time only; the run itself carries CPU and memory either way
+    assert (stages["engine"]["cpu_seconds"] is None) == pipelined
+    assert manifest["run"]["cpu_seconds"] > 0 and manifest["run"]["peak_bytes"] > 0
+    assert manifest["peak_rss_bytes"] > 0
+
+
+@pytest.mark.parametrize("vectorised", [False, True])
+def test_pruned_batch_run_matches_full_run(tmp_path, vectorised):
+    full = run_pipeline(sample_config(tmp_path / "full", vectorised=vectorised))
+    pruned = run_pipeline(sample_config(tmp_path / "pruned", vectorised=vectorised, prune=True, workers=2))
+    for name in ("engagement_calendar", "decision_log", "derived_profile"):
+        assert Path(pruned.paths[(name, "csv")]).read_text() == Path(full.paths[(name, "csv")]).read_text()
+    prune = next(stage for stage in pruned.stages if stage.name == "prune")
+    assert prune.rows_out < prune.rows_in
+    with pytest.raises(ValidationError, match="--prune"):
+        run_pipeline(sample_config(tmp_path / "pipelined", prune=True, pipelined=True))
@@ -0,0 +1,152 @@
+from datetime import datetime
+import io
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+import threading
+from urllib.request import Request, urlopen
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import build_customer_profile
+from ingest import load_activity_library, load_d365, load_pragati
+from library_artifact import file_digest
+from run_batch import run_pipeline
+from service import CalendarService, make_server
+from test_run_batch import sample_config
+
+SAMPLE = ROOT / "data" / "sample"
+AS_OF = datetime(2024, 1, 1)
+
+
+def start(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fetch(url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    with urlopen(Request(url, data=data, headers={"Content-Type": "application/json"})) as response:
+        return json.loads(response.read())
+
+
+def test_customer_calendar_matches_batch_engine(tmp_path):
+    library_path = tmp_path / "activity_library.csv"
+    shutil.copy(SAMPLE / "activity_library.csv", library_path)
+    service = CalendarService(str(library_path), str(SAMPLE / "pragati.csv"), str(SAMPLE / "d365.csv"), AS_OF)
+    server, base = start(service)
+    try:
+        body = fetch(f"{base}/customers/C001/calendar?as_of=2024-01-01")
+
+        profiles = build_customer_profile(
+            load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")), as_of_date=AS_OF
+        )
+        library = normalise_activity_library(load_activity_library(str(library_path)))
+        calendar, log = run_calendar_engine(profiles[profiles["CustomerID"] == "C001"], library, reference_date=AS_OF)
+        assert pd.DataFrame(body["calendar"]).equals(calendar)
+        assert pd.DataFrame(body["decision_log"]).equals(log)
+
+        customer = profiles.loc[profiles["CustomerID"] == "C001", ["CustomerID", "LifeStage", "SafariPersona", "RenewalBucket"]]
+        posted = fetch(f"{base}/calendar", {"customer": customer.iloc[0].to_dict(), "as_of": "2024-01-01"})
+        assert posted["customer_id"] == "C001"
+        assert len(posted["decision_log"]) == len(library)
+
+        # hot reload: drop an activity and bump the file's mtime
+        version = fetch(f"{base}/health")["library_version"]
+        assert version == file_digest([str(library_path)])[:12]
+        raw = pd.read_csv(library_path)
+        raw.iloc[1:].to_csv(library_path, index=False)
+        os.utime(library_path, ns=(os.stat(library_path).st_atime_ns, os.stat(library_path).st_mtime_ns + 10**9))
+        reloaded = fetch(f"{base}/customers/C001/calendar?as_of=2024-01-01")
+        assert reloaded["library_version"] != version
+        assert len(reloaded["decision_log"]) == len(library) - 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_bad_requests_are_rejected(tmp_path):
+    service = CalendarService(str(SAMPLE / "activity_library.csv"))
+    server, base = start(service)
+    try:
+        for url, payload in (
+            (f"{base}/calendar", {"customer": {"CustomerID": "X"}}),
+            (f"{base}/calendar", {"nope": 1}),
+            (f"{base}/customers/C001/calendar", None),
+        ):
+            try:
+                fetch(url, payload)
+            except Exception as exc:  # HTTPError
+                assert exc.code in (400, 404)
+            else:
+                raise AssertionError(f"{url} should fail")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def error_response(url, payload):
+    try:
+        urlopen(Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}))
+    except Exception as exc:  # HTTPError
+        return exc.code, json.loads(exc.read())
+    raise AssertionError(f"{url} should fail")
+
+
+def test_malformed_payloads_get_json_errors(tmp_path):
+    service = CalendarService(str(SAMPLE / "activity_library.csv"))
+    server, base = start(service)
+    customer = {"CustomerID": "X", "LifeStage": "Early Nester", "SafariPersona": "Lion", "RenewalBucket": "13M"}
+    try:
+        assert error_response(f"{base}/calendar", [customer])[0] == 400
+        code, body = error_response(f"{base}/calendar", {"customer": {**customer, "PercentSurrenders": "high"}})
+        assert (code, body["error"]) == (400, "PercentSurrenders must be a number")
+        assert error_response(f"{base}/calendar", {"customer": {**customer, "LifeStage": 3}})[0] == 400
+        code, body = error_response(f"{base}/calendar", {"customer": customer, "planning_weeks": 0})
+        assert (code, body["error"]) == (400, "planning_weeks must be positive")
+
+        def broken(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        service.schedule = broken
+        assert error_response(f"{base}/calendar", {"customer": customer}) == (500, {"error": "Internal server error"})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_lookup_as_of_matches_a_batch_run_at_that_date(tmp_path):
+    as_of = datetime(2027, 7, 1)
+    service = CalendarService(str(SAMPLE / "activity_library.csv"), str(SAMPLE / "pragati.csv"), str(SAMPLE / "d365.csv"), AS_OF)
+    server, base = start(service)
+    try:
+        served = [
+            pd.DataFrame(fetch(f"{base}/customers/{customer_id}/calendar?as_of=2027-07-01")["calendar"])
+            for customer_id in ("C001", "C002", "C003", "C004", "C005")
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+    # the sample's calendars do not depend on the aged attributes, so compare the profiles too
+    expected = build_customer_profile(
+        load_pragati(str(SAMPLE / "pragati.csv")), load_d365(str(SAMPLE / "d365.csv")), as_of_date=as_of
+    ).set_index("CustomerID")
+    for customer_id, row in expected.iterrows():
+        profile = service.profile(customer_id, as_of)
+        for column in ("Age", "PolicyVintage", "RelationshipVintage", "RenewalBucket"):
+            assert profile[column] == row[column]
+    assert service.profile("C001", as_of)["Age"] > service.profile("C001")["Age"]
+
+    result = run_pipeline(sample_config(tmp_path, as_of=as_of))
+    batch = pd.read_csv(result.paths[("engagement_calendar", "csv")])
+    served = pd.read_csv(io.StringIO(pd.concat(served, ignore_index=True).to_csv(index=False)))
+    pd.testing.assert_frame_equal(served, batch)
@@ -0,0 +1,41 @@
+from pathlib import Path
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from ingest import ValidationError
+from run_batch import run_pipeline
+from shard import merge_shards, run_shards_locally, shard_numbers, shard_rows
+from test_run_batch import sample_config
+
+
+def test_shards_partition_customers():
+    ids = pd.Series([f"C{i:05d}" for i in range(1000)])
+    numbers = shard_numbers(ids, 4)
+    assert set(numbers) == {0, 1, 2, 3}
+    assert (shard_numbers(ids, 4) == numbers).all()
+    frame = pd.DataFrame({"CustomerID": ids})
+    parts = [shard_rows(frame, index, 4) for index in range(4)]
+    assert sorted(pd.concat(parts)["CustomerID"]) == list(ids)
+    with pytest.raises(ValidationError):
+        shard_rows(frame, 4, 4)
+
+
+def test_merged_shards_match_single_node_run(tmp_path):
+    single = run_pipeline(sample_config(tmp_path / "single"))
+    merged = run_shards_locally(sample_config(tmp_path / "sharded"), shard_count=3)
+
+    assert set(merged) == {"engagement_calendar", "decision_log", "derived_profile"}
+    for name, path in merged.items():
+        assert Path(path).read_text() == Path(single.paths[(name, "csv")]).read_text()
+
+
+def test_merge_rejects_incomplete_runs(tmp_path):
+    run_shards_locally(sample_config(tmp_path), shard_count=2)
+    shutil.rmtree(tmp_path / "shard_0001_of_0002")
+    with pytest.raises(ValidationError, match="missing"):
+        merge_shards(str(tmp_path), str(tmp_path / "again"))
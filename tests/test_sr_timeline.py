@@ -0,0 +1,111 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from derive import derive_base_profile
+from ingest import load_pragati, prepare_d365
+from multi_as_of import profiles_as_of
+from sr_timeline import SRTimeline
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "sample"
+
+
+def random_srs(seed: int = 7, customers: int = 40, rows: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 120, rows), unit="D")
+    frame = pd.DataFrame(
+        {
+            "record_type": "SR",
+            "customer_id": [f"C{number:03d}" for number in rng.integers(0, customers, rows)],
+            "SR_date": dates.strftime("%d-%m-%Y"),
+            "SR_Channel": [f"ch{row}" for row in range(rows)],
+        }
+    )
+    frame.loc[rng.choice(rows, 10, replace=False), "SR_date"] = "not a date"
+    return frame
+
+
+def brute_force(srs: pd.DataFrame, customer: str, as_of: pd.Timestamp, strict: bool = False):
+    rows = srs[srs["customer_id"] == customer].assign(
+        date=lambda frame: pd.to_datetime(frame["SR_date"], format="%d-%m-%Y", errors="coerce")
+    )
+    rows = rows[rows["date"] < as_of] if strict else rows[rows["date"] <= as_of]
+    return rows.sort_values("date", ascending=False, kind="stable").head(1)
+
+
+def test_point_in_time_queries_match_a_scan():
+    srs = random_srs()
+    timeline = SRTimeline.from_frame(srs)
+    customers = pd.Series([f"C{number:03d}" for number in range(45)])  # C040+ have no SRs
+    for as_of in pd.to_datetime(["2024-01-01", "2024-02-15", "2024-04-29", "2025-01-01"]):
+        latest = timeline.latest(customers, as_of)
+        channels = timeline.last_channel_before(customers, as_of)
+        counts = timeline.count_in_window(customers, as_of, 30)
+        for position, customer in enumerate(customers):
+            expected = brute_force(srs, customer, as_of)
+            if expected.empty:
+                assert not latest["HasSR"].iloc[position]
+            else:
+                assert latest["PrimaryChannel"].iloc[position] == expected["SR_Channel"].iloc[0]
+                assert latest["LastEngagementDate"].iloc[position] == expected["date"].iloc[0]
+            before = brute_force(srs, customer, as_of, strict=True)
+            assert channels[position] == (before["SR_Channel"].iloc[0] if not before.empty else None)
+            rows = srs[srs["customer_id"] == customer]
+            dates = pd.to_datetime(rows["SR_date"], format="%d-%m-%Y", errors="coerce")
+            assert counts[position] == ((dates <= as_of) & (dates > as_of - pd.Timedelta(days=30))).sum()
+
+
+def test_per_customer_as_of_dates():
+    srs = random_srs()
+    timeline = SRTimeline.from_frame(srs)
+    customers = pd.Series(["C001", "C002", "C003"])
+    dates = pd.Series(pd.to_datetime(["2024-02-01", None, "2024-03-01"]))
+    latest = timeline.latest(customers, dates)
+    assert not latest["HasSR"].iloc[1]
+    for position in (0, 2):
+        expected = brute_force(srs, customers[position], dates[position])
+        assert latest["PrimaryChannel"].iloc[position] == expected["SR_Channel"].iloc[0]
+
+
+def test_latest_overall_keeps_prepare_d365_tie_and_undated_rules():
+    srs = pd.DataFrame(
+        {
+            "record_type": "SR",
+            "customer_id": ["A", "A", "A", "B", "B"],
+            "SR_date": ["01-02-2024", "05-02-2024", "05-02-2024", "bad", "worse"],
+            "SR_Channel": ["old", "first tie", "second tie", "undated 1", "undated 2"],
+        }
+    )
+    latest = SRTimeline.from_frame(srs).latest(["A", "B", "C"])
+    assert latest["PrimaryChannel"].iloc[:2].tolist() == ["first tie", "undated 1"]
+    assert pd.isna(latest["PrimaryChannel"].iloc[2])
+    assert latest["HasSR"].tolist() == [True, True, False]
+    assert pd.isna(latest["LastEngagementDate"].iloc[1])
+    assert not SRTimeline.from_frame(srs).latest(["B"], "2030-01-01")["HasSR"].iloc[0]
+
+
+def test_empty_extract():
+    timeline = SRTimeline.from_frame(pd.DataFrame({"record_type": ["POLICY"], "customer_id": ["A"]}))
+    assert len(timeline) == 0
+    assert not timeline.latest(["A"], "2024-01-01")["HasSR"].any()
+    assert timeline.count_in_window(["A"], "2024-01-01", 30).tolist() == [0]
+
+
+def test_multi_date_recency_columns_reuse_one_index():
+    raw_d365 = pd.read_csv(SAMPLE / "d365.csv")
+    timeline = SRTimeline.from_frame(raw_d365)
+    base = derive_base_profile(load_pragati(str(SAMPLE / "pragati.csv")), prepare_d365(raw_d365))
+    dates = [datetime(2025, 9, 1), datetime(2026, 1, 1)]
+    profiles = profiles_as_of(base, dates, sr_timeline=timeline)
+    for as_of, profile in profiles.items():
+        recency = timeline.recency_features(profile["CustomerID"], as_of)
+        assert (profile["SRsLast90Days"].to_numpy() == recency["SRsLast90Days"].to_numpy()).all()
+        known = profile["LastSRDate"].notna()
+        assert (profile.loc[known, "LastSRDate"] <= pd.Timestamp(as_of)).all()
+        assert (profile.loc[known, "DaysSinceLastSR"] >= 0).all()
+    assert profiles[dates[0]]["LastSRDate"].notna().sum() < profiles[dates[1]]["LastSRDate"].notna().sum()
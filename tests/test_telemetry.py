@@ -0,0 +1,75 @@
+from pathlib import Path
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from export import export_outputs
+from telemetry import RunTelemetry, compare_manifests, read_manifest
+from test_verify import sample_outputs
+
+
+def test_export_writes_manifest_with_stage_metrics(tmp_path):
+    calendar, decision_log, _, profiles = sample_outputs()
+    telemetry = RunTelemetry(label="test", trace_memory=True)
+    with telemetry.stage("engine", rows_in=len(profiles)) as stage:
+        payload = [0] * 100_000
+        stage.rows_out = len(payload)
+
+    export_outputs(calendar, decision_log, profiles, str(tmp_path), telemetry=telemetry)
+
+    manifest = read_manifest(telemetry.manifest_path)
+    assert Path(telemetry.manifest_path).parent == tmp_path
+    assert [stage["name"] for stage in manifest["stages"]] == ["engine", "export"]
+    engine, export = manifest["stages"]
+    assert engine["rows_out"] == 100_000 and engine["peak_bytes"] >= 800_000
+    assert export["rows_out"] == len(calendar) + len(decision_log) + len(profiles)
+    assert export["wall_seconds"] > 0 and export["cpu_seconds"] is not None
+
+
+def test_nested_stages_keep_the_outer_peak_and_exclude_inner_time():
+    telemetry = RunTelemetry(trace_memory=True)
+    with telemetry.run():
+        with telemetry.stage("engine"):
+            payload = [0] * 200_000
+            del payload
+            for _ in range(2):
+                with telemetry.stage("export"):
+                    chunk = [0] * 10_000
+                    time.sleep(0.05)
+                    del chunk
+    engine, export = telemetry.stages
+    # the export stages reset tracemalloc's peak after the engine's larger allocation
+    assert engine.peak_bytes >= 1_500_000
+    assert 70_000 <= export.peak_bytes < 1_500_000
+    assert export.wall_seconds >= 0.1 and engine.wall_seconds < 0.1
+    assert telemetry.run_record.wall_seconds >= engine.wall_seconds + export.wall_seconds
+    assert telemetry.run_record.peak_bytes >= engine.peak_bytes
+    assert telemetry.manifest()["total_wall_seconds"] == telemetry.run_record.wall_seconds
+
+
+def test_compare_manifests_flags_regressions():
+    old = {"stages": [{"name": "engine", "wall_seconds": 10.0, "cpu_seconds": 9.0, "peak_bytes": 100, "rows_out": 5}]}
+    new = {
+        "stages": [
+            {"name": "engine", "wall_seconds": 14.0, "cpu_seconds": 9.5, "peak_bytes": 100, "rows_out": 6},
+            {"name": "verify", "wall_seconds": 1.0, "cpu_seconds": 1.0, "peak_bytes": 10, "rows_out": 0},
+        ]
+    }
+    comparison = compare_manifests(old, new).set_index(["stage", "metric"])
+    assert comparison.loc[("engine", "wall_seconds"), "regression"]
+    assert not comparison.loc[("engine", "cpu_seconds"), "regression"]
+    assert comparison.loc[("engine", "rows_out"), "regression"]
+    assert not comparison.loc[("verify", "wall_seconds"), "regression"]
+    assert pd.isna(comparison.loc[("verify", "wall_seconds"), "old"])
+
+
+def test_memory_is_only_traced_when_asked_for():
+    telemetry = RunTelemetry()
+    with telemetry.stage("engine"):
+        payload = [0] * 100_000
+        del payload
+    assert telemetry.stages[0].peak_bytes is None
+    assert telemetry.manifest()["peak_rss_bytes"] is not None
@@ -0,0 +1,127 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from calendar_engine import CATEGORY_CAPS, LIFE_STAGE_CAPS, SAFARI_CAPS, run_calendar_engine
+from run_batch import run_pipeline
+from test_run_batch import sample_config
+from test_verify import AS_OF, sample_outputs
+from vector_engine import run_calendar_engine_vectorised
+
+CHANNELS = ["Email", "WhatsApp", "SMS", "Portal", "Telecalling", "RMVisit", "Branch", "Webinar"]
+LIFE_STAGES = list(LIFE_STAGE_CAPS) + ["Retired"]
+PERSONAS = list(SAFARI_CAPS) + ["Owl"]
+CITY_TIERS = ["Metro", "Tier1", "Tier2"]
+
+
+def _subset(rng, values, empty_share=0.5):
+    if rng.random() < empty_share:
+        return []
+    return sorted(rng.choice(values, size=rng.integers(1, len(values) + 1), replace=False).tolist())
+
+
+def random_book(seed: int, activities: int = 30, customers: int = 120):
+    """A library exercising ties, shared themes/variety keys, tight caps and channel failures."""
+    rng = np.random.default_rng(seed)
+    categories = list(CATEGORY_CAPS) + ["Uncapped Experiments"]
+    rows = []
+    for number in range(activities):
+        channels = _subset(rng, CHANNELS, empty_share=0.05)
+        rows.append(
+            {
+                "ActivityID": f"A{number:03d}",
+                "ActivityName": f"Activity {number}",
+                "Category": categories[rng.integers(len(categories))],
+                "SubCategory": f"Sub {rng.integers(3)}",
+                "Theme": f"T{rng.integers(6)}",
+                "Priority": int(rng.integers(1, 5)),
+                "channels": channels,
+                "PreferredChannel": CHANNELS[rng.integers(len(CHANNELS))],
+                "requires_human": bool(rng.random() < 0.3),
+                "life_stage_eligibility": _subset(rng, LIFE_STAGES, 0.7),
+                "persona_eligibility": _subset(rng, PERSONAS, 0.7),
+                "renewal_eligibility": [],
+                "pti_eligibility": [],
+                "city_eligibility": _subset(rng, CITY_TIERS, 0.8),
+                "occupation_eligibility": [],
+                "kids_flags": _subset(rng, ["Y", "N"], 0.8),
+                "kids_age_bands": [],
+                "exclude_if_high_surrender_pct": bool(rng.random() < 0.2),
+                "min_gap_activity_weeks": int(rng.integers(0, 6)),
+                "min_gap_theme_weeks": int(rng.integers(0, 4)),
+                "VarietyKey": ["", "K1", "K2", "K3"][rng.integers(4)],
+                "repeat_penalty_mode": ["HARD", "SOFT"][rng.integers(2)],
+            }
+        )
+    profiles = pd.DataFrame(
+        {
+            "CustomerID": [f"C{number:04d}" for number in rng.permutation(customers)],
+            "LifeStage": rng.choice(LIFE_STAGES, customers),
+            "SafariPersona": rng.choice(PERSONAS, customers),
+            "RenewalBucket": "13M",
+            "PremiumToIncomeBand": "Comfortable",
+            "CityTier": rng.choice(CITY_TIERS, customers),
+            "OccupationType": "Salaried",
+            "KidsFlag": rng.choice(["Y", "N"], customers),
+            "KidsAgeBand": "6-15",
+            "PercentSurrenders": rng.choice([0.0, 0.0, 25.0], customers),
+        }
+    )
+    return profiles, pd.DataFrame(rows)
+
+
+def assert_matches_reference(profiles, activities, build_log=True, **kwargs):
+    expected_calendar, expected_log = run_calendar_engine(profiles, activities, AS_OF, build_log=build_log)
+    outputs = run_calendar_engine_vectorised(profiles, activities, AS_OF, build_log=build_log, **kwargs)
+    pd.testing.assert_frame_equal(outputs.decode_calendar(), expected_calendar)
+    if build_log:
+        pd.testing.assert_frame_equal(outputs.decode_decision_log(), expected_log)
+    else:
+        assert outputs.decode_decision_log().empty
+    return expected_calendar, expected_log
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_randomised_books_match_the_reference_engine(seed):
+    profiles, activities = random_book(seed)
+    calendar, decision_log = assert_matches_reference(profiles, activities, chunk_size=37)
+    # the book must actually exercise the checks being compared
+    assert len(calendar) and (decision_log["result"] == "INCLUDED").any()
+    assert decision_log["reason_code"].nunique() >= 6
+
+
+def test_randomised_calendar_only_run():
+    profiles, activities = random_book(11)
+    assert_matches_reference(profiles, activities, build_log=False)
+
+
+def test_sample_book_matches_compact_engine():
+    _, _, activities, profiles = sample_outputs()
+    many = pd.concat([profiles.assign(CustomerID=profiles["CustomerID"] + f"_{i}") for i in range(20)])
+    assert_matches_reference(many, activities, chunk_size=16)
+
+
+def test_empty_book_and_progress():
+    profiles, activities = random_book(3, customers=10)
+    calls = []
+    outputs = run_calendar_engine_vectorised(
+        profiles, activities, AS_OF, progress=lambda done, total: calls.append((done, total)), chunk_size=4
+    )
+    assert calls == [(4, 10), (8, 10), (10, 10)]
+    assert len(outputs.decode_decision_log()) == 10 * len(activities)
+
+    empty = run_calendar_engine_vectorised(profiles.iloc[0:0], activities, AS_OF)
+    assert empty.decode_calendar().empty and empty.decode_decision_log().empty
+
+
+def test_vectorised_batch_run_matches(tmp_path):
+    plain = run_pipeline(sample_config(tmp_path / "plain", fingerprints=True))
+    vectorised = run_pipeline(sample_config(tmp_path / "vectorised", vectorised=True, fingerprints=True))
+    for name in ("engagement_calendar", "decision_log"):
+        assert Path(vectorised.paths[(name, "csv")]).read_text() == Path(plain.paths[(name, "csv")]).read_text()
+    assert vectorised.digest == plain.digest
@@ -0,0 +1,78 @@
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from activity_library import normalise_activity_library
+from calendar_engine import run_calendar_engine
+from derive import build_customer_profile
+from ingest import load_activity_library, load_d365, load_pragati
+from verify import main, verify_output_files, verify_outputs
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "data" / "sample"
+AS_OF = datetime(2024, 1, 1)
+
+
+def sample_outputs():
+    profiles = build_customer_profile(
+        load_pragati(str(SAMPLE_DIR / "pragati.csv")), load_d365(str(SAMPLE_DIR / "d365.csv")), as_of_date=AS_OF
+    )
+    activities = normalise_activity_library(load_activity_library(str(SAMPLE_DIR / "activity_library.csv")))
+    calendar, decision_log = run_calendar_engine(profiles, activities, reference_date=AS_OF)
+    return calendar, decision_log, activities, profiles
+
+
+def corrupt(calendar, decision_log):
+    # duplicate one scheduled item and drop one customer's log rows
+    calendar = pd.concat([calendar, calendar.iloc[[0]]]).sort_values(["customer_id", "week_bucket"])
+    dropped = decision_log["customer_id"].iloc[-1]
+    decision_log = decision_log[decision_log["customer_id"] != dropped]
+    return calendar.reset_index(drop=True), decision_log.reset_index(drop=True), dropped
+
+
+def test_sample_outputs_are_clean():
+    calendar, decision_log, activities, profiles = sample_outputs()
+    assert verify_outputs(calendar, decision_log, activities, profiles).empty
+
+
+def test_injected_violations_reported():
+    calendar, decision_log, activities, profiles = sample_outputs()
+    calendar, decision_log, dropped = corrupt(calendar, decision_log)
+
+    report = verify_outputs(calendar, decision_log, activities, profiles)
+    checks = set(report["check"])
+    assert {"ONE_PER_WEEK", "ACTIVITY_GAP", "LOG_MISSING_CUSTOMER"} <= checks
+    assert report.loc[report["check"] == "LOG_MISSING_CUSTOMER", "customer_id"].tolist() == [dropped]
+
+
+def test_streamed_files_match_in_memory_report(tmp_path):
+    calendar, decision_log, activities, profiles = sample_outputs()
+    calendar, decision_log, _ = corrupt(calendar, decision_log)
+    calendar_path, log_path = tmp_path / "calendar.csv", tmp_path / "log.csv"
+    calendar.to_csv(calendar_path, index=False)
+    decision_log.to_csv(log_path, index=False)
+
+    expected = verify_outputs(calendar, decision_log, activities, profiles)
+    streamed = verify_output_files(str(calendar_path), str(log_path), activities, profiles, chunksize=7)
+    key = ["check", "customer_id", "activity_id", "week_bucket"]
+    assert (
+        streamed[key].astype(str).sort_values(key).values.tolist()
+        == expected[key].astype(str).sort_values(key).values.tolist()
+    )
+
+
+def test_cli_exit_code(tmp_path):
+    calendar, decision_log, _, _ = sample_outputs()
+    calendar_path, log_path = tmp_path / "calendar.csv", tmp_path / "log.csv"
+    calendar.to_csv(calendar_path, index=False)
+    decision_log.to_csv(log_path, index=False)
+    library = str(SAMPLE_DIR / "activity_library.csv")
+
+    assert main([str(calendar_path), str(log_path), "--activity-library", library]) == 0
+    pd.concat([calendar, calendar.iloc[[0]]]).to_csv(calendar_path, index=False)
+    report_path = tmp_path / "report.csv"
+    assert main([str(calendar_path), str(log_path), "--activity-library", library, "--report", str(report_path)]) == 1
+    assert not pd.read_csv(report_path).empty
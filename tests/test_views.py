@@ -0,0 +1,55 @@
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from views import filter_frame, owner_weekly_load, page_count, page_slice, reason_code_counts
+
+
+def make_calendar():
+    return pd.DataFrame(
+        [
+            {"customer_id": "C1", "week_bucket": "2024-W01", "category": "Servicing", "owner_type": "Digital", "reason_codes": "PASS_ELIGIBILITY|PASS_SCHEDULE"},
+            {"customer_id": "C1", "week_bucket": "2024-W02", "category": "Maturity", "owner_type": "RM", "reason_codes": "PASS_SCHEDULE|WARN_VARIETY_KEY_RECENT_SOFT"},
+            {"customer_id": "C2", "week_bucket": "2024-W03", "category": "Servicing", "owner_type": "RM", "reason_codes": "PASS_SCHEDULE"},
+        ]
+    )
+
+
+def test_filters_apply_only_to_present_columns():
+    calendar = make_calendar()
+    assert len(filter_frame(calendar, customer_id="C1")) == 2
+    assert len(filter_frame(calendar, category="Servicing", week_range=("2024-W02", "2024-W03"))) == 1
+    # pipe-joined reason codes match whole codes only
+    assert len(filter_frame(calendar, reason_code="WARN_VARIETY_KEY_RECENT_SOFT")) == 1
+    assert filter_frame(calendar, reason_code="PASS").empty
+
+    profile = pd.DataFrame({"CustomerID": ["C1", "C2"]})
+    assert filter_frame(profile, customer_id="C2", category="Servicing")["CustomerID"].tolist() == ["C2"]
+
+
+def test_page_slice_clamps_to_available_pages():
+    df = pd.DataFrame({"x": range(25)})
+    assert page_count(len(df), 10) == 3
+    assert page_slice(df, 3, 10)["x"].tolist() == list(range(20, 25))
+    assert page_slice(df, 9, 10)["x"].tolist() == list(range(20, 25))
+    assert page_count(0, 10) == 1
+
+
+def test_summary_aggregates():
+    load = owner_weekly_load(make_calendar())
+    assert load.loc["RM", "2024-W02"] == 1
+    assert load.loc["Digital", "2024-W02"] == 0
+
+    log = pd.DataFrame(
+        [
+            {"stage": "ELIGIBILITY", "result": "EXCLUDED", "reason_code": "FAIL_PTI"},
+            {"stage": "ELIGIBILITY", "result": "EXCLUDED", "reason_code": "FAIL_PTI"},
+            {"stage": "SCHEDULE", "result": "INCLUDED", "reason_code": "PASS_SCHEDULE"},
+        ]
+    )
+    counts = reason_code_counts(log)
+    assert counts.iloc[0]["reason_code"] == "FAIL_PTI"
+    assert counts.iloc[0]["rows"] == 2
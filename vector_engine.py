@@ -0,0 +1,562 @@
+"""Customer-parallel weekly scheduler over tracker arrays.
+
+:func:`calendar_engine.schedule_customer` walks the planning horizon once per
+customer, with its trackers (persona count, category counts and last weeks,
+last activity/theme weeks, variety keys) in per-customer dicts.
+:func:`run_calendar_engine_vectorised` holds the same trackers as numpy arrays
+shaped customers × categories / activities / themes / variety keys and advances
+a chunk of customers through the horizon in lockstep: each week the cap,
+cooldown, gap and variety checks and the top-candidate pick run for the whole
+chunk at once. Eligibility is checked once per segment of the book (see
+``pruning.py``) and broadcast to its customers; customers leave the chunk as
+soon as their persona cap is reached.
+
+Results are :class:`compact.CompactOutputs` whose decoded frames equal
+:func:`calendar_engine.run_calendar_engine`, first-failure details included.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calendar_engine import (
+    CATEGORY_CAPS,
+    CATEGORY_PRECEDENCE_BONUS,
+    DEFAULT_CAP,
+    DIGITAL_CHANNELS,
+    HUMAN_CHANNELS,
+    LIFE_STAGE_CAPS,
+    PLANNING_WEEKS,
+    SAFARI_CAPS,
+    VARIETY_RECENT_WINDOW_WEEKS,
+    VARIETY_SOFT_PENALTY,
+    CompiledLibrary,
+    HorizonTable,
+    compile_activity_library,
+    eligibility_failure,
+    horizon_table,
+    owner_for_channel,
+)
+from compact import REASON_BITS, CompactOutputs, _Interner
+from pruning import segment_histogram, segment_representative
+
+DEFAULT_CHUNK_SIZE = 4096
+# "never happened" week: every gap measured from it exceeds any (clamped) rule
+_NEVER = -(1 << 30)
+
+# first-failure codes per customer × activity; eligibility failures follow from _ELIGIBILITY
+_NONE = 0
+_PERSONA_CAP = 1
+_CATEGORY_CAP = 2
+_SPACING = 3
+_GAP_ACTIVITY = 4
+_GAP_THEME = 5
+_VARIETY_HARD = 6
+_NO_HUMAN_CHANNEL = 7
+_NO_CHANNEL = 8
+_DIGITAL_PICK = 9
+_ELIGIBILITY = 10
+_INCLUDED = -1
+
+_FIXED_OUTCOMES = {
+    _NONE: ("SCHEDULE", "FAIL_CATEGORY_CAP", "Not scheduled"),
+    _PERSONA_CAP: ("CAP", "FAIL_PERSONA_CAP", None),
+    _CATEGORY_CAP: ("CAP", "FAIL_CATEGORY_CAP", "Category cap reached"),
+    _SPACING: ("SCHEDULE", "FAIL_CATEGORY_SPACING", None),
+    _GAP_ACTIVITY: ("SCHEDULE", "FAIL_GAP_SAME_ACTIVITY", None),
+    _GAP_THEME: ("SCHEDULE", "FAIL_GAP_SAME_THEME", None),
+    _VARIETY_HARD: ("SCHEDULE", "FAIL_VARIETY_KEY_MONTH_HARD", None),
+    _NO_HUMAN_CHANNEL: ("SCHEDULE", "FAIL_CHANNEL_OWNER_MAPPING", "No human-capable channel available"),
+    _NO_CHANNEL: ("SCHEDULE", "FAIL_CHANNEL_OWNER_MAPPING", "No valid channel"),
+    _DIGITAL_PICK: ("SCHEDULE", "FAIL_CHANNEL_OWNER_MAPPING", "requires_human but only digital channel selected"),
+}
+_PASS_REASONS = ("PASS_ELIGIBILITY", "PASS_MODIFIER", "PASS_CAP", "PASS_SCHEDULE")
+_CAP_SOURCES = ("SAFARI", "LIFESTAGE", "DEFAULT")
+
+
+def _interned(values) -> Tuple[np.ndarray, int]:
+    # plain dict keys, so values match exactly as in the reference engine's tracker dicts
+    ids: Dict = {}
+    return np.array([ids.setdefault(value, len(ids)) for value in values], dtype=np.int64), max(len(ids), 1)
+
+
+@dataclass(frozen=True)
+class LibraryRules:
+    """Per-activity scheduling rules of a compiled library, as arrays in engine order."""
+
+    records: Tuple[Dict, ...]
+    category: np.ndarray
+    categories: int
+    max_per_year: np.ndarray
+    cooldown: np.ndarray
+    gap_activity: np.ndarray
+    gap_theme: np.ndarray
+    theme: np.ndarray
+    themes: int
+    variety: np.ndarray
+    varieties: int
+    keyed: np.ndarray
+    hard: np.ndarray
+    soft: np.ndarray
+    static_failure: np.ndarray
+    digital_pick: np.ndarray
+    score: np.ndarray
+    tie_rank: np.ndarray
+    channel: np.ndarray
+    channels: Tuple[str, ...]
+    owner: np.ndarray
+    owners: Tuple[str, ...]
+    table: pd.DataFrame
+    code: np.ndarray
+
+    @classmethod
+    def from_library(cls, library: CompiledLibrary) -> "LibraryRules":
+        records = library.records
+        count = len(records)
+        max_per_year = np.zeros(count)
+        cooldown, gap_activity, gap_theme = (np.zeros(count, dtype=np.int64) for _ in range(3))
+        keyed, hard, soft, digital_pick = (np.zeros(count, dtype=bool) for _ in range(4))
+        static_failure = np.zeros(count, dtype=np.int64)
+        score, bonus = np.zeros(count), np.zeros(count)
+        channel_ids, owner_ids = _Interner(), _Interner()
+        channel, owner = np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64)
+        for position, activity in enumerate(records):
+            category = activity["Category"]
+            cap = CATEGORY_CAPS.get(category, {"max_per_year": 0, "cooldown_weeks": 0})
+            max_per_year[position] = cap["max_per_year"]
+            cooldown[position] = cap["cooldown_weeks"]
+            gap_activity[position] = int(activity.get("min_gap_activity_weeks", 0))
+            gap_theme[position] = int(activity.get("min_gap_theme_weeks", 0))
+            penalty_mode = activity.get("repeat_penalty_mode", "HARD")
+            keyed[position] = bool(activity.get("VarietyKey", ""))
+            hard[position] = keyed[position] and penalty_mode == "HARD"
+            soft[position] = keyed[position] and penalty_mode == "SOFT"
+
+            options = activity["channels"]
+            if activity.get("requires_human"):
+                options = [ch for ch in options if ch in HUMAN_CHANNELS]
+                if not options:
+                    static_failure[position] = _NO_HUMAN_CHANNEL
+            if not options and not static_failure[position]:
+                static_failure[position] = _NO_CHANNEL
+            if options:
+                chosen = activity["PreferredChannel"] if activity["PreferredChannel"] in options else options[0]
+                channel[position] = channel_ids(chosen)
+                owner[position] = owner_ids(owner_for_channel(chosen))
+                digital_pick[position] = bool(activity.get("requires_human")) and chosen in DIGITAL_CHANNELS
+
+            bonus[position] = CATEGORY_PRECEDENCE_BONUS.get(category, 0)
+            score[position] = activity["Priority"] * 100 + bonus[position]
+
+        order = sorted(
+            range(count),
+            key=lambda p: (-records[p]["Priority"], -bonus[p], records[p]["ActivityID"], p),
+        )
+        tie_rank = np.empty(count, dtype=np.int64)
+        tie_rank[order] = np.arange(count)
+
+        table = (
+            library.frame[["ActivityID", "ActivityName", "Category", "SubCategory"]]
+            .sort_values("ActivityID")
+            .reset_index(drop=True)
+        )
+        codes = {aid: code for code, aid in enumerate(table["ActivityID"])}
+        category, categories = _interned(activity["Category"] for activity in records)
+        theme, themes = _interned(activity.get("Theme", "") for activity in records)
+        variety, varieties = _interned(activity.get("VarietyKey", "") for activity in records)
+        limit = -_NEVER
+        return cls(
+            records=records,
+            category=category,
+            categories=categories,
+            max_per_year=max_per_year,
+            cooldown=np.minimum(cooldown, limit),
+            gap_activity=np.minimum(gap_activity, limit),
+            gap_theme=np.minimum(gap_theme, limit),
+            theme=theme,
+            themes=themes,
+            variety=variety,
+            varieties=varieties,
+            keyed=keyed,
+            hard=hard,
+            soft=soft,
+            static_failure=static_failure,
+            digital_pick=digital_pick,
+            score=score,
+            tie_rank=tie_rank,
+            channel=channel,
+            channels=tuple(channel_ids.values),
+            owner=owner,
+            owners=tuple(owner_ids.values),
+            table=table,
+            code=np.array([codes[activity["ActivityID"]] for activity in records], dtype=np.int64),
+        )
+
+
+def persona_caps(customers: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Persona cap per customer and its source (index into ``SAFARI``/``LIFESTAGE``/``DEFAULT``)."""
+    personas = customers["SafariPersona"] if "SafariPersona" in customers else pd.Series(None, index=customers.index)
+    stages = customers["LifeStage"] if "LifeStage" in customers else pd.Series(None, index=customers.index)
+    caps = np.full(len(customers), DEFAULT_CAP, dtype=np.int64)
+    sources = np.full(len(customers), _CAP_SOURCES.index("DEFAULT"), dtype=np.int64)
+    for row, (persona, life_stage) in enumerate(zip(personas.to_numpy(dtype=object), stages.to_numpy(dtype=object))):
+        if persona in SAFARI_CAPS:
+            caps[row], sources[row] = SAFARI_CAPS[persona], 0
+        elif life_stage in LIFE_STAGE_CAPS:
+            caps[row], sources[row] = LIFE_STAGE_CAPS[life_stage], 1
+    return caps, sources
+
+
+def eligibility_codes(
+    customers: pd.DataFrame, rules: LibraryRules
+) -> Tuple[np.ndarray, List[Tuple[str, str, str]]]:
+    """Customer × activity eligibility outcome (``0`` eligible) and the failures the codes refer to."""
+    segments, membership = segment_histogram(customers)
+    failures: Dict[Tuple[str, str, str], int] = {}
+    by_segment = np.zeros((len(segments), len(rules.records)), dtype=np.int64)
+    for number, segment in enumerate(segments.to_dict("records")):
+        customer = segment_representative(segment)
+        for position, activity in enumerate(rules.records):
+            failure = eligibility_failure(customer, activity)
+            if failure is not None:
+                by_segment[number, position] = _ELIGIBILITY + failures.setdefault(failure, len(failures))
+    return by_segment[membership.to_numpy()], list(failures)
+
+
+@dataclass
+class _Chunk:
+    """Scheduled picks and first failures of one chunk of customers."""
+
+    rows: np.ndarray
+    weeks: np.ndarray
+    activities: np.ndarray
+    soft: np.ndarray
+    first: np.ndarray
+    fail_week: np.ndarray | None = None
+    block_week: np.ndarray | None = None
+    block_activity: np.ndarray | None = None
+
+
+def schedule_chunk(
+    rules: LibraryRules, horizon: HorizonTable, initial: np.ndarray, caps: np.ndarray, build_log: bool = True
+) -> _Chunk:
+    """Advance a chunk of customers through the horizon together.
+
+    ``initial`` is the customers × activities eligibility outcome and ``caps``
+    the persona caps. Tracker arrays only hold customers whose cap is not yet
+    reached; ``rows`` maps them back into the chunk.
+    """
+    size, count = initial.shape
+    first = initial.copy()
+    fail_week = np.zeros((size, count), dtype=np.int64) if build_log else None
+    block_week = np.zeros((size, count), dtype=np.int64) if build_log else None
+    block_activity = np.zeros((size, count), dtype=np.int64) if build_log else None
+
+    rows = np.arange(size)
+    eligible = initial == _NONE
+    persona_count = np.zeros(size, dtype=np.int64)
+    category_count = np.zeros((size, rules.categories), dtype=np.int64)
+    last_category_week = np.full((size, rules.categories), _NEVER, dtype=np.int64)
+    last_category_activity = np.zeros((size, rules.categories), dtype=np.int64)
+    last_activity_week = np.full((size, count), _NEVER, dtype=np.int64)
+    last_theme_week = np.full((size, rules.themes), _NEVER, dtype=np.int64)
+    last_theme_activity = np.zeros((size, rules.themes), dtype=np.int64)
+    hard_month = np.full((size, rules.varieties), -1, dtype=np.int64)
+    recent_week = np.full((size, rules.varieties), _NEVER, dtype=np.int64)
+
+    static = rules.static_failure != _NONE
+    picked_rows, picked_weeks, picked_activities, picked_soft = [], [], [], []
+    for week, month in enumerate(horizon.month_index):
+        capped = persona_count >= caps[rows]
+        if capped.any():
+            if build_log:
+                done = rows[capped]
+                outcome = first[done]
+                outcome[eligible[capped] & (outcome == _NONE)] = _PERSONA_CAP
+                first[done] = outcome
+            live = ~capped
+            rows, eligible, persona_count = rows[live], eligible[live], persona_count[live]
+            category_count, last_category_week = category_count[live], last_category_week[live]
+            last_category_activity, last_activity_week = last_category_activity[live], last_activity_week[live]
+            last_theme_week, last_theme_activity = last_theme_week[live], last_theme_activity[live]
+            hard_month, recent_week = hard_month[live], recent_week[live]
+            if not len(rows):
+                break
+
+        category_week = last_category_week[:, rules.category]
+        theme_week = last_theme_week[:, rules.theme]
+        checks = (
+            (_CATEGORY_CAP, category_count[:, rules.category] >= rules.max_per_year),
+            (_SPACING, week - category_week <= rules.cooldown - 1),
+            (_GAP_ACTIVITY, week - last_activity_week <= rules.gap_activity - 1),
+            (_GAP_THEME, week - theme_week <= rules.gap_theme - 1),
+            (_VARIETY_HARD, rules.hard & (hard_month[:, rules.variety] == month)),
+        )
+        blocked = static | checks[0][1]
+        for _, failed in checks[1:]:
+            blocked |= failed
+        candidate = eligible & ~blocked
+
+        if build_log:
+            failing = eligible & blocked & (first[rows] == _NONE)
+            at_row, at_activity = np.nonzero(failing)
+            if len(at_row):
+                code = np.select(
+                    [failed[at_row, at_activity] for _, failed in checks],
+                    [code for code, _ in checks],
+                    default=rules.static_failure[at_activity],
+                )
+                blocking_week = np.select(
+                    [code == _SPACING, code == _GAP_ACTIVITY, code == _GAP_THEME],
+                    [
+                        category_week[at_row, at_activity],
+                        last_activity_week[at_row, at_activity],
+                        theme_week[at_row, at_activity],
+                    ],
+                )
+                blocking_activity = np.select(
+                    [code == _SPACING, code == _GAP_THEME],
+                    [
+                        last_category_activity[at_row, rules.category[at_activity]],
+                        last_theme_activity[at_row, rules.theme[at_activity]],
+                    ],
+                    default=at_activity,
+                )
+                chunk_row = rows[at_row]
+                first[chunk_row, at_activity] = code
+                fail_week[chunk_row, at_activity] = week
+                block_week[chunk_row, at_activity] = blocking_week
+                block_activity[chunk_row, at_activity] = blocking_activity
+
+        choosing = np.nonzero(candidate.any(axis=1))[0]
+        if not len(choosing):
+            continue
+        candidate = candidate[choosing]
+        soft = rules.soft & (week - recent_week[choosing][:, rules.variety] <= VARIETY_RECENT_WINDOW_WEEKS)
+        score = np.where(candidate, rules.score - VARIETY_SOFT_PENALTY * soft, -np.inf)
+        tied = candidate & (score == score.max(axis=1)[:, None])
+        pick = np.where(tied, rules.tie_rank, count).argmin(axis=1)
+        applied_soft = soft[np.arange(len(choosing)), pick]
+
+        if rules.digital_pick[pick].any():
+            invalid = rules.digital_pick[pick]
+            if build_log:
+                bad_rows, bad_activities = rows[choosing[invalid]], pick[invalid]
+                unset = first[bad_rows, bad_activities] == _NONE
+                first[bad_rows[unset], bad_activities[unset]] = _DIGITAL_PICK
+                fail_week[bad_rows[unset], bad_activities[unset]] = week
+            choosing, pick, applied_soft = choosing[~invalid], pick[~invalid], applied_soft[~invalid]
+
+        category, theme, variety = rules.category[pick], rules.theme[pick], rules.variety[pick]
+        persona_count[choosing] += 1
+        category_count[choosing, category] += 1
+        last_category_week[choosing, category] = week
+        last_category_activity[choosing, category] = pick
+        last_activity_week[choosing, pick] = week
+        last_theme_week[choosing, theme] = week
+        last_theme_activity[choosing, theme] = pick
+        hard_pick, keyed_pick = rules.hard[pick], rules.keyed[pick]
+        hard_month[choosing[hard_pick], variety[hard_pick]] = month
+        recent_week[choosing[keyed_pick], variety[keyed_pick]] = week
+
+        picked_rows.append(rows[choosing])
+        picked_weeks.append(np.full(len(choosing), week, dtype=np.int64))
+        picked_activities.append(pick)
+        picked_soft.append(applied_soft)
+
+    def joined(parts: List[np.ndarray], dtype) -> np.ndarray:
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    return _Chunk(
+        rows=joined(picked_rows, np.int64),
+        weeks=joined(picked_weeks, np.int64),
+        activities=joined(picked_activities, np.int64),
+        soft=joined(picked_soft, bool),
+        first=first,
+        fail_week=fail_week,
+        block_week=block_week,
+        block_activity=block_activity,
+    )
+
+
+class _LogBuilder:
+    """Turns chunk outcomes into coded decision-log rows with the reference engine's strings."""
+
+    def __init__(self, rules: LibraryRules, horizon: HorizonTable, failures: List[Tuple[str, str, str]]) -> None:
+        self.rules, self.horizon = rules, horizon
+        self.stages, self.results, self.reasons, self.details = (_Interner() for _ in range(4))
+        outcomes = {code: outcome for code, outcome in _FIXED_OUTCOMES.items()}
+        outcomes.update({_ELIGIBILITY + number: failure for number, failure in enumerate(failures)})
+        # lookup tables indexed by outcome code + 1, so _INCLUDED lands on slot 0
+        size = _ELIGIBILITY + len(failures) + 1
+        self.stage_code = np.zeros(size, dtype=np.int64)
+        self.reason_code = np.zeros(size, dtype=np.int64)
+        self.fixed_details = np.full(size, -1, dtype=np.int64)
+        self.stage_code[0], self.reason_code[0] = self.stages("SCHEDULE"), self.reasons("PASS_SCHEDULE")
+        for code, (stage, reason, details) in outcomes.items():
+            self.stage_code[code + 1], self.reason_code[code + 1] = self.stages(stage), self.reasons(reason)
+            if details is not None:
+                self.fixed_details[code + 1] = self.details(details)
+        self.result_code = np.full(size, self.results("EXCLUDED"), dtype=np.int64)
+        self.result_code[0] = self.results("INCLUDED")
+        self.ids = [activity["ActivityID"] for activity in rules.records]
+        self.category_names = [activity.get("Category") for activity in rules.records]
+        self.required = {
+            _SPACING: [CATEGORY_CAPS.get(c, {"cooldown_weeks": 0})["cooldown_weeks"] for c in self.category_names],
+            _GAP_ACTIVITY: [int(activity.get("min_gap_activity_weeks", 0)) for activity in rules.records],
+            _GAP_THEME: [int(activity.get("min_gap_theme_weeks", 0)) for activity in rules.records],
+        }
+
+    def build(
+        self, chunk: _Chunk, caps: np.ndarray, sources: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Stage, result, reason and details codes, customer-major with activities in ActivityID order."""
+        size, count = chunk.first.shape
+        outcome = chunk.first.copy()
+        outcome[chunk.rows, chunk.activities] = _INCLUDED
+        details = self.fixed_details[outcome + 1]
+
+        for row, position in zip(*np.nonzero(details < 0)):
+            code = outcome[row, position]
+            if code == _PERSONA_CAP:
+                text = f"Cap reached from {_CAP_SOURCES[sources[row]]} limit {caps[row]}"
+            elif code == _VARIETY_HARD:
+                text = f"Variety key already used in {self.horizon.months[chunk.fail_week[row, position]]}"
+            elif code != _INCLUDED:
+                blocking_week = chunk.block_week[row, position]
+                actual_gap = chunk.fail_week[row, position] - blocking_week
+                text = (
+                    f"blocking_activity_id={self.ids[chunk.block_activity[row, position]]}; "
+                    f"blocking_category={self.category_names[position]}; "
+                    f"blocking_week_idx={blocking_week}; "
+                    f"required_gap_weeks={self.required[code][position]}; "
+                    f"actual_gap_weeks={actual_gap}"
+                )
+            else:
+                continue
+            details[row, position] = self.details(text)
+
+        if len(chunk.rows):
+            order = np.lexsort((chunk.weeks, chunk.activities, chunk.rows))
+            rows, activities = chunk.rows[order], chunk.activities[order]
+            weeks, soft = chunk.weeks[order], chunk.soft[order]
+            starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (activities[1:] != activities[:-1])])
+            ends = np.r_[starts[1:], len(rows)]
+            for start, end in zip(starts, ends):
+                row = rows[start]
+                reasons = set(_PASS_REASONS)
+                if _CAP_SOURCES[sources[row]] == "DEFAULT":
+                    reasons.add("WARN_CAP_FALLBACK_DEFAULT")
+                if soft[start:end].any():
+                    reasons.add("WARN_VARIETY_KEY_RECENT_SOFT")
+                labels = ",".join(self.horizon.weeks[week] for week in weeks[start:end])
+                text = f"weeks={labels}; reasons={'|'.join(sorted(reasons))}; cap_source={_CAP_SOURCES[sources[row]]}"
+                details[row, activities[start]] = self.details(text)
+
+        by_code = np.argsort(self.rules.code, kind="stable")
+        outcome, details = outcome[:, by_code] + 1, details[:, by_code]
+        return (
+            self.stage_code[outcome].ravel(),
+            self.result_code[outcome].ravel(),
+            self.reason_code[outcome].ravel(),
+            details.ravel(),
+        )
+
+
+def _categorical(codes: List[np.ndarray], interner: _Interner, dtype=np.int32) -> pd.Categorical:
+    joined = np.concatenate(codes).astype(dtype) if codes else np.zeros(0, dtype=dtype)
+    return pd.Categorical.from_codes(joined, categories=interner.values)
+
+
+def run_calendar_engine_vectorised(
+    customer_profiles: pd.DataFrame,
+    activities: pd.DataFrame | CompiledLibrary,
+    reference_date: datetime | None = None,
+    planning_weeks: int = PLANNING_WEEKS,
+    progress: Callable[[int, int], None] | None = None,
+    build_log: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> CompactOutputs:
+    """:func:`compact.run_calendar_engine_compact` with all customers of a chunk scheduled in lockstep.
+
+    ``chunk_size`` customers share one set of tracker arrays; ``progress`` is
+    called with ``(customers_done, customers_total)`` after each chunk.
+    """
+    library = compile_activity_library(activities)
+    horizon = horizon_table(reference_date, planning_weeks)
+    rules = LibraryRules.from_library(library)
+    customers = customer_profiles.sort_values("CustomerID").reset_index(drop=True)
+    total_customers = len(customers)
+    count = len(rules.records)
+
+    if total_customers and count:
+        initial, failures = eligibility_codes(customers, rules)
+    else:
+        initial, failures = np.zeros((total_customers, count), dtype=np.int64), []
+    caps, sources = persona_caps(customers)
+    logs = _LogBuilder(rules, horizon, failures) if build_log else None
+
+    fallback = REASON_BITS["WARN_CAP_FALLBACK_DEFAULT"]
+    base_mask = sum(REASON_BITS[code] for code in _PASS_REASONS)
+    calendar_parts: Dict[str, List[np.ndarray]] = {name: [] for name in ("customer", "week", "activity", "reasons")}
+    log_parts: Dict[str, List[np.ndarray]] = {name: [] for name in ("stage", "result", "reason_code", "details")}
+    for start in range(0, total_customers, max(chunk_size, 1)):
+        stop = min(start + max(chunk_size, 1), total_customers)
+        chunk = schedule_chunk(rules, horizon, initial[start:stop], caps[start:stop], build_log)
+
+        order = np.lexsort((chunk.weeks, chunk.rows))
+        rows, weeks, picks = chunk.rows[order], chunk.weeks[order], chunk.activities[order]
+        masks = np.full(len(rows), base_mask, dtype=np.int64)
+        masks[sources[start:stop][rows] == _CAP_SOURCES.index("DEFAULT")] |= fallback
+        masks[chunk.soft[order]] |= REASON_BITS["WARN_VARIETY_KEY_RECENT_SOFT"]
+        calendar_parts["customer"].append(rows + start)
+        calendar_parts["week"].append(weeks)
+        calendar_parts["activity"].append(picks)
+        calendar_parts["reasons"].append(masks)
+
+        if logs is not None and count:
+            for name, codes in zip(log_parts, logs.build(chunk, caps[start:stop], sources[start:stop])):
+                log_parts[name].append(codes)
+        if progress is not None:
+            progress(stop, total_customers)
+
+    def joined(name: str, dtype) -> np.ndarray:
+        parts = calendar_parts[name]
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    picks = joined("activity", np.int64)
+    calendar = pd.DataFrame(
+        {
+            "customer": joined("customer", np.int32),
+            "week": joined("week", np.int16),
+            "activity": rules.code[picks].astype(np.int32),
+            "channel": pd.Categorical.from_codes(rules.channel[picks], categories=rules.channels),
+            "owner_type": pd.Categorical.from_codes(rules.owner[picks], categories=rules.owners),
+            "reasons": joined("reasons", np.int64),
+        }
+    )
+    if logs is not None and count and total_customers:
+        decision_log = pd.DataFrame(
+            {
+                "customer": np.repeat(np.arange(total_customers, dtype=np.int32), count),
+                "activity": np.tile(np.arange(count, dtype=np.int32), total_customers),
+                "stage": _categorical(log_parts["stage"], logs.stages),
+                "result": _categorical(log_parts["result"], logs.results),
+                "reason_code": _categorical(log_parts["reason_code"], logs.reasons),
+                "details": _categorical(log_parts["details"], logs.details),
+            }
+        )
+    else:
+        decision_log = pd.DataFrame(
+            {
+                "customer": np.zeros(0, dtype=np.int32),
+                "activity": np.zeros(0, dtype=np.int32),
+                **{name: pd.Categorical([]) for name in log_parts},
+            }
+        )
+    customer_ids = customers["CustomerID"].to_numpy(dtype=object)
+    return CompactOutputs(calendar, decision_log, customer_ids, rules.table, horizon)
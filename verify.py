@@ -0,0 +1,305 @@
+"""Vectorised invariant checks for engine outputs, usable on in-memory frames or streamed files.
+
+Every check returns rows of a violation report instead of stopping at the first
+failure. Outputs are sorted by ``customer_id`` (as written by the engine and the
+exporters), which lets :func:`verify_output_files` process whole customers one
+chunk at a time in bounded memory.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calendar_engine import CATEGORY_CAPS, DEFAULT_CAP, LIFE_STAGE_CAPS, SAFARI_CAPS
+
+VIOLATION_COLUMNS = ["check", "customer_id", "activity_id", "category", "week_bucket", "observed", "limit", "details"]
+DEFAULT_CHUNKSIZE = 200_000
+
+_CATEGORY_MAX = {category: caps["max_per_year"] for category, caps in CATEGORY_CAPS.items()}
+_CATEGORY_COOLDOWN = {category: caps["cooldown_weeks"] for category, caps in CATEGORY_CAPS.items()}
+
+
+def _violations(check: str, frame: pd.DataFrame, observed: str, limit: str | None = None, details: str = "") -> pd.DataFrame:
+    out = pd.DataFrame(index=frame.index, columns=VIOLATION_COLUMNS)
+    out["check"] = check
+    for col in ("customer_id", "activity_id", "category", "week_bucket"):
+        if col in frame.columns:
+            out[col] = frame[col]
+    out["observed"] = frame[observed]
+    out["limit"] = frame[limit] if limit is not None else None
+    out["details"] = details
+    return out
+
+
+def _week_number(week_bucket: pd.Series) -> pd.Series:
+    # ISO week label -> absolute week number, so gaps are plain integer differences
+    monday = pd.to_datetime(week_bucket + "-1", format="%G-W%V-%u")
+    return (monday - pd.Timestamp("1970-01-05")).dt.days // 7
+
+
+# profile columns the verifier reads; callers need keep only these
+PROFILE_COLUMNS = ["CustomerID", "SafariPersona", "LifeStage"]
+
+
+def persona_caps(profiles: pd.DataFrame) -> pd.Series:
+    """Annual item cap per CustomerID, resolved the same way as the engine."""
+    persona = profiles["SafariPersona"].map(SAFARI_CAPS) if "SafariPersona" in profiles.columns else None
+    life_stage = profiles["LifeStage"].map(LIFE_STAGE_CAPS) if "LifeStage" in profiles.columns else None
+    caps = pd.Series(float(DEFAULT_CAP), index=profiles.index)
+    if life_stage is not None:
+        caps = life_stage.fillna(caps)
+    if persona is not None:
+        caps = persona.fillna(caps)
+    return pd.Series(caps.to_numpy(), index=profiles["CustomerID"].to_numpy())
+
+
+def verify_calendar(
+    calendar: pd.DataFrame,
+    activities: pd.DataFrame | None = None,
+    customer_caps: pd.Series | None = None,
+) -> pd.DataFrame:
+    """Caps, one-item-per-week and spacing checks over a calendar frame."""
+    reports: List[pd.DataFrame] = []
+    if calendar.empty:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+
+    per_category = calendar.groupby(["customer_id", "category"], sort=False).size().reset_index(name="observed")
+    per_category["limit"] = per_category["category"].map(_CATEGORY_MAX).fillna(0)
+    reports.append(_violations("CATEGORY_CAP", per_category[per_category["observed"] > per_category["limit"]], "observed", "limit"))
+
+    if customer_caps is not None:
+        per_customer = calendar.groupby("customer_id", sort=False).size().reset_index(name="observed")
+        per_customer["limit"] = per_customer["customer_id"].map(customer_caps).fillna(DEFAULT_CAP)
+        reports.append(_violations("PERSONA_CAP", per_customer[per_customer["observed"] > per_customer["limit"]], "observed", "limit"))
+
+    per_week = calendar.groupby(["customer_id", "week_bucket"], sort=False).size().reset_index(name="observed")
+    reports.append(
+        _violations("ONE_PER_WEEK", per_week[per_week["observed"] > 1], "observed", details="more than one item in a customer week")
+    )
+
+    rows = calendar[["customer_id", "activity_id", "category", "week_bucket"]].copy()
+    rows["week"] = _week_number(rows["week_bucket"])
+
+    ordered = rows.sort_values(["customer_id", "category", "week"], kind="stable")
+    same = ordered["customer_id"].eq(ordered["customer_id"].shift()) & ordered["category"].eq(ordered["category"].shift())
+    ordered = ordered.assign(gap=ordered["week"].diff(), limit=ordered["category"].map(_CATEGORY_COOLDOWN).fillna(0))
+    reports.append(_violations("CATEGORY_SPACING", ordered[same & (ordered["gap"] < ordered["limit"])], "gap", "limit"))
+
+    if activities is not None and "min_gap_activity_weeks" in activities.columns:
+        min_gap = pd.Series(activities["min_gap_activity_weeks"].to_numpy(), index=activities["ActivityID"].to_numpy())
+        ordered = rows.sort_values(["customer_id", "activity_id", "week"], kind="stable")
+        same = ordered["customer_id"].eq(ordered["customer_id"].shift()) & ordered["activity_id"].eq(ordered["activity_id"].shift())
+        ordered = ordered.assign(gap=ordered["week"].diff(), limit=ordered["activity_id"].map(min_gap).fillna(0))
+        reports.append(_violations("ACTIVITY_GAP", ordered[same & (ordered["gap"] < ordered["limit"])], "gap", "limit"))
+
+    if activities is not None and "VarietyKey" in activities.columns:
+        hard = activities[activities["repeat_penalty_mode"].eq("HARD") & activities["VarietyKey"].fillna("").ne("")]
+        vkeys = pd.Series(hard["VarietyKey"].to_numpy(), index=hard["ActivityID"].to_numpy())
+        keyed = calendar.assign(variety_key=calendar["activity_id"].map(vkeys)).dropna(subset=["variety_key"])
+        per_month = keyed.groupby(["customer_id", "variety_key", "month_bucket"], sort=False).size().reset_index(name="observed")
+        reports.append(
+            _violations(
+                "HARD_VARIETY_MONTH",
+                per_month[per_month["observed"] > 1],
+                "observed",
+                details="HARD variety key repeated within a month",
+            )
+        )
+
+    return _concat(reports)
+
+
+def verify_decision_log(decision_log: pd.DataFrame, activity_ids: Sequence[str]) -> pd.DataFrame:
+    """One row per customer × activity, and only known activities."""
+    reports: List[pd.DataFrame] = []
+    if decision_log.empty:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+
+    pairs = decision_log.groupby(["customer_id", "activity_id"], sort=False).size().reset_index(name="observed")
+    reports.append(_violations("LOG_DUPLICATE_PAIR", pairs[pairs["observed"] > 1], "observed", details="expected exactly one row"))
+
+    known = pairs["activity_id"].isin(activity_ids)
+    reports.append(_violations("LOG_UNKNOWN_ACTIVITY", pairs[~known], "observed", details="activity not in library"))
+
+    covered = pairs[known].groupby("customer_id", sort=False).size().reset_index(name="observed")
+    covered["limit"] = len(set(activity_ids))
+    reports.append(
+        _violations(
+            "LOG_MISSING_PAIR",
+            covered[covered["observed"] < covered["limit"]],
+            "observed",
+            "limit",
+            details="activities logged for customer",
+        )
+    )
+    return _concat(reports)
+
+
+def verify_inclusions(calendar: pd.DataFrame, decision_log: pd.DataFrame) -> pd.DataFrame:
+    """Scheduled pairs and INCLUDED decision-log rows must be the same set."""
+    scheduled = calendar[["customer_id", "activity_id"]].drop_duplicates()
+    included = decision_log.loc[decision_log["result"] == "INCLUDED", ["customer_id", "activity_id"]]
+    merged = scheduled.merge(included, how="outer", on=["customer_id", "activity_id"], indicator=True)
+    mismatched = merged[merged["_merge"] != "both"]
+    mismatched = mismatched.assign(
+        observed=mismatched["_merge"].astype(str).map({"left_only": "calendar_only", "right_only": "log_only"})
+    )
+    return _violations("INCLUSION_MISMATCH", mismatched, "observed", details="calendar rows and INCLUDED log rows disagree")
+
+
+def verify_outputs(
+    calendar: pd.DataFrame,
+    decision_log: pd.DataFrame,
+    activities: pd.DataFrame,
+    profiles: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Full violation report for in-memory outputs."""
+    caps = persona_caps(profiles) if profiles is not None else None
+    reports = [
+        verify_calendar(calendar, activities, caps),
+        verify_decision_log(decision_log, activities["ActivityID"].tolist()),
+        verify_inclusions(calendar, decision_log),
+    ]
+    if profiles is not None:
+        reports.append(_missing_customers(profiles["CustomerID"], decision_log["customer_id"]))
+    return _concat(reports)
+
+
+def _missing_customers(expected: pd.Series, logged: pd.Series) -> pd.DataFrame:
+    missing = pd.DataFrame({"customer_id": expected[~expected.isin(logged)].to_numpy()})
+    missing["observed"] = 0
+    return _violations("LOG_MISSING_CUSTOMER", missing, "observed", details="customer absent from decision log")
+
+
+def _concat(reports: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    reports = [report for report in reports if not report.empty]
+    if not reports:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(reports, ignore_index=True)[VIOLATION_COLUMNS]
+
+
+def whole_customer_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Regroup customer-sorted chunks so no customer is split across two chunks."""
+    carry: pd.DataFrame | None = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            carry = chunk
+            continue
+        last = chunk["customer_id"].iloc[-1]
+        tail = chunk["customer_id"].eq(last)
+        carry = chunk[tail]
+        if (~tail).any():
+            yield chunk[~tail]
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+def _aligned(
+    log_chunks: Iterator[pd.DataFrame], calendar_chunks: Iterator[pd.DataFrame]
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Pair each decision-log chunk with the calendar rows of the same customers."""
+    pending: pd.DataFrame | None = None
+    for log_chunk in log_chunks:
+        last = log_chunk["customer_id"].iloc[-1]
+        parts: List[pd.DataFrame] = []
+        while True:
+            if pending is None:
+                pending = next(calendar_chunks, None)
+                if pending is None:
+                    break
+            upto = pending["customer_id"] <= last
+            parts.append(pending[upto])
+            if upto.all():
+                pending = None
+                continue
+            pending = pending[~upto]
+            break
+        calendar = pd.concat(parts, ignore_index=True) if parts else None
+        yield log_chunk, calendar
+    # calendar customers beyond the last logged customer
+    if pending is None:
+        pending = next(calendar_chunks, None)
+    while pending is not None:
+        yield pd.DataFrame(columns=["customer_id", "activity_id", "result"]), pending
+        pending = next(calendar_chunks, None)
+
+
+def verify_output_files(
+    calendar_path: str,
+    decision_log_path: str,
+    activities: pd.DataFrame,
+    profiles: pd.DataFrame | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """Stream customer-sorted calendar/decision-log CSVs and report violations.
+
+    Memory is bounded by ``chunksize`` rows plus one customer, and the sorted
+    profile CustomerIDs when ``profiles`` is given.
+    """
+    activity_ids = activities["ActivityID"].tolist()
+    caps = persona_caps(profiles) if profiles is not None else None
+    expected = np.sort(profiles["CustomerID"].astype(str).to_numpy().astype(object)) if profiles is not None else None
+    seen = np.zeros(len(expected), dtype=bool) if expected is not None else None
+
+    calendar_cols = ["customer_id", "week_bucket", "month_bucket", "activity_id", "category"]
+    log_cols = ["customer_id", "activity_id", "result"]
+    calendar_chunks = whole_customer_chunks(
+        pd.read_csv(calendar_path, usecols=calendar_cols, chunksize=chunksize)
+    )
+    log_chunks = whole_customer_chunks(pd.read_csv(decision_log_path, usecols=log_cols, chunksize=chunksize))
+
+    reports: List[pd.DataFrame] = []
+    for log_chunk, calendar_chunk in _aligned(log_chunks, calendar_chunks):
+        if calendar_chunk is None:
+            calendar_chunk = pd.DataFrame(columns=calendar_cols)
+        reports.append(verify_calendar(calendar_chunk, activities, caps))
+        reports.append(verify_decision_log(log_chunk, activity_ids))
+        reports.append(verify_inclusions(calendar_chunk, log_chunk))
+        if seen is not None and not log_chunk.empty:
+            ids = log_chunk["customer_id"].astype(str).unique().astype(object)
+            pos = np.searchsorted(expected, ids)
+            hit = pos < len(expected)
+            hit[hit] = expected[pos[hit]] == ids[hit]
+            seen[pos[hit]] = True
+
+    if seen is not None:
+        missing = pd.DataFrame({"customer_id": expected[~seen], "observed": 0})
+        reports.append(_violations("LOG_MISSING_CUSTOMER", missing, "observed", details="customer absent from decision log"))
+    return _concat(reports)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    import argparse
+
+    from activity_library import normalise_activity_library
+    from ingest import load_activity_library
+
+    parser = argparse.ArgumentParser(description="Verify engine outputs and write a violation report")
+    parser.add_argument("calendar", help="engagement_calendar CSV (optionally compressed)")
+    parser.add_argument("decision_log", help="decision_log CSV (optionally compressed)")
+    parser.add_argument("--activity-library", required=True)
+    parser.add_argument("--derived-profile", help="derived_profile CSV enabling persona caps and coverage checks")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--report", help="Write the violation report to this CSV")
+    args = parser.parse_args(argv)
+
+    activities = normalise_activity_library(load_activity_library(args.activity_library))
+    profiles = None
+    if args.derived_profile:
+        profiles = pd.read_csv(args.derived_profile, usecols=PROFILE_COLUMNS)
+    report = verify_output_files(args.calendar, args.decision_log, activities, profiles, args.chunksize)
+    if args.report:
+        report.to_csv(args.report, index=False)
+    if report.empty:
+        print("No violations found.")
+        return 0
+    print(report.groupby("check").size().to_string())
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
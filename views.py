@@ -0,0 +1,92 @@
+"""Server-side filtering, pagination and summary aggregates for the Streamlit views."""
+from __future__ import annotations
+
+import re
+from math import ceil
+from typing import Iterable, Tuple
+
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 200
+
+
+def _reason_mask(series: pd.Series, reason_code: str) -> pd.Series:
+    # calendar rows carry pipe-joined codes, decision log rows a single code
+    return series.fillna("").str.contains(rf"(?:^|\|){re.escape(reason_code)}(?:\||$)", regex=True)
+
+
+def filter_frame(
+    df: pd.DataFrame,
+    customer_id: str | None = None,
+    category: str | None = None,
+    reason_code: str | None = None,
+    week_range: Tuple[str, str] | None = None,
+) -> pd.DataFrame:
+    """Apply the view filters to any frame that carries the relevant columns.
+
+    Filters are skipped for frames that lack the column, so the same call works for
+    raw extracts, the derived profile, the calendar and the decision log.
+    """
+    mask = pd.Series(True, index=df.index)
+    if customer_id:
+        for col in ("customer_id", "CustomerID"):
+            if col in df.columns:
+                mask &= df[col].astype(str) == str(customer_id)
+                break
+    if category:
+        for col in ("category", "Category"):
+            if col in df.columns:
+                mask &= df[col] == category
+                break
+    if reason_code:
+        if "reason_code" in df.columns:
+            mask &= df["reason_code"] == reason_code
+        elif "reason_codes" in df.columns:
+            mask &= _reason_mask(df["reason_codes"], reason_code)
+    if week_range and "week_bucket" in df.columns:
+        start, end = week_range
+        mask &= (df["week_bucket"] >= start) & (df["week_bucket"] <= end)
+    return df[mask]
+
+
+def page_count(total_rows: int, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    return max(1, ceil(total_rows / max(page_size, 1)))
+
+
+def page_slice(df: pd.DataFrame, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> pd.DataFrame:
+    """Return only the rows of the requested 1-based page."""
+    page = min(max(page, 1), page_count(len(df), page_size))
+    start = (page - 1) * page_size
+    return df.iloc[start : start + page_size]
+
+
+def reason_code_counts(decision_log: pd.DataFrame) -> pd.DataFrame:
+    """Per stage/result/reason counts across the decision log."""
+    if decision_log.empty:
+        return pd.DataFrame(columns=["stage", "result", "reason_code", "rows"])
+    return (
+        decision_log.groupby(["stage", "result", "reason_code"], sort=True)
+        .size()
+        .reset_index(name="rows")
+        .sort_values(["rows", "stage", "reason_code"], ascending=[False, True, True])
+        .reset_index(drop=True)
+    )
+
+
+def owner_weekly_load(calendar: pd.DataFrame) -> pd.DataFrame:
+    """Scheduled items per owner type (rows) and week bucket (columns)."""
+    if calendar.empty:
+        return pd.DataFrame()
+    return (
+        calendar.groupby(["owner_type", "week_bucket"], sort=True)
+        .size()
+        .unstack("week_bucket", fill_value=0)
+    )
+
+
+def distinct_values(df: pd.DataFrame, columns: Iterable[str]) -> list:
+    """Sorted distinct values of the first matching column, for filter pickers."""
+    for col in columns:
+        if col in df.columns:
+            return sorted(df[col].dropna().astype(str).unique())
+    return []